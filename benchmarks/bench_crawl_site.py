@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Crawler benchmark against a generated site served locally.
+
+Serves a synthetic site from a local HTTP/1.1 server:
+- --pages pages built from --templates templates, each linking to --fanout others. Links repeat in several
+  URL forms (trailing slash, #fragment, ?query) to exercise deduplication.
+- A robots.txt that disallows /private/ (linked from every page) and names a
+  sitemap index split into --sitemap-chunk-sized child sitemaps with lastmod.
+- Optional per-request --latency-ms, --error-rate injection (500s and 404s
+  on a fixed set of pages) and gzip for clients that accept it.
+- ETag validators, so --recrawl measures an incremental second crawl.
+
+Then runs scripts/crawl_site.py in a fresh process for each combination of
+--concurrency and --delay, and reports pages/sec, peak RSS, request counts
+by kind, duplicate fetches of good pages, repeat fetches of error pages,
+robots.txt violations, coverage of the pages the crawler should find, and
+the review set: representative pages left by near-duplicate clustering
+against the number of --templates crawled.
+
+Usage:
+    python3 benchmarks/bench_crawl_site.py [--pages 500] [--fanout 8] [--latency-ms 20]
+        [--error-rate 0.02] [--gzip] [--concurrency 1,4,8] [--delay 0,0.05] [--recrawl]
+
+Exits 1 if a crawl fails, fetches a good page twice, fetches a disallowed
+page or reports a page that does not exist.
+"""
+
+import argparse
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+CRAWLER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts", "crawl_site.py")
+
+PAGE_PATH_RE = re.compile(r"^/p(\d+)/?$")
+
+
+class SyntheticSite:
+    """Deterministic page graph, sitemaps and error pages for one benchmark run."""
+
+    def __init__(self, pages, fanout, error_rate, page_kb, sitemap_chunk, templates):
+        self.pages = pages
+        self.fanout = fanout
+        self.templates = templates
+        # Each template has its own copy; pages built from it differ only in name, SKU and price
+        vocabulary = [f"word{n}" for n in range(5000)]
+        self.copy = [" ".join(random.Random(t).choices(vocabulary, k=page_kb * 1024 // 9)) for t in range(templates)]
+        self.sitemap_chunk = sitemap_chunk
+        self.errors = {
+            i: (500 if i % 2 else 404)
+            for i in range(1, pages)
+            if int(hashlib.md5(str(i).encode()).hexdigest()[:8], 16) / 0xFFFFFFFF < error_rate
+        }
+
+    def links(self, i):
+        """Page indexes linked from page i."""
+        return [(i * self.fanout + k) % self.pages for k in range(1, self.fanout + 1)]
+
+    def page(self, i):
+        forms = ("/p{}", "/p{}/", "/p{}#reviews", "/p{}?utm_source=nav")
+        hrefs = [form.format(j) for j, form in zip(self.links(i), itertools.cycle(forms))]
+        hrefs += ["/p0", f"/private/account-{i}", "/static/logo.png", "https://elsewhere.example/"]
+        anchors = "".join(f'<a href="{href}">link</a>' for href in hrefs)
+        main = f"<h1>Product {i}</h1><p>{self.copy[i % self.templates]}</p><p>SKU {i:05d}, ${i * 7 % 500}</p>"
+        return (f"<!DOCTYPE html><html><head><title>Page {i}</title></head><body>"
+                f"<nav>{anchors}</nav><main>{main}</main></body></html>").encode()
+
+    def sitemap_children(self):
+        return (self.pages + self.sitemap_chunk - 1) // self.sitemap_chunk
+
+    def sitemap_index(self, host):
+        entries = "".join(f"<sitemap><loc>http://{host}/sitemaps/{n}.xml</loc></sitemap>"
+                          for n in range(self.sitemap_children()))
+        return ('<?xml version="1.0"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                f"{entries}</sitemapindex>").encode()
+
+    def sitemap(self, n, host):
+        start = n * self.sitemap_chunk
+        entries = "".join(f"<url><loc>http://{host}/p{i}</loc><lastmod>2024-01-{i % 28 + 1:02d}</lastmod></url>"
+                          for i in range(start, min(start + self.sitemap_chunk, self.pages)))
+        return ('<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                f"{entries}</urlset>").encode()
+
+    def expected(self, max_pages):
+        """(valid page paths, pages a correct crawl finds). The sitemap lists every page, so the
+        home page and all non-error pages are reachable and the crawl is only capped by --max-pages."""
+        valid = {"/"} | {f"/p{i}" for i in range(self.pages) if i not in self.errors}
+        return valid, min(len(valid), max_pages)
+
+
+def start_server(site, latency, use_gzip):
+    """Serve the site on a free port. Returns (server, request counter)."""
+    requests = Counter()
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            host = self.headers["Host"]
+            path = urlparse(self.path).path
+            if latency:
+                time.sleep(latency)
+            content_type = "text/html; charset=utf-8"
+            match = PAGE_PATH_RE.match(path)
+            if path == "/robots.txt":
+                kind, status = "robots", 200
+                body = f"User-agent: *\nDisallow: /private/\nSitemap: http://{host}/sitemap_index.xml\n".encode()
+                content_type = "text/plain"
+            elif path == "/sitemap_index.xml":
+                kind, status, body = "sitemap", 200, site.sitemap_index(host)
+                content_type = "application/xml"
+            elif path.startswith("/sitemaps/") and path[10:-4].isdigit():
+                kind, status, body = "sitemap", 200, site.sitemap(int(path[10:-4]), host)
+                content_type = "application/xml"
+            elif path == "/" or (match and int(match.group(1)) < site.pages):
+                index = int(match.group(1)) if match else 0
+                kind = f"page:/p{index}" if match else "page:/"
+                status = site.errors.get(index, 200)
+                body = site.page(index) if status == 200 else b"error"
+            elif path.startswith("/private/"):
+                kind, status, body = "private", 200, b"<html>secret</html>"
+            else:
+                kind, status, body = "other", 404, b"not found"
+            with lock:
+                requests[kind] += 1
+
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            if status == 200 and self.headers.get("If-None-Match") == etag:
+                with lock:
+                    requests["not-modified"] += 1
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            encoded = use_gzip and "gzip" in self.headers.get("Accept-Encoding", "")
+            payload = gzip.compress(body, compresslevel=5) if encoded else body
+            with lock:
+                requests["bytes"] += len(payload)
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            if status == 200:
+                self.send_header("ETag", etag)
+            if encoded:
+                self.send_header("Content-Encoding", "gzip")
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, requests
+
+
+def run_crawl(url, workdir, args, concurrency, delay):
+    """Run the crawler in a new process. Returns (seconds, peak RSS MB, exit code)."""
+    command = [sys.executable, CRAWLER, url, "--max-pages", str(args.max_pages), "--max-depth", str(args.max_depth),
+               "--concurrency", str(concurrency), "--per-host", str(concurrency), "--delay", str(delay),
+               "--site-cache-hours", "0"]
+    start = time.perf_counter()
+    proc = subprocess.Popen(command, cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    elapsed = time.perf_counter() - start
+    return elapsed, usage.ru_maxrss / 1024, proc.returncode
+
+
+def crawled_pages(workdir, host):
+    with open(os.path.join(workdir, "reviews", host, "discovered-pages.json"), "r", encoding="utf-8") as f:
+        return json.load(f)["pages"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark crawl_site.py against a local synthetic site")
+    parser.add_argument("--pages", type=int, default=500, help="Pages on the site (default: 500)")
+    parser.add_argument("--fanout", type=int, default=8, help="Links per page (default: 8)")
+    parser.add_argument("--templates", type=int, default=10, help="Page templates; pages sharing one are near-duplicates (default: 10)")
+    parser.add_argument("--page-kb", type=int, default=20, help="Approximate page size in KB (default: 20)")
+    parser.add_argument("--sitemap-chunk", type=int, default=200, help="URLs per child sitemap (default: 200)")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Server latency per request (default: 20)")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Share of pages answering 500/404 (default: 0.02)")
+    parser.add_argument("--gzip", action="store_true", help="gzip responses for clients that accept it")
+    parser.add_argument("--max-pages", type=int, default=400, help="Crawler --max-pages (default: 400)")
+    parser.add_argument("--max-depth", type=int, default=5, help="Crawler --max-depth (default: 5)")
+    parser.add_argument("--concurrency", default="1,4,8", help="Comma-separated crawler concurrency values (default: 1,4,8)")
+    parser.add_argument("--delay", default="0", help="Comma-separated crawler --delay values (default: 0)")
+    parser.add_argument("--recrawl", action="store_true", help="Crawl each configuration twice, the second time incrementally")
+    args = parser.parse_args()
+
+    site = SyntheticSite(args.pages, args.fanout, args.error_rate, args.page_kb, args.sitemap_chunk, args.templates)
+    server, requests = start_server(site, args.latency_ms / 1000, args.gzip)
+    host = f"127.0.0.1:{server.server_address[1]}"
+    url = f"http://{host}/"
+    valid, expected_count = site.expected(args.max_pages)
+
+    print(f"Site: {args.pages} pages, fan-out {args.fanout}, {len(site.errors)} error pages, "
+          f"{args.templates} templates, {site.sitemap_children()} child sitemaps, {args.latency_ms:g} ms latency, "
+          f"gzip {'on' if args.gzip else 'off'}")
+    print(f"Crawl: --max-pages {args.max_pages} --max-depth {args.max_depth}; "
+          f"a correct crawl finds {expected_count} pages\n")
+    print(f"{'conc':>4} {'delay':>5} {'run':>7} {'pages':>5} {'secs':>6} {'pages/s':>7} {'peak MB':>7} "
+          f"{'page req':>8} {'sitemap':>7} {'robots':>6} {'304':>4} {'dup':>4} {'err retry':>9} {'blocked':>7} {'coverage':>8} {'review':>7} {'KB sent':>8}")
+
+    failed = False
+    for concurrency, delay in itertools.product(
+            [int(c) for c in args.concurrency.split(",")], [float(d) for d in args.delay.split(",")]):
+        workdir = tempfile.mkdtemp(prefix="bench-crawl-")
+        for run in ("cold", "recrawl") if args.recrawl else ("cold",):
+            requests.clear()
+            elapsed, peak_mb, returncode = run_crawl(url, workdir, args, concurrency, delay)
+            if returncode != 0:
+                print(f"{concurrency:>4} {delay:>5g} {run:>7} crawler exited with {returncode}")
+                failed = True
+                continue
+            pages = crawled_pages(workdir, host)
+            found = {urlparse(page["url"]).path.rstrip("/") or "/" for page in pages}
+            page_requests = {kind: n for kind, n in requests.items() if kind.startswith("page:")}
+            # Error pages may be tried again by the sitemap phase; a second fetch of a good page is a dedupe miss
+            duplicates = sum(n - 1 for kind, n in page_requests.items() if kind[5:] in valid)
+            refetched = sum(n - 1 for kind, n in page_requests.items() if kind[5:] not in valid)
+            coverage = 100 * len(found & valid) / expected_count if expected_count else 100
+            # Near-duplicate clustering should leave one representative per template crawled
+            templates = {int(path[2:] or 0) % args.templates for path in found & valid}
+            review = f"{sum(page.get('representative', True) for page in pages)}/{len(templates)}"
+            print(f"{concurrency:>4} {delay:>5g} {run:>7} {len(pages):>5} {elapsed:>6.2f} {len(pages) / elapsed:>7.1f} "
+                  f"{peak_mb:>7.1f} {sum(page_requests.values()):>8} {requests['sitemap']:>7} "
+                  f"{requests['robots']:>6} {requests['not-modified']:>4} {duplicates:>4} {refetched:>9} {requests['private']:>7} "
+                  f"{coverage:>7.1f}% {review:>7} {requests['bytes'] / 1024:>8.0f}")
+            failed = failed or duplicates > 0 or requests["private"] > 0 or bool(found - valid)
+
+    server.shutdown()
+    if failed:
+        print("\nFAILED: crawl errors, duplicate page fetches, robots.txt violations or invalid pages above")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
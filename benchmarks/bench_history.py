@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+History lookup benchmark for bot/database.py.
+
+Builds a throwaway database with --messages stored messages spread over
+--users users, then times loading a user's last 20 messages via the old
+conversations JOIN, the (telegram_id, id) index, and get_recent_messages
+with a cold and a warm history cache.
+
+Usage:
+    python3 benchmarks/bench_history.py [--messages 100000] [--users 50] [--lookups 2000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+LEGACY_QUERY = """
+    SELECT m.role, m.content
+    FROM messages m
+    JOIN conversations c ON m.conversation_id = c.id
+    WHERE c.telegram_id = ?
+    ORDER BY m.id DESC
+    LIMIT ?
+"""
+
+INDEXED_QUERY = """
+    SELECT role, content
+    FROM messages
+    WHERE telegram_id = ?
+    ORDER BY id DESC
+    LIMIT ?
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark get_recent_messages")
+    parser.add_argument("--messages", type=int, default=100_000, help="Stored messages (default: 100000)")
+    parser.add_argument("--users", type=int, default=50, help="Distinct users (default: 50)")
+    parser.add_argument("--lookups", type=int, default=2000, help="Lookups per strategy (default: 2000)")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench-history-")
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "bench")
+    os.environ.setdefault("ANTHROPIC_API_KEY", "bench")
+    os.environ.setdefault("ALLOWED_TELEGRAM_IDS", "1")
+    os.environ["PROJECT_ROOT"] = tmp
+    os.environ["DB_PATH"] = os.path.join(tmp, "bench.db")
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot"))
+    import database
+
+    database.init_db()
+    print(f"[SETUP] Writing {args.messages} messages for {args.users} users to {os.environ['DB_PATH']}")
+    t0 = time.perf_counter()
+    rng = random.Random(42)
+    body = {"type": "text", "text": "Overall score 72/100. " * 20}
+    with database.get_connection() as conn:
+        conv_ids = {}
+        for uid in range(1, args.users + 1):
+            cur = conn.execute(
+                "INSERT INTO conversations (telegram_id, session_id, created_at) VALUES (?, ?, ?)",
+                (uid, f"bench-{uid}", "2026-01-01T00:00:00"),
+            )
+            conv_ids[uid] = cur.lastrowid
+        rows = []
+        for i in range(args.messages):
+            uid = rng.randint(1, args.users)
+            rows.append((conv_ids[uid], uid, "assistant" if i % 2 else "user",
+                         database._encode_content([body]), "2026-01-01T00:00:00"))
+        conn.executemany(
+            "INSERT INTO messages (conversation_id, telegram_id, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+    print(f"  Done in {time.perf_counter() - t0:.1f}s")
+
+    users = [rng.randint(1, args.users) for _ in range(args.lookups)]
+
+    def query(sql):
+        def run(uid):
+            with database.get_connection() as conn:
+                rows = conn.execute(sql, (uid, 20)).fetchall()
+            return [database._decode_content(r["content"]) for r in rows]
+        return run
+
+    def cache_miss(uid):
+        database._cache_invalidate([uid])
+        return database.get_recent_messages(uid, limit=20)
+
+    def cache_hit(uid):
+        return database.get_recent_messages(uid, limit=20)
+
+    print(f"\n[RUN] {args.lookups} lookups of the last 20 messages")
+    strategies = (
+        ("join (legacy)", query(LEGACY_QUERY)),
+        ("indexed", query(INDEXED_QUERY)),
+        ("cache miss", cache_miss),
+        ("cache hit", cache_hit),
+    )
+    for name, fn in strategies:
+        t0 = time.perf_counter()
+        for uid in users:
+            fn(uid)
+        elapsed = time.perf_counter() - t0
+        print(f"  {name:<14} {elapsed / args.lookups * 1e6:10.1f} us/lookup")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Connection reuse benchmark for scripts/http_pool.py.
+
+Serves a small page over TLS from a local keep-alive HTTP/1.1 server (with a
+throwaway self-signed certificate made by the openssl CLI), then fetches it
+--requests times with a new urlopen connection per request, as the crawler
+used to, and through one shared HTTPPool, from --threads threads.
+
+Usage:
+    python3 benchmarks/bench_http_pool.py [--requests 300] [--threads 4] [--page-kb 40]
+"""
+
+import argparse
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.request import Request, urlopen
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+from http_pool import HTTPPool  # noqa: E402
+
+USER_AGENT = "bench-http-pool"
+
+
+def make_certificate(directory):
+    """Create a self-signed certificate and key for 127.0.0.1. Returns (cert, key) paths."""
+    cert = os.path.join(directory, "cert.pem")
+    key = os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=127.0.0.1", "-keyout", key, "-out", cert],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+def start_server(cert, key, page):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; without this, Nagle plus
+        # delayed ACKs stall every response on a kept-alive connection
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(page)))
+            self.end_headers()
+            self.wfile.write(page)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(fetch, urls, threads):
+    """Fetch all urls with `threads` workers. Returns elapsed seconds."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for body in executor.map(fetch, urls):
+            assert body, "empty response"
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark keep-alive connection reuse over TLS")
+    parser.add_argument("--requests", type=int, default=300, help="Requests per client (default: 300)")
+    parser.add_argument("--threads", type=int, default=4, help="Concurrent fetchers (default: 4)")
+    parser.add_argument("--page-kb", type=int, default=40, help="Page size in KB (default: 40)")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench-http-pool-")
+    try:
+        cert, key = make_certificate(tmp)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"openssl is required to create a test certificate: {e}", file=sys.stderr)
+        return 1
+
+    page = (b"<html><body>" + b"<p>benchmark page</p>" * (args.page_kb * 1024 // 21) + b"</body></html>")
+    server = start_server(cert, key, page)
+    base = f"https://127.0.0.1:{server.server_address[1]}"
+    urls = [f"{base}/page-{i}" for i in range(args.requests)]
+
+    client_context = ssl.create_default_context()
+    client_context.check_hostname = False
+    client_context.verify_mode = ssl.CERT_NONE
+
+    def fetch_urlopen(url):
+        with urlopen(Request(url, headers={"User-Agent": USER_AGENT}), timeout=15, context=client_context) as resp:
+            return resp.read()
+
+    pool = HTTPPool(timeout=15, ssl_context=client_context)
+
+    def fetch_pooled(url):
+        return pool.get(url, {"User-Agent": USER_AGENT}).body
+
+    print(f"{args.requests} requests, {args.threads} threads, {len(page) // 1024} KB page over TLS\n")
+    print(f"{'client':<22} {'total s':>8} {'ms/req':>8} {'req/s':>8}")
+    results = {}
+    for name, fetch in (("urlopen per request", fetch_urlopen), ("HTTPPool keep-alive", fetch_pooled)):
+        run(fetch, urls[:args.threads], args.threads)  # Warm up imports and code paths
+        elapsed = run(fetch, urls, args.threads)
+        results[name] = elapsed
+        print(f"{name:<22} {elapsed:>8.2f} {elapsed * 1000 * args.threads / args.requests:>8.2f} "
+              f"{args.requests / elapsed:>8.0f}")
+
+    print(f"\nPool: {pool.stats_line()}")
+    saved = (results["urlopen per request"] - results["HTTPPool keep-alive"]) * 1000 * args.threads / args.requests
+    print(f"Saved per request: {saved:.2f} ms (handshake and connection setup)")
+    pool.close()
+    server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
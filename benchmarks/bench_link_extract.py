@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Link extraction benchmark and parity check for scripts/link_extract.py.
+
+Runs every available engine over an HTML corpus and compares each page's
+result with the original html.parser extractor: the raw <a href> list, the
+<base> and canonical hrefs, and the final extract_links() URL set. Then
+reports pages/sec and MB/sec per engine, for the raw scan and for the full
+extract_links() path including URL resolution, against the previous
+extract_links() (html.parser, then urljoin/urlparse for every href).
+
+The corpus defaults to the crawler's cached pages (reviews/*/.cache/*.html).
+With none there, or with --generate, synthetic e-commerce pages with
+thousands of links and awkward markup (comments, scripts, entities, bare and
+multi-line attributes) are generated; --save-corpus keeps them.
+
+Usage:
+    python3 benchmarks/bench_link_extract.py [--corpus DIR] [--generate 200] [--save-corpus DIR] [--rounds 3]
+
+Exits 1 if the regex engine disagrees with html.parser on any page.
+"""
+
+import argparse
+import glob
+import os
+import random
+import sys
+import time
+from urllib.parse import urljoin, urlparse
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+import crawl_site  # noqa: E402
+from link_extract import ENGINES  # noqa: E402
+
+PAGE_URL = "https://shop.example.com/category/blinds/"
+
+
+def generate_page(rng, index):
+    """One synthetic product-listing page."""
+    nav = "".join(f'<li><a href="/category/{c}/">{c.title()}</a></li>' for c in
+                  ("blinds", "curtains", "shutters", "awnings", "motorisation", "sale"))
+    products = []
+    for i in range(rng.randint(300, 1500)):
+        pid = rng.randint(1, 5000)
+        products.append(rng.choice((
+            f'<div class="card"><a href="/product/{pid}?colour=white&amp;size=m#reviews">'
+            f'<img src="/img/{pid}.webp" alt="<a href=\'/not-a-link\'>"></a></div>',
+            f"<A HREF='/product/{pid}/'>Product {pid}</A>",
+            f'<a class=card href=/product/{pid}>bare</a>',
+            f'<a\n  data-id="{pid}"\n  href="/product/{pid}/variant-{i % 7}"\n>variant</a>',
+            f'<a href="https://shop.example.com/product/{pid}/">absolute</a>',
+            f'<a href="https://cdn.example.net/{pid}.pdf">spec sheet</a>',
+            f'<a href="mailto:sales@example.com?subject={pid}">email</a>',
+            f'<a name="anchor-{i}">no href</a><a href="">empty</a>',
+        )))
+    return (
+        "<!DOCTYPE html>\n<html lang=en><head><meta charset=\"utf-8\">"
+        f"<title>Blinds page {index}</title>"
+        f'<link rel="canonical" href="/category/blinds/?page={index}">'
+        '<link rel=stylesheet href="/static/site.css">'
+        "<script>window.menu = '<a href=\"/from-script\">'; if (a < b && c > d) {}</script>"
+        "<style>a[href$='.pdf']::after { content: '<a href=\"/from-style\">'; }</style>"
+        '<script type="application/ld+json">{"url": "<a href=\\"/json\\">"}</script>'
+        "</head><body>"
+        f"<header><nav><ul>{nav}</ul></nav></header>"
+        "<!-- <a href=\"/commented-out\">old promo</a> -->"
+        f"<main>{''.join(products)}</main>"
+        "<svg><a href=\"/svg-link\"><text>svg</text></a></svg>"
+        f"<footer><ul>{nav}</ul><p>&copy; Example &amp; Co</p></footer>"
+        "</body></html>"
+    )
+
+
+def load_corpus(args):
+    """Return [(name, html)] from --corpus, the crawl cache, or generated pages."""
+    if not args.generate:
+        pattern = os.path.join(args.corpus, "**", "*.html") if args.corpus else \
+            os.path.join(ROOT, "reviews", "*", ".cache", "*.html")
+        paths = sorted(glob.glob(pattern, recursive=True))
+        if paths:
+            corpus = []
+            for path in paths:
+                with open(path, "r", encoding="utf-8", errors="replace") as f:
+                    corpus.append((os.path.relpath(path, ROOT), f.read()))
+            return corpus
+        print("No cached HTML found; generating a synthetic corpus")
+
+    rng = random.Random(42)
+    corpus = [(f"synthetic-{i}.html", generate_page(rng, i)) for i in range(args.generate or 200)]
+    if args.save_corpus:
+        os.makedirs(args.save_corpus, exist_ok=True)
+        for name, html in corpus:
+            with open(os.path.join(args.save_corpus, name), "w", encoding="utf-8") as f:
+                f.write(html)
+        print(f"Saved corpus to {args.save_corpus}")
+    return corpus
+
+
+def legacy_extract_links(html, base_url=PAGE_URL):
+    """extract_links() as it was before link_extract.py, for the baseline timing."""
+    base_domain = urlparse(base_url).netloc
+    hrefs = ENGINES["htmlparser"](html)[0]
+    links = set()
+    for href in hrefs:
+        if href.startswith(("#", "mailto:", "tel:", "javascript:")):
+            continue
+        full_url = urljoin(base_url, href)
+        parsed = urlparse(full_url)
+        if parsed.netloc != base_domain:
+            continue
+        if os.path.splitext(parsed.path)[1].lower() in crawl_site.SKIPPED_EXTENSIONS:
+            continue
+        links.add(crawl_site.normalize_url(full_url))
+    return links
+
+
+def links_with(engine, html):
+    """extract_links() using the given engine."""
+    crawl_site.LINK_SCANNER = engine
+    return crawl_site.extract_links(html, PAGE_URL)
+
+
+def check_parity(corpus):
+    """Compare every engine with html.parser. Returns {engine: [mismatching page names]}."""
+    reference = ENGINES["htmlparser"]
+    mismatches = {name: [] for name in ENGINES if name != "htmlparser"}
+    for page, html in corpus:
+        expected = reference(html)
+        expected_links = links_with(reference, html)
+        for name in mismatches:
+            engine = ENGINES[name]
+            if engine(html) != expected or links_with(engine, html) != expected_links:
+                mismatches[name].append(page)
+    return mismatches
+
+
+def throughput(func, corpus, rounds):
+    """Best-of-rounds seconds to run func(html) over the corpus."""
+    best = float("inf")
+    for _ in range(rounds):
+        crawl_site.resolve_link.cache_clear()  # Each round starts like a new crawl
+        start = time.perf_counter()
+        for _, html in corpus:
+            func(html)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark link extraction engines and check parity")
+    parser.add_argument("--corpus", help="Directory of .html files (default: reviews/*/.cache/)")
+    parser.add_argument("--generate", type=int, default=0, help="Use this many synthetic pages instead")
+    parser.add_argument("--save-corpus", help="Write the synthetic pages to this directory")
+    parser.add_argument("--rounds", type=int, default=3, help="Timing rounds, best is reported (default: 3)")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args)
+    megabytes = sum(len(html.encode("utf-8")) for _, html in corpus) / 1e6
+    links = sum(len(ENGINES["htmlparser"](html)[0]) for _, html in corpus)
+    print(f"Corpus: {len(corpus)} pages, {megabytes:.1f} MB, {links} <a href> links\n")
+
+    mismatches = check_parity(corpus)
+    for name, pages in mismatches.items():
+        status = "identical" if not pages else f"{len(pages)} pages differ, e.g. {', '.join(pages[:3])}"
+        print(f"Parity {name:<10} vs htmlparser: {status}")
+
+    print(f"\n{'engine':<12} {'scan pages/s':>13} {'scan MB/s':>10} {'extract_links pages/s':>22}")
+    baseline = throughput(legacy_extract_links, corpus, args.rounds)
+    print(f"{'previous':<12} {'':>13} {'':>10} {len(corpus) / baseline:>22.0f}")
+    for name, engine in sorted(ENGINES.items()):
+        scan = throughput(engine, corpus, args.rounds)
+        full = throughput(lambda html: links_with(engine, html), corpus, args.rounds)
+        print(f"{name:<12} {len(corpus) / scan:>13.0f} {megabytes / scan:>10.1f} {len(corpus) / full:>22.0f}"
+              f"  ({baseline / full:.1f}x previous)")
+    return 1 if mismatches.get("regex") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the bot and worker entry points.
+
+Imports each entry module in a fresh interpreter under `python -X importtime`
+with a throwaway environment, and reports wall time, total import time and
+the most expensive top-level imports. Also times the heavy SDKs on their own
+(now imported on first use) and database.init_db() on a fresh and an
+existing database, which main() overlaps with connecting to Telegram.
+
+Usage:
+    python3 benchmarks/bench_startup.py [--runs 5] [--top 12]
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot")
+
+# Entry modules, and SDKs the bot no longer imports eagerly
+TARGETS = ["main", "worker", "anthropic", "telegram.ext"]
+
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _env(tmp: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault("TELEGRAM_BOT_TOKEN", "bench")
+    env.setdefault("ANTHROPIC_API_KEY", "bench")
+    env.setdefault("ALLOWED_TELEGRAM_IDS", "1")
+    env["PROJECT_ROOT"] = tmp
+    env["DB_PATH"] = os.path.join(tmp, "bench.db")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [BOT_DIR, env.get("PYTHONPATH")]))
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def profile_import(module: str, env: dict) -> tuple[float, int, list[tuple[int, str]]]:
+    """
+    Import `module` in a new interpreter.
+    Returns (wall seconds, total import microseconds, [(cumulative us, name)] of
+    the modules `module` imports directly).
+    """
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env, cwd=BOT_DIR, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+    # Children are printed before their parent, indented two more spaces
+    total, children, direct = 0, [], []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        depth = len(match.group(3))
+        if depth == 1:
+            total += int(match.group(2))
+            if match.group(4) == module:
+                direct = children
+            children = []
+        elif depth == 3:
+            children.append((int(match.group(2)), match.group(4)))
+    return wall, total, direct
+
+
+def time_init_db(env: dict) -> float:
+    """Seconds for database.init_db() in a new interpreter."""
+    code = (
+        "import time, database\n"
+        "t = time.perf_counter(); database.init_db(); print(time.perf_counter() - t)"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], env=env, cwd=BOT_DIR,
+                          capture_output=True, text=True, check=True)
+    return float(proc.stdout.strip())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bot startup")
+    parser.add_argument("--runs", type=int, default=5, help="Interpreter launches per target (default: 5)")
+    parser.add_argument("--top", type=int, default=12, help="Top-level imports to list (default: 12)")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench-startup-")
+    env = _env(tmp)
+
+    print(f"{'import':<14} {'wall ms':>9} {'imports ms':>11}")
+    profiles = {}
+    for target in TARGETS:
+        try:
+            runs = [profile_import(target, env) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{target:<14} skipped: {e}")
+            continue
+        profiles[target] = runs[-1][2]
+        wall = statistics.median(r[0] for r in runs) * 1000
+        total = statistics.median(r[1] for r in runs) / 1000
+        print(f"{target:<14} {wall:>9.1f} {total:>11.1f}")
+
+    for target in ("main", "worker"):
+        if target not in profiles:
+            continue
+        print(f"\nSlowest imports made by {target} (cumulative ms):")
+        for us, name in sorted(profiles[target], reverse=True)[:args.top]:
+            print(f"  {us / 1000:>8.1f}  {name}")
+
+    fresh = time_init_db(env)
+    existing = statistics.median(time_init_db(env) for _ in range(args.runs))
+    print(f"\ninit_db: {fresh * 1000:.1f} ms fresh, {existing * 1000:.1f} ms existing "
+          f"(overlapped with the Telegram handshake in main())")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,7 +3,6 @@
 import asyncio
 import logging
 from typing import Callable
-import anthropic
 from config import (
     ANTHROPIC_API_KEY,
     ANTHROPIC_MODEL,
@@ -11,11 +10,26 @@ from config import (
     TELEGRAM_OPTIMIZE,
     TELEGRAM_MAX_TOKENS,
     TELEGRAM_REQUEST_DELAY,
+    AGENT_WRITE_MAX_TOKENS,
+    AGENT_MAX_CONTINUATIONS,
 )
 from tools import dispatch_tool, TOOLS
 
 logger = logging.getLogger(__name__)
 
+# Created on first use: importing the SDK is a large share of bot startup,
+# and in TASK_EXECUTION=queue mode the bot process never calls the API
+_client = None
+
+
+def _get_client():
+    """Shared async client, so runs reuse its connection pool."""
+    global _client
+    if _client is None:
+        import anthropic
+        _client = anthropic.AsyncAnthropic(api_key=ANTHROPIC_API_KEY)
+    return _client
+
 
 def _summarize_tool_input(input_dict: dict | str) -> str:
     """Create a short summary of tool input for progress display."""
@@ -37,6 +51,53 @@ def _summarize_tool_input(input_dict: dict | str) -> str:
     return str(input_dict)[:50]
 
 
+class OutputBudget:
+    """
+    Per-turn max_tokens. Turns that pick the next tool get the small budget;
+    turns expected to write a report get the large one. A turn is expected to
+    write after the agent read a template or wrote a file, and every turn does
+    once any turn ran out of tokens.
+    """
+
+    def __init__(self, small: int, large: int):
+        self.small = small
+        self.large = max(large, small)
+        self._writing = False
+        self._escalated = False
+
+    def next(self) -> int:
+        return self.large if self._writing or self._escalated else self.small
+
+    def escalate(self):
+        self._escalated = True
+
+    def observe_tool_calls(self, calls: list):
+        """Predict the next turn's type from the tool calls just made."""
+        self._writing = any(
+            call.name == "write"
+            or (call.name == "read" and str(call.input.get("file_path", "")).startswith("templates/"))
+            for call in calls
+        )
+
+
+def _resumable_text(content: list) -> list:
+    """Text blocks of a truncated reply, trimmed so they can open the resumed assistant turn."""
+    blocks = [block for block in content if block.type == "text" and block.text.strip()]
+    if blocks:
+        # The API rejects a prefilled assistant turn ending in whitespace
+        blocks[-1] = blocks[-1].model_copy(update={"text": blocks[-1].text.rstrip()})
+    return blocks
+
+
+def _merge_continuation(previous: list, content: list) -> list:
+    """Join a resumed turn onto the text blocks it continues."""
+    content = list(content)
+    if previous and content and content[0].type == "text":
+        joined = previous[-1].model_copy(update={"text": previous[-1].text + content[0].text})
+        return previous[:-1] + [joined] + content[1:]
+    return previous + content
+
+
 async def run_agent(
     system_prompt: str,
     messages: list[dict],
@@ -59,31 +120,57 @@ async def run_agent(
     """
     # Use optimized settings for Telegram, full settings for CLI
     if source == "telegram" and TELEGRAM_OPTIMIZE:
-        max_tokens = TELEGRAM_MAX_TOKENS
+        budget = OutputBudget(TELEGRAM_MAX_TOKENS, AGENT_WRITE_MAX_TOKENS)
         request_delay = TELEGRAM_REQUEST_DELAY
     else:
-        max_tokens = 8096
+        budget = OutputBudget(8096, AGENT_WRITE_MAX_TOKENS)
         request_delay = 0
 
-    client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+    import anthropic
 
-    turn_count = 0
-
-    while turn_count < AGENT_MAX_TURNS:
-        turn_count += 1
+    # Async client so a cancelled task aborts the in-flight request
+    client = _get_client()
 
+    async def create(turn_messages: list[dict]):
         # Add delay between requests for Telegram to avoid rate limiting
         if request_delay > 0:
             await asyncio.sleep(request_delay)
+        return await client.messages.create(
+            model=ANTHROPIC_MODEL,
+            max_tokens=budget.next(),
+            system=system_prompt,
+            messages=turn_messages,
+            tools=tools,
+        )
+
+    turn_count = 0
+
+    while turn_count < AGENT_MAX_TURNS:
+        turn_count += 1
 
         try:
-            response = client.messages.create(
-                model=ANTHROPIC_MODEL,
-                max_tokens=max_tokens,
-                system=system_prompt,
-                messages=messages,
-                tools=tools,
-            )
+            response = await create(messages)
+            content = list(response.content)
+            stop_reason = response.stop_reason
+
+            # Out of output tokens: resume the same turn with the large budget
+            continuations = 0
+            while stop_reason == "max_tokens" and continuations < AGENT_MAX_CONTINUATIONS:
+                continuations += 1
+                budget.escalate()
+                if content and content[-1].type == "tool_use":
+                    # A cut-off tool call can't be resumed; drop it and keep any complete ones
+                    content = content[:-1]
+                    if any(block.type == "tool_use" for block in content):
+                        stop_reason = "tool_use"
+                        break
+                previous = _resumable_text(content)
+                logger.info(f"Turn {turn_count} hit max_tokens; continuing ({continuations}/{AGENT_MAX_CONTINUATIONS})")
+                prefill = [{"type": "text", "text": block.text} for block in previous]
+                tail = [{"role": "assistant", "content": prefill}] if prefill else []
+                response = await create(messages + tail)
+                content = _merge_continuation(previous, response.content)
+                stop_reason = response.stop_reason
         except anthropic.BadRequestError as e:
             logger.error(f"Anthropic BadRequest (400): {e}")
             logger.error(f"Error message: {e.message if hasattr(e, 'message') else str(e)}")
@@ -93,19 +180,21 @@ async def run_agent(
             return f"[ERROR] Unexpected error: {str(e)[:200]}"
 
         # Append assistant response to message history
-        messages.append({"role": "assistant", "content": response.content})
+        messages.append({"role": "assistant", "content": content})
 
         # Check stop reason
-        if response.stop_reason == "end_turn":
+        if stop_reason == "end_turn":
             # Extract final text
-            for block in response.content:
+            for block in content:
                 if hasattr(block, "type") and block.type == "text":
                     return block.text
             return ""
 
-        if response.stop_reason == "tool_use":
+        if stop_reason == "tool_use":
             tool_results = []
-            for block in response.content:
+            calls = [block for block in content if block.type == "tool_use"]
+            budget.observe_tool_calls(calls)
+            for block in content:
                 if hasattr(block, "type") and block.type == "tool_use":
                     # Send progress update
                     summary = _summarize_tool_input(block.input)
@@ -122,7 +211,7 @@ async def run_agent(
             # Append tool results and loop
             messages.append({"role": "user", "content": tool_results})
         else:
-            # Unexpected stop reason
-            return f"[Agent stopped with unexpected reason: {response.stop_reason}]"
+            # Unexpected stop reason, or still truncated after every continuation
+            return f"[Agent stopped with unexpected reason: {stop_reason}]"
 
     return "[Agent reached maximum turns without completing]"
@@ -4,19 +4,11 @@ import os
 import sys
 
 
-def _require(name: str) -> str:
-    """Get required environment variable or exit."""
-    val = os.getenv(name)
-    if not val:
-        print(f"[FATAL] Missing required env var: {name}", file=sys.stderr)
-        sys.exit(1)
-    return val
-
-
-# Required vars
-TELEGRAM_BOT_TOKEN = _require("TELEGRAM_BOT_TOKEN")
-ANTHROPIC_API_KEY = _require("ANTHROPIC_API_KEY")
-ALLOWED_TELEGRAM_IDS_RAW = _require("ALLOWED_TELEGRAM_IDS")
+# Required vars, checked by validate() when a service starts
+REQUIRED_VARS = ("TELEGRAM_BOT_TOKEN", "ANTHROPIC_API_KEY", "ALLOWED_TELEGRAM_IDS")
+TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
+ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY", "")
+ALLOWED_TELEGRAM_IDS_RAW = os.getenv("ALLOWED_TELEGRAM_IDS", "")
 
 # Optional vars with defaults
 PROJECT_ROOT = os.getenv("PROJECT_ROOT", "/Users/thom/Claude Code Drive")
@@ -29,7 +21,52 @@ BASH_TIMEOUT_SECONDS = int(os.getenv("BASH_TIMEOUT_SECONDS", "120"))
 # Telegram-specific optimization settings
 TELEGRAM_OPTIMIZE = os.getenv("TELEGRAM_OPTIMIZE", "true").lower() == "true"
 TELEGRAM_MAX_TOKENS = int(os.getenv("TELEGRAM_MAX_TOKENS", "4096"))  # Reduced from 8096
+AGENT_WRITE_MAX_TOKENS = int(os.getenv("AGENT_WRITE_MAX_TOKENS", "16384"))  # Output budget for report-writing turns
+AGENT_MAX_CONTINUATIONS = int(os.getenv("AGENT_MAX_CONTINUATIONS", "3"))  # Resumes of one turn cut off at max_tokens
 TELEGRAM_REQUEST_DELAY = float(os.getenv("TELEGRAM_REQUEST_DELAY", "0.5"))  # Seconds between requests
+TELEGRAM_GLOBAL_EDITS_PER_SECOND = float(os.getenv("TELEGRAM_GLOBAL_EDITS_PER_SECOND", "20"))  # Status edits, all chats
+TELEGRAM_CHAT_EDIT_INTERVAL_SECONDS = float(os.getenv("TELEGRAM_CHAT_EDIT_INTERVAL_SECONDS", "3"))  # Per chat
+
+# Update ingestion: "polling" (default) or "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # Public base URL; unset = local-only webhook server
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("PORT", os.getenv("WEBHOOK_PORT", "8080")))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN", "")
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "8"))  # Updates handled at once
+
+# Task scheduling
+MAX_CONCURRENT_TASKS = int(os.getenv("MAX_CONCURRENT_TASKS", "3"))  # Agent loops running at once
+MAX_TASKS_PER_USER = int(os.getenv("MAX_TASKS_PER_USER", "1"))  # Running at once per user
+TASK_DURATION_ESTIMATE_SECONDS = float(os.getenv("TASK_DURATION_ESTIMATE_SECONDS", "420"))  # Initial ETA basis
+
+# Worker processes
+TASK_EXECUTION = os.getenv("TASK_EXECUTION", "local").lower()  # local = in the bot process, queue = bot/worker.py
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "2"))  # Agent loops per worker process
+QUEUE_POLL_SECONDS = float(os.getenv("QUEUE_POLL_SECONDS", "0.5"))  # Event/claim polling interval
+WORKER_STALE_SECONDS = int(os.getenv("WORKER_STALE_SECONDS", "120"))  # Fail a running task after this long without a heartbeat
+QUEUE_PENDING_TIMEOUT_SECONDS = int(os.getenv("QUEUE_PENDING_TIMEOUT_SECONDS", "300"))  # Fail a task no worker claims within this long
+
+# Speculative prefetch
+PREFETCH_TTL_SECONDS = int(os.getenv("PREFETCH_TTL_SECONDS", "300"))  # How long a prefetched page answers the agent's fetch
+
+# Result delivery
+DELIVERY_ZIP_MIN_FILES = int(os.getenv("DELIVERY_ZIP_MIN_FILES", "11"))  # Zip instead of media groups at this many files
+
+# Review result cache
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", os.path.join(os.path.dirname(DB_PATH), "result-cache"))
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", str(3 * 24 * 3600)))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# Message storage and maintenance settings
+MESSAGE_COMPRESS_MIN_BYTES = int(os.getenv("MESSAGE_COMPRESS_MIN_BYTES", "1024"))  # Compress bodies at least this big
+MESSAGE_RETENTION_DAYS = int(os.getenv("MESSAGE_RETENTION_DAYS", "90"))  # 0 disables archival
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", os.path.join(os.path.dirname(DB_PATH), "archive"))
+MAINTENANCE_INTERVAL_SECONDS = int(os.getenv("MAINTENANCE_INTERVAL_SECONDS", "21600"))  # Every 6 hours
+VACUUM_PAGES_PER_RUN = int(os.getenv("VACUUM_PAGES_PER_RUN", "0"))  # 0 = reclaim all free pages
+HISTORY_CACHE_USERS = int(os.getenv("HISTORY_CACHE_USERS", "256"))  # Users kept in the history LRU
+HISTORY_CACHE_DEPTH = int(os.getenv("HISTORY_CACHE_DEPTH", "50"))  # Recent messages cached per user
 
 # Parse allowed user IDs
 def parse_allowed_ids(raw: str) -> set[int]:
@@ -44,11 +81,23 @@ def parse_allowed_ids(raw: str) -> set[int]:
 
 ALLOWED_TELEGRAM_IDS = parse_allowed_ids(ALLOWED_TELEGRAM_IDS_RAW)
 
-if not ALLOWED_TELEGRAM_IDS:
-    print("[FATAL] ALLOWED_TELEGRAM_IDS must contain at least one valid integer", file=sys.stderr)
-    sys.exit(1)
 
-# Ensure PROJECT_ROOT exists
-if not os.path.isdir(PROJECT_ROOT):
-    print(f"[FATAL] PROJECT_ROOT does not exist: {PROJECT_ROOT}", file=sys.stderr)
-    sys.exit(1)
+def validate(required: tuple[str, ...] = REQUIRED_VARS):
+    """
+    Exit with a [FATAL] message if required settings are missing or invalid.
+    Called explicitly by entry points rather than on import, so tools and
+    benchmarks can import modules without a full environment.
+    """
+    for name in required:
+        if not os.getenv(name):
+            print(f"[FATAL] Missing required env var: {name}", file=sys.stderr)
+            sys.exit(1)
+
+    if "ALLOWED_TELEGRAM_IDS" in required and not ALLOWED_TELEGRAM_IDS:
+        print("[FATAL] ALLOWED_TELEGRAM_IDS must contain at least one valid integer", file=sys.stderr)
+        sys.exit(1)
+
+    # Ensure PROJECT_ROOT exists
+    if not os.path.isdir(PROJECT_ROOT):
+        print(f"[FATAL] PROJECT_ROOT does not exist: {PROJECT_ROOT}", file=sys.stderr)
+        sys.exit(1)
@@ -1,11 +1,25 @@
 """Database module - SQLite schema and conversation history CRUD."""
 
 import sqlite3
+import gzip
+import itertools
 import json
 import uuid
 import os
-from datetime import datetime
-from config import DB_PATH
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from config import (
+    DB_PATH,
+    MESSAGE_COMPRESS_MIN_BYTES,
+    MESSAGE_RETENTION_DAYS,
+    ARCHIVE_DIR,
+    VACUUM_PAGES_PER_RUN,
+    HISTORY_CACHE_USERS,
+    HISTORY_CACHE_DEPTH,
+)
 
 
 SCHEMA = """
@@ -28,6 +42,7 @@ CREATE TABLE IF NOT EXISTS conversations (
 CREATE TABLE IF NOT EXISTS messages (
     id             INTEGER PRIMARY KEY AUTOINCREMENT,
     conversation_id INTEGER NOT NULL,
+    telegram_id    INTEGER,
     role           TEXT NOT NULL,
     content        TEXT NOT NULL,
     timestamp      TEXT NOT NULL,
@@ -45,14 +60,66 @@ CREATE TABLE IF NOT EXISTS tasks (
     completed_at   TEXT,
     result_path    TEXT,
     error_message  TEXT,
+    payload        TEXT,
+    worker         TEXT,
+    heartbeat_at   REAL,
     FOREIGN KEY (telegram_id) REFERENCES users(telegram_id)
 );
 
+CREATE TABLE IF NOT EXISTS result_cache (
+    cache_key      TEXT PRIMARY KEY,
+    command        TEXT NOT NULL,
+    arguments      TEXT NOT NULL,
+    summary        TEXT NOT NULL,
+    files          TEXT NOT NULL,
+    size_bytes     INTEGER NOT NULL,
+    created_at     TEXT NOT NULL,
+    last_used      TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS task_events (
+    id             INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id        INTEGER NOT NULL,
+    direction      TEXT NOT NULL,
+    kind           TEXT NOT NULL,
+    payload        TEXT NOT NULL,
+    created_at     TEXT NOT NULL,
+    FOREIGN KEY (task_id) REFERENCES tasks(id)
+);
+
+CREATE TABLE IF NOT EXISTS telegram_files (
+    path           TEXT PRIMARY KEY,
+    content_hash   TEXT NOT NULL,
+    file_id        TEXT NOT NULL,
+    uploaded_at    TEXT NOT NULL
+);
+
 CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages(conversation_id);
 CREATE INDEX IF NOT EXISTS idx_tasks_telegram_id ON tasks(telegram_id);
 CREATE INDEX IF NOT EXISTS idx_conversations_telegram_id ON conversations(telegram_id);
+CREATE INDEX IF NOT EXISTS idx_task_events_task ON task_events(task_id, direction, id);
 """
 
+# messages.telegram_id is denormalized from conversations so history lookups
+# can walk a (telegram_id, id) index instead of joining and sorting.
+HISTORY_INDEX = "CREATE INDEX IF NOT EXISTS idx_messages_telegram_id ON messages(telegram_id, id)"
+
+# Retention finds expired messages by age (see archive_old_messages)
+MESSAGE_AGE_INDEX = "CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp)"
+
+# Workers claim the oldest pending task (see claim_task)
+TASK_QUEUE_INDEX = "CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status, id)"
+
+# Stored in PRAGMA user_version at the end of init_db. Bump it when init_db
+# gains a migration, so workers wait for the bot to apply it.
+SCHEMA_VERSION = 1
+
+# Per-user LRU of decoded recent messages, kept current by save_message.
+# Value: (messages oldest-first, complete) where complete means the list holds
+# the user's entire history, so any limit can be served from it.
+_history_cache: OrderedDict[int, tuple[list[dict], bool]] = OrderedDict()
+_history_lock = threading.Lock()
+
 
 def get_connection() -> sqlite3.Connection:
     """Get a database connection."""
@@ -67,46 +134,152 @@ def get_connection() -> sqlite3.Connection:
 
 
 def init_db():
-    """Initialize database schema."""
+    """
+    Initialize database schema and WAL mode. A new database gets incremental
+    auto-vacuum; an existing one is converted by enable_incremental_vacuum().
+    """
     with get_connection() as conn:
+        # auto_vacuum only takes effect on an empty database or after a full VACUUM
+        if conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        # WAL lets worker processes write events while the bot reads them
+        conn.execute("PRAGMA journal_mode = WAL")
         conn.executescript(SCHEMA)
+        _migrate_messages_telegram_id(conn)
+        _migrate_tasks_queue_columns(conn)
+        conn.execute(HISTORY_INDEX)
+        conn.execute(MESSAGE_AGE_INDEX)
+        conn.execute(TASK_QUEUE_INDEX)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def schema_ready() -> bool:
+    """True once init_db has brought the schema up to SCHEMA_VERSION (worker processes wait for it)."""
+    try:
+        with get_connection() as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION
+    except sqlite3.OperationalError:  # Locked while the bot migrates
+        return False
+
+
+def _migrate_messages_telegram_id(conn: sqlite3.Connection):
+    """Add and backfill messages.telegram_id on databases created before it existed."""
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(messages)")}
+    if "telegram_id" not in columns:
+        conn.execute("ALTER TABLE messages ADD COLUMN telegram_id INTEGER")
+    conn.execute("""
+        UPDATE messages SET telegram_id = (
+            SELECT c.telegram_id FROM conversations c WHERE c.id = messages.conversation_id
+        )
+        WHERE telegram_id IS NULL
+    """)
+
+
+def _migrate_tasks_queue_columns(conn: sqlite3.Connection):
+    """Add the worker queue's columns to tasks tables created before it existed."""
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(tasks)")}
+    for name, kind in (("payload", "TEXT"), ("worker", "TEXT"), ("heartbeat_at", "REAL")):
+        if name not in columns:
+            conn.execute(f"ALTER TABLE tasks ADD COLUMN {name} {kind}")
+
+
+def _encode_content(content) -> str | bytes:
+    """
+    Serialize message content for storage.
+    Bodies at or above MESSAGE_COMPRESS_MIN_BYTES are stored as a zlib BLOB,
+    smaller ones as plain JSON text.
+    """
+    encoded = json.dumps(content)
+    raw = encoded.encode("utf-8")
+    if len(raw) >= MESSAGE_COMPRESS_MIN_BYTES:
+        return zlib.compress(raw)
+    return encoded
+
+
+def _decode_content(stored):
+    """Inverse of _encode_content; falls back to the raw string for legacy rows."""
+    if isinstance(stored, bytes):
+        stored = zlib.decompress(stored).decode("utf-8")
+    try:
+        return json.loads(stored)
+    except (json.JSONDecodeError, TypeError):
+        return stored
 
 
 def get_recent_messages(telegram_id: int, limit: int = 20) -> list[dict]:
     """
     Retrieve recent messages for a user for conversation context.
     Returns Anthropic-format messages list (role + content).
+    Served from the in-process history cache when possible.
     """
+    with _history_lock:
+        cached = _history_cache.get(telegram_id)
+        if cached and (cached[1] or len(cached[0]) >= limit):
+            _history_cache.move_to_end(telegram_id)
+            return [dict(m) for m in cached[0][-limit:]] if limit > 0 else []
+
+    depth = max(limit, HISTORY_CACHE_DEPTH)
     with get_connection() as conn:
         rows = conn.execute("""
-            SELECT m.role, m.content
-            FROM messages m
-            JOIN conversations c ON m.conversation_id = c.id
-            WHERE c.telegram_id = ?
-            ORDER BY m.id DESC
+            SELECT role, content
+            FROM messages
+            WHERE telegram_id = ?
+            ORDER BY id DESC
             LIMIT ?
-        """, (telegram_id, limit)).fetchall()
+        """, (telegram_id, depth)).fetchall()
 
     messages = []
     for row in reversed(rows):  # oldest first
-        try:
-            content = json.loads(row["content"])
-        except (json.JSONDecodeError, TypeError):
-            content = row["content"]
         messages.append({
             "role": row["role"],
-            "content": content,
+            "content": _decode_content(row["content"]),
         })
-    return messages
+
+    with _history_lock:
+        _history_cache[telegram_id] = (messages, len(rows) < depth)
+        _history_cache.move_to_end(telegram_id)
+        while len(_history_cache) > HISTORY_CACHE_USERS:
+            _history_cache.popitem(last=False)
+
+    return [dict(m) for m in messages[-limit:]] if limit > 0 else []
+
+
+def _cache_append(telegram_id: int, message: dict):
+    """Write-through: append a saved message to the user's cached history, if cached."""
+    with _history_lock:
+        cached = _history_cache.get(telegram_id)
+        if cached is None:
+            return
+        messages, complete = cached
+        messages.append(message)
+        if len(messages) > HISTORY_CACHE_DEPTH:
+            del messages[:len(messages) - HISTORY_CACHE_DEPTH]
+            complete = False
+        _history_cache[telegram_id] = (messages, complete)
+
+
+def _cache_invalidate(telegram_ids):
+    """Drop cached history for the given users."""
+    with _history_lock:
+        for telegram_id in telegram_ids:
+            _history_cache.pop(telegram_id, None)
 
 
 def save_message(conversation_id: int, role: str, content):
     """Save a message to the database."""
     with get_connection() as conn:
+        row = conn.execute(
+            "SELECT telegram_id FROM conversations WHERE id = ?", (conversation_id,)
+        ).fetchone()
+        telegram_id = row["telegram_id"] if row else None
         conn.execute("""
-            INSERT INTO messages (conversation_id, role, content, timestamp)
-            VALUES (?, ?, ?, ?)
-        """, (conversation_id, role, json.dumps(content), datetime.utcnow().isoformat()))
+            INSERT INTO messages (conversation_id, telegram_id, role, content, timestamp)
+            VALUES (?, ?, ?, ?, ?)
+        """, (conversation_id, telegram_id, role, _encode_content(content), datetime.utcnow().isoformat()))
+
+    if telegram_id is not None:
+        # Round-trip through JSON so cached content matches what a DB read returns
+        _cache_append(telegram_id, {"role": role, "content": json.loads(json.dumps(content))})
 
 
 def create_or_get_session(telegram_id: int) -> int:
@@ -141,3 +314,351 @@ def register_user(telegram_id: int, username: str | None):
                 INSERT INTO users (telegram_id, username, first_seen, last_active, is_allowed)
                 VALUES (?, ?, ?, ?, ?)
             """, (telegram_id, username, datetime.utcnow().isoformat(), datetime.utcnow().isoformat(), 1))
+
+
+def archive_old_messages(retention_days: int = MESSAGE_RETENTION_DAYS) -> dict:
+    """
+    Move messages older than `retention_days` days to a gzip-compressed JSONL
+    file in ARCHIVE_DIR (one line per conversation), then delete them from the
+    database. Users keep one conversation forever (see create_or_get_session),
+    so expiry is per message; old conversations left empty are removed too,
+    except each user's current one.
+    Returns counts and the archive path (None if nothing was archived).
+    """
+    result = {"conversations": 0, "messages": 0, "path": None}
+    if retention_days <= 0:
+        return result
+
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).isoformat()
+    with get_connection() as conn:
+        rows = conn.execute("""
+            SELECT m.id, m.conversation_id, m.role, m.content, m.timestamp,
+                   c.telegram_id, c.session_id, c.created_at
+            FROM messages m
+            JOIN conversations c ON c.id = m.conversation_id
+            WHERE m.timestamp < ?
+            ORDER BY m.conversation_id, m.id
+        """, (cutoff,)).fetchall()
+
+        if rows:
+            os.makedirs(ARCHIVE_DIR, exist_ok=True)
+            path = os.path.join(ARCHIVE_DIR, f"messages-{datetime.utcnow():%Y%m%d-%H%M%S}.jsonl.gz")
+            with gzip.open(path, "wt", encoding="utf-8") as f:
+                for _, group in itertools.groupby(rows, key=lambda row: row["conversation_id"]):
+                    group = list(group)
+                    f.write(json.dumps({
+                        "telegram_id": group[0]["telegram_id"],
+                        "session_id": group[0]["session_id"],
+                        "created_at": group[0]["created_at"],
+                        "messages": [
+                            {"role": r["role"], "content": _decode_content(r["content"]), "timestamp": r["timestamp"]}
+                            for r in group
+                        ],
+                    }) + "\n")
+            # Only delete once the archive file has been fully written
+            conn.executemany("DELETE FROM messages WHERE id = ?", [(row["id"],) for row in rows])
+            result["messages"] = len(rows)
+            result["path"] = path
+
+        emptied = conn.execute("""
+            SELECT id, telegram_id FROM conversations c
+            WHERE created_at < ?
+              AND NOT EXISTS (SELECT 1 FROM messages m WHERE m.conversation_id = c.id)
+              AND id NOT IN (SELECT MAX(id) FROM conversations GROUP BY telegram_id)
+        """, (cutoff,)).fetchall()
+        conn.executemany("DELETE FROM conversations WHERE id = ?", [(conv["id"],) for conv in emptied])
+        result["conversations"] = len(emptied)
+
+    _cache_invalidate({row["telegram_id"] for row in rows})
+    return result
+
+
+def incremental_vacuum_enabled() -> bool:
+    """True if the database uses incremental auto-vacuum."""
+    with get_connection() as conn:
+        return conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+
+def enable_incremental_vacuum():
+    """
+    Switch an existing database to incremental auto-vacuum. This runs a full
+    VACUUM, which rewrites the whole file and needs up to twice its size in
+    free disk space.
+    """
+    conn = get_connection()
+    try:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+def incremental_vacuum(pages: int = VACUUM_PAGES_PER_RUN) -> int:
+    """Return free pages to the filesystem. pages=0 reclaims all of them. Returns pages freed."""
+    conn = get_connection()
+    try:
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if pages > 0:
+            conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+        else:
+            conn.execute("PRAGMA incremental_vacuum").fetchall()
+        after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return before - after
+    finally:
+        conn.close()
+
+
+def size_report(recent_days: int = 7) -> dict:
+    """
+    Summarize database size and per-user storage.
+    `recent_bytes` is the volume of messages stored in the last `recent_days` days.
+    """
+    since = (datetime.utcnow() - timedelta(days=recent_days)).isoformat()
+    with get_connection() as conn:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        rows = conn.execute("""
+            SELECT c.telegram_id, u.username,
+                   COUNT(DISTINCT c.id) AS conversations,
+                   COUNT(m.id) AS messages,
+                   COALESCE(SUM(length(CAST(m.content AS BLOB))), 0) AS stored_bytes,
+                   COALESCE(SUM(CASE WHEN m.timestamp >= ? THEN length(CAST(m.content AS BLOB)) END), 0) AS recent_bytes
+            FROM conversations c
+            LEFT JOIN users u ON u.telegram_id = c.telegram_id
+            LEFT JOIN messages m ON m.conversation_id = c.id
+            GROUP BY c.telegram_id
+            ORDER BY stored_bytes DESC
+        """, (since,)).fetchall()
+
+    archive_bytes = 0
+    if os.path.isdir(ARCHIVE_DIR):
+        for name in os.listdir(ARCHIVE_DIR):
+            archive_bytes += os.path.getsize(os.path.join(ARCHIVE_DIR, name))
+
+    return {
+        "db_bytes": page_size * page_count,
+        "incremental_vacuum": incremental_vacuum_enabled(),
+        "free_bytes": page_size * freelist,
+        "archive_bytes": archive_bytes,
+        "recent_days": recent_days,
+        "users": [dict(row) for row in rows],
+    }
+
+
+def get_cached_result(cache_key: str, max_age_seconds: int) -> dict | None:
+    """Return a fresh result cache entry (summary, files, created_at) and mark it used."""
+    cutoff = (datetime.utcnow() - timedelta(seconds=max_age_seconds)).isoformat()
+    with get_connection() as conn:
+        row = conn.execute("""
+            SELECT summary, files, created_at FROM result_cache
+            WHERE cache_key = ? AND created_at >= ?
+        """, (cache_key, cutoff)).fetchone()
+        if not row:
+            return None
+        conn.execute(
+            "UPDATE result_cache SET last_used = ? WHERE cache_key = ?",
+            (datetime.utcnow().isoformat(), cache_key),
+        )
+    return {"summary": row["summary"], "files": json.loads(row["files"]), "created_at": row["created_at"]}
+
+
+def put_cached_result(cache_key: str, command: str, arguments: str, summary: str, files: list[str], size_bytes: int):
+    """Insert or replace a result cache entry."""
+    now = datetime.utcnow().isoformat()
+    with get_connection() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO result_cache
+                (cache_key, command, arguments, summary, files, size_bytes, created_at, last_used)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (cache_key, command, arguments, summary, json.dumps(files), size_bytes, now, now))
+
+
+def list_cached_results() -> list[dict]:
+    """All result cache entries, least recently used first."""
+    with get_connection() as conn:
+        rows = conn.execute("""
+            SELECT cache_key, size_bytes, created_at, last_used FROM result_cache
+            ORDER BY last_used ASC
+        """).fetchall()
+    return [dict(row) for row in rows]
+
+
+def delete_cached_results(cache_keys: list[str]):
+    """Remove result cache entries."""
+    with get_connection() as conn:
+        conn.executemany("DELETE FROM result_cache WHERE cache_key = ?", [(k,) for k in cache_keys])
+
+
+def get_telegram_file_id(path: str, content_hash: str) -> str | None:
+    """Return the file_id uploaded for this path and content; drops the entry if the content changed."""
+    with get_connection() as conn:
+        row = conn.execute(
+            "SELECT content_hash, file_id FROM telegram_files WHERE path = ?", (path,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row["content_hash"] != content_hash:
+            conn.execute("DELETE FROM telegram_files WHERE path = ?", (path,))
+            return None
+    return row["file_id"]
+
+
+def put_telegram_file_id(path: str, content_hash: str, file_id: str):
+    """Remember the file_id Telegram returned for an upload."""
+    with get_connection() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO telegram_files (path, content_hash, file_id, uploaded_at)
+            VALUES (?, ?, ?, ?)
+        """, (path, content_hash, file_id, datetime.utcnow().isoformat()))
+
+
+def forget_telegram_file_id(path: str):
+    """Drop a file_id Telegram no longer accepts."""
+    with get_connection() as conn:
+        conn.execute("DELETE FROM telegram_files WHERE path = ?", (path,))
+
+
+def prune_telegram_files(archive_max_age_days: int = 30) -> int:
+    """
+    Remove file_id entries for files that no longer exist, and archive
+    entries older than `archive_max_age_days`. Returns rows removed.
+    """
+    cutoff = (datetime.utcnow() - timedelta(days=archive_max_age_days)).isoformat()
+    with get_connection() as conn:
+        paths = [row["path"] for row in conn.execute("SELECT path FROM telegram_files")]
+        missing = [(p,) for p in paths if os.path.isabs(p) and not os.path.exists(p)]
+        conn.executemany("DELETE FROM telegram_files WHERE path = ?", missing)
+        cursor = conn.execute(
+            "DELETE FROM telegram_files WHERE path LIKE 'archive:%' AND uploaded_at < ?", (cutoff,)
+        )
+    return len(missing) + cursor.rowcount
+
+
+def enqueue_task(telegram_id: int, chat_id: int, command: str, arguments: str, payload: dict) -> int:
+    """Queue a review for a worker process. Returns the task id."""
+    with get_connection() as conn:
+        cursor = conn.execute("""
+            INSERT INTO tasks (telegram_id, chat_id, command, arguments, status, payload)
+            VALUES (?, ?, ?, ?, 'pending', ?)
+        """, (telegram_id, chat_id, command, arguments, json.dumps(payload)))
+    return cursor.lastrowid
+
+
+def claim_task(worker: str) -> dict | None:
+    """Atomically mark the oldest pending task as running for `worker` and return it."""
+    conn = get_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("""
+            SELECT id, telegram_id, chat_id, command, arguments, payload FROM tasks
+            WHERE status = 'pending' ORDER BY id LIMIT 1
+        """).fetchone()
+        if row:
+            conn.execute("""
+                UPDATE tasks SET status = 'running', worker = ?, started_at = ?, heartbeat_at = ?
+                WHERE id = ?
+            """, (worker, datetime.utcnow().isoformat(), time.time(), row["id"]))
+        conn.commit()
+    finally:
+        conn.close()
+    if not row:
+        return None
+    task = dict(row)
+    task["payload"] = json.loads(task["payload"] or "{}")
+    return task
+
+
+def heartbeat_tasks(task_ids: list[int]):
+    """Record that a worker is still running these tasks."""
+    now = time.time()
+    with get_connection() as conn:
+        conn.executemany("UPDATE tasks SET heartbeat_at = ? WHERE id = ?", [(now, i) for i in task_ids])
+
+
+def get_task_state(task_id: int) -> dict | None:
+    """Status and seconds since the last worker heartbeat."""
+    with get_connection() as conn:
+        row = conn.execute("SELECT status, heartbeat_at FROM tasks WHERE id = ?", (task_id,)).fetchone()
+    if row is None:
+        return None
+    idle = time.time() - row["heartbeat_at"] if row["heartbeat_at"] else 0.0
+    return {"status": row["status"], "idle_seconds": idle}
+
+
+def finish_task(task_id: int, status: str, error_message: str | None = None):
+    """Mark a task done, failed or cancelled."""
+    with get_connection() as conn:
+        conn.execute("""
+            UPDATE tasks SET status = ?, completed_at = ?, error_message = ? WHERE id = ?
+        """, (status, datetime.utcnow().isoformat(), error_message, task_id))
+
+
+def cancel_task(task_id: int):
+    """Cancel a task: pending ones never start, running ones get a cancel event for their worker."""
+    with get_connection() as conn:
+        cursor = conn.execute("""
+            UPDATE tasks SET status = 'cancelled', completed_at = ? WHERE id = ? AND status = 'pending'
+        """, (datetime.utcnow().isoformat(), task_id))
+        if cursor.rowcount == 0:
+            conn.execute("""
+                INSERT INTO task_events (task_id, direction, kind, payload, created_at)
+                VALUES (?, 'down', 'cancel', '{}', ?)
+            """, (task_id, datetime.utcnow().isoformat()))
+
+
+def fail_pending_task(task_id: int, error_message: str) -> bool:
+    """Fail a task that no worker has claimed yet. Returns False if one claimed it meanwhile."""
+    with get_connection() as conn:
+        cursor = conn.execute("""
+            UPDATE tasks SET status = 'failed', completed_at = ?, error_message = ? WHERE id = ? AND status = 'pending'
+        """, (datetime.utcnow().isoformat(), error_message, task_id))
+    return cursor.rowcount > 0
+
+
+def post_task_event(task_id: int, direction: str, kind: str, payload: dict):
+    """
+    Append an event to a task's stream. 'up' events flow from the worker to
+    the bot (progress, ask, result, error); 'down' events flow to the worker
+    (reply, cancel).
+    """
+    with get_connection() as conn:
+        conn.execute("""
+            INSERT INTO task_events (task_id, direction, kind, payload, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (task_id, direction, kind, json.dumps(payload), datetime.utcnow().isoformat()))
+
+
+def read_task_events(task_ids: list[int], direction: str, after_id: int = 0) -> list[dict]:
+    """Events for the given tasks and direction with id > after_id, oldest first."""
+    if not task_ids:
+        return []
+    placeholders = ",".join("?" * len(task_ids))
+    with get_connection() as conn:
+        rows = conn.execute(f"""
+            SELECT id, task_id, kind, payload FROM task_events
+            WHERE task_id IN ({placeholders}) AND direction = ? AND id > ?
+            ORDER BY id
+        """, (*task_ids, direction, after_id)).fetchall()
+    return [{**dict(row), "payload": json.loads(row["payload"])} for row in rows]
+
+
+def delete_task_events(task_id: int):
+    """Drop a finished task's event stream."""
+    with get_connection() as conn:
+        conn.execute("DELETE FROM task_events WHERE task_id = ?", (task_id,))
+
+
+def prune_tasks(max_age_days: int = 7) -> int:
+    """Remove finished task rows and their events older than `max_age_days`. Returns rows removed."""
+    cutoff = (datetime.utcnow() - timedelta(days=max_age_days)).isoformat()
+    with get_connection() as conn:
+        conn.execute("""
+            DELETE FROM task_events WHERE task_id IN (
+                SELECT id FROM tasks WHERE status IN ('done', 'failed', 'cancelled') AND completed_at < ?
+            )
+        """, (cutoff,))
+        cursor = conn.execute("""
+            DELETE FROM tasks WHERE status IN ('done', 'failed', 'cancelled') AND completed_at < ?
+        """, (cutoff,))
+    return cursor.rowcount
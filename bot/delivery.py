@@ -1,74 +1,252 @@
 """Result delivery - send summary and file attachments to Telegram."""
 
+import asyncio
+import hashlib
+import io
 import os
-import glob
+import re
+import zipfile
 from datetime import date
-from telegram import Bot
-from config import PROJECT_ROOT
+from telegram import Bot, InputMediaDocument
+from config import PROJECT_ROOT, DELIVERY_ZIP_MIN_FILES
+from database import get_telegram_file_id, put_telegram_file_id, forget_telegram_file_id
 
 TELEGRAM_TEXT_LIMIT = 3800
 
+# Telegram accepts 2-10 items per media group
+MEDIA_GROUP_MAX = 10
 
-async def deliver_result(bot: Bot, chat_id: int, summary_text: str, command: str, arguments: str):
+# Documents uploaded at once when falling back to individual sends
+MAX_CONCURRENT_UPLOADS = 4
+
+
+async def deliver_result(
+    bot: Bot,
+    chat_id: int,
+    summary_text: str,
+    command: str,
+    arguments: str,
+    files: list[str],
+) -> list[str]:
     """
     Send the review results to Telegram.
 
-    1. Send summary text (≤3800 chars) as Markdown message
-    2. Find and send output files as document attachments
+    1. Send summary text as Markdown, split across messages on markdown boundaries
+    2. Send `files` (the task's output manifest): one file as a document,
+       up to MEDIA_GROUP_MAX per media group, or a single zip archive when
+       there are at least DELIVERY_ZIP_MIN_FILES
+
+    Returns the list of files that were sent.
     """
 
     # Send summary text
-    if len(summary_text) <= TELEGRAM_TEXT_LIMIT:
+    for chunk in split_markdown(summary_text, TELEGRAM_TEXT_LIMIT):
+        await _send_text(bot, chat_id, chunk)
+
+    files_to_send = [path for path in files if os.path.isfile(path)]
+
+    if not files_to_send:
         await bot.send_message(
             chat_id=chat_id,
-            text=summary_text,
+            text="📄 *Note*: Full review files will be available in the output folder.",
             parse_mode="Markdown",
         )
+        return []
+
+    if len(files_to_send) >= DELIVERY_ZIP_MIN_FILES:
+        await _send_archive(bot, chat_id, files_to_send, command)
+    elif len(files_to_send) == 1:
+        await _send_documents(bot, chat_id, files_to_send)
     else:
-        # Truncate if needed
-        truncated = summary_text[:TELEGRAM_TEXT_LIMIT] + "\n\n...[truncated]"
-        await bot.send_message(
-            chat_id=chat_id,
-            text=truncated,
-            parse_mode="Markdown",
-        )
+        for i in range(0, len(files_to_send), MEDIA_GROUP_MAX):
+            await _send_media_group(bot, chat_id, files_to_send[i:i + MEDIA_GROUP_MAX])
 
-    # Find and send output files
-    today = date.today().isoformat()
-    output_dirs = [
-        os.path.join(PROJECT_ROOT, "reviews"),
-        os.path.join(PROJECT_ROOT, "social-reviews"),
-    ]
+    return files_to_send
+
+
+def split_markdown(text: str, limit: int) -> list[str]:
+    """
+    Split text into chunks of at most `limit` characters, preferring paragraph
+    then line boundaries. A chunk that ends inside a ``` fence is closed and
+    the fence is reopened at the start of the next chunk.
+    """
+    if len(text) <= limit:
+        return [text]
 
-    files_to_send = []
-    for output_dir in output_dirs:
-        if not os.path.isdir(output_dir):
+    budget = limit - len("\n```")  # Leave room to close an open fence
+    chunks = []
+    current = ""
+    in_fence = False
+    for piece in _pieces(text, budget - len("```\n")):
+        if current and len(current) + len(piece) > budget:
+            chunks.append(current.rstrip("\n") + ("\n```" if in_fence else ""))
+            current = "```\n" if in_fence else ""
+        current += piece
+        fences = sum(1 for line in piece.splitlines() if line.lstrip().startswith("```"))
+        in_fence ^= fences % 2 == 1
+    if current.strip():
+        chunks.append(current.rstrip("\n"))
+    return chunks
+
+
+def _pieces(text: str, size: int) -> list[str]:
+    """Break text into paragraphs, or lines/slices where a paragraph exceeds `size`."""
+    pieces = []
+    for paragraph in re.split(r"(?<=\n\n)", text):
+        if len(paragraph) <= size:
+            pieces.append(paragraph)
             continue
-        pattern = os.path.join(output_dir, "**", f"*{today}*.md")
-        matches = glob.glob(pattern, recursive=True)
-        files_to_send.extend(matches)
+        for line in paragraph.splitlines(keepends=True):
+            while len(line) > size:
+                pieces.append(line[:size])
+                line = line[size:]
+            if line:
+                pieces.append(line)
+    return pieces
 
-    if not files_to_send:
-        await bot.send_message(
-            chat_id=chat_id,
-            text="📄 *Note*: Full review files will be available in the output folder.",
-            parse_mode="Markdown",
-        )
-        return
 
-    # Send each file as a document
-    for filepath in sorted(files_to_send):
-        filename = os.path.basename(filepath)
+async def _send_text(bot: Bot, chat_id: int, text: str):
+    """Send Markdown text, falling back to plain text if Telegram rejects the markup."""
+    try:
+        await bot.send_message(chat_id=chat_id, text=text, parse_mode="Markdown")
+    except Exception:
+        await bot.send_message(chat_id=chat_id, text=text)
+
+
+def _file_hash(path: str) -> str:
+    """SHA-256 of a file's contents."""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+async def _send_document(bot: Bot, chat_id: int, key: str, content_hash: str, filename: str,
+                         load, caption: str):
+    """
+    Send one document, by cached file_id when this exact content was uploaded
+    before, otherwise by uploading load()'s bytes and remembering the file_id.
+    load() runs in a thread (it may read or zip many files) and only on a cache miss.
+    """
+    file_id = get_telegram_file_id(key, content_hash)
+    if file_id:
         try:
-            with open(filepath, "rb") as f:
-                await bot.send_document(
+            await bot.send_document(chat_id=chat_id, document=file_id, caption=caption)
+            return
+        except Exception:
+            forget_telegram_file_id(key)  # Expired or foreign file_id; upload instead
+    message = await bot.send_document(
+        chat_id=chat_id,
+        document=await asyncio.to_thread(load),
+        filename=filename,
+        caption=caption,
+    )
+    if message.document:
+        put_telegram_file_id(key, content_hash, message.document.file_id)
+
+
+async def _send_documents(bot: Bot, chat_id: int, files: list[str]):
+    """Send files as individual documents, a few at a time."""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_UPLOADS)
+
+    async def send_file(filepath: str):
+        filename = os.path.basename(filepath)
+        async with semaphore:
+            try:
+                await _send_document(
+                    bot, chat_id, filepath, await asyncio.to_thread(_file_hash, filepath), filename,
+                    lambda: _read_bytes(filepath), f"📋 {filename}",
+                )
+            except Exception as e:
+                await bot.send_message(
                     chat_id=chat_id,
-                    document=f,
-                    filename=filename,
-                    caption=f"📋 {filename}",
+                    text=f"⚠️ Could not send file {filename}: {e}",
                 )
-        except Exception as e:
-            await bot.send_message(
-                chat_id=chat_id,
-                text=f"⚠️ Could not send file {filename}: {e}",
-            )
+
+    await asyncio.gather(*(send_file(path) for path in files))
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+async def _send_media_group(bot: Bot, chat_id: int, files: list[str]):
+    """
+    Send 2-10 files in one media group call, reusing cached file_ids where the
+    content is unchanged, and falling back to individual sends.
+    """
+    if len(files) < 2:
+        await _send_documents(bot, chat_id, files)
+        return
+    media, uploads = await asyncio.to_thread(_build_media_group, files)
+    try:
+        messages = await bot.send_media_group(chat_id=chat_id, media=media)
+    except Exception:
+        await _send_documents(bot, chat_id, files)
+        return
+    for i, message in enumerate(messages):
+        if i in uploads and message.document:
+            put_telegram_file_id(*uploads[i], message.document.file_id)
+
+
+def _build_media_group(files: list[str]) -> tuple[list[InputMediaDocument], dict[int, tuple[str, str]]]:
+    """
+    Hash each file and use its cached file_id, reading the bytes of the rest.
+    Returns the media items and, for items sent as bytes, index -> (path, content hash).
+    """
+    media = []
+    uploads = {}
+    for i, filepath in enumerate(files):
+        filename = os.path.basename(filepath)
+        content_hash = _file_hash(filepath)
+        file_id = get_telegram_file_id(filepath, content_hash)
+        if file_id is None:
+            uploads[i] = (filepath, content_hash)
+        media.append(InputMediaDocument(
+            media=file_id or _read_bytes(filepath),
+            filename=filename,
+            caption=f"📋 {filename}",
+        ))
+    return media, uploads
+
+
+def build_archive(files: list[str]) -> bytes:
+    """Zip files with paths relative to their common directory."""
+    root = os.path.commonpath([os.path.dirname(path) for path in files])
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=9) as archive:
+        for path in files:
+            archive.write(path, arcname=os.path.relpath(path, root))
+    return buffer.getvalue()
+
+
+def _archive_name(files: list[str], command: str) -> str:
+    """Name the archive after the reviewed domain/brand folder where possible."""
+    rel = os.path.relpath(os.path.commonpath(files), PROJECT_ROOT).split(os.sep)
+    label = rel[1] if len(rel) > 1 and rel[0] in ("reviews", "social-reviews") else command
+    return f"{label}-{date.today().isoformat()}.zip"
+
+
+def _members_hash(files: list[str]) -> str:
+    """Hash of an archive's member paths and contents."""
+    members = hashlib.sha256()
+    for path in sorted(files):
+        members.update(f"{path}\0{_file_hash(path)}\n".encode("utf-8"))
+    return members.hexdigest()
+
+
+async def _send_archive(bot: Bot, chat_id: int, files: list[str], command: str):
+    """
+    Send many files as one compressed archive, falling back to media groups.
+    The archive's file_id is cached against the hashes of its members, so it
+    is only rebuilt and uploaded when a member changes.
+    """
+    filename = _archive_name(files, command)
+    content_hash = await asyncio.to_thread(_members_hash, files)
+    try:
+        await _send_document(
+            bot, chat_id, f"archive:{filename}", content_hash, filename,
+            lambda: build_archive(files), f"🗂 {filename} ({len(files)} files)",
+        )
+    except Exception:
+        for i in range(0, len(files), MEDIA_GROUP_MAX):
+            await _send_media_group(bot, chat_id, files[i:i + MEDIA_GROUP_MAX])
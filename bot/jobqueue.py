@@ -0,0 +1,99 @@
+"""Job queue client - hand agent runs to worker processes through SQLite.
+
+With TASK_EXECUTION=queue the bot process only ingests updates, schedules,
+delivers and edits status messages; the agent loop and its tool subprocesses
+run in bot/worker.py processes sharing the database and PROJECT_ROOT.
+
+A task row carries the request; the worker streams 'up' events back
+(progress, ask, result, error) and reads 'down' events (reply, cancel).
+A task no worker claims within QUEUE_PENDING_TIMEOUT_SECONDS fails, so a
+missing worker doesn't hold a scheduler slot forever.
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+
+from config import QUEUE_PENDING_TIMEOUT_SECONDS, QUEUE_POLL_SECONDS, WORKER_STALE_SECONDS
+from database import (
+    enqueue_task,
+    read_task_events,
+    post_task_event,
+    delete_task_events,
+    get_task_state,
+    cancel_task,
+    fail_pending_task,
+    finish_task,
+)
+from runner import ReviewOutcome
+
+
+async def run_remote(
+    chat_id: int,
+    telegram_id: int,
+    command: str,
+    arguments: str,
+    system_prompt: str,
+    history: list[dict],
+    progress_callback: Callable[[str], Awaitable[None]],
+    ask_user: Callable[[str], Awaitable[Optional[str]]],
+    cache_scope: Optional[str] = None,
+    fresh: bool = False,
+) -> tuple[ReviewOutcome, list[str]]:
+    """
+    Run a review on a worker and relay its events. The worker checks the
+    result cache itself (see runner.execute_review), so the page is fetched
+    once, by the process that runs the agent.
+    Returns (outcome, output files). Cancelling the caller cancels the task on the worker.
+    """
+    payload = {"system_prompt": system_prompt, "history": history, "cache_scope": cache_scope, "fresh": fresh}
+    task_id = await asyncio.to_thread(enqueue_task, telegram_id, chat_id, command, arguments, payload)
+    enqueued_at = time.monotonic()
+    cursor = 0
+    ended = False  # Worker marked the task finished; drain its last events once more
+    cancelled = False
+    try:
+        while True:
+            events = await asyncio.to_thread(read_task_events, [task_id], "up", cursor)
+            for event in events:
+                cursor = event["id"]
+                kind, data = event["kind"], event["payload"]
+                if kind == "progress":
+                    await progress_callback(data["line"])
+                elif kind == "ask":
+                    reply = await ask_user(data["question"])
+                    if reply is None:
+                        cancelled = True
+                        await asyncio.to_thread(cancel_task, task_id)
+                        return ReviewOutcome(None), []
+                    await asyncio.to_thread(post_task_event, task_id, "down", "reply", {"text": reply})
+                elif kind == "result":
+                    outcome = ReviewOutcome(data["text"], data.get("cache_key"), data.get("cached"))
+                    return outcome, data["files"]
+                elif kind == "error":
+                    raise RuntimeError(data["message"])
+            if events:
+                continue
+            if ended:
+                raise RuntimeError("Worker dropped the task")
+            state = await asyncio.to_thread(get_task_state, task_id)
+            if state is None or state["status"] in ("done", "failed", "cancelled"):
+                ended = True
+                continue
+            if state["status"] == "running" and state["idle_seconds"] > WORKER_STALE_SECONDS:
+                await asyncio.to_thread(finish_task, task_id, "failed", "worker heartbeat lost")
+                raise RuntimeError("Worker stopped responding")
+            if state["status"] == "pending" and time.monotonic() - enqueued_at > QUEUE_PENDING_TIMEOUT_SECONDS:
+                message = f"No worker picked up the task in {QUEUE_PENDING_TIMEOUT_SECONDS}s; is bot/worker.py running?"
+                if await asyncio.to_thread(fail_pending_task, task_id, message):
+                    raise RuntimeError(message)
+                continue  # Claimed just now
+            await asyncio.sleep(QUEUE_POLL_SECONDS)
+    except asyncio.CancelledError:
+        cancelled = True
+        # Shielded so the cancel is written even though this coroutine is being cancelled
+        await asyncio.shield(asyncio.to_thread(cancel_task, task_id))
+        raise
+    finally:
+        if not cancelled:  # A cancelled task's worker reads the cancel event, then clears the stream
+            await asyncio.to_thread(delete_task_events, task_id)
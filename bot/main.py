@@ -2,19 +2,38 @@
 
 import asyncio
 import logging
+from concurrent.futures import Future, ThreadPoolExecutor
 from telegram import Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
 
 import config
 import access
 import database
-from tasks import run_review_task, enqueue_user_reply
+from maintenance import maintenance_loop
+from progress import broadcaster
+from scheduler import Job, scheduler
+from result_cache import split_fresh_flag
+from tasks import (
+    run_review_task,
+    enqueue_user_reply,
+    Subscriber,
+    join_inflight,
+    inflight_subscribers,
+    abandon_inflight,
+    detach_inflight,
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize database
-database.init_db()
+# Only plain messages reach the handlers below (commands and ASK_USER replies)
+ALLOWED_UPDATES = [Update.MESSAGE]
+
+# Scheduled review jobs -> (command, arguments), for /cancel from any subscriber
+_scheduled: dict[Job, tuple[str, str]] = {}
+
+# Schema setup, started by main() and awaited in post_init before any update is handled
+_db_ready: Future | None = None
 
 # Welcome message
 WELCOME_MESSAGE = """
@@ -24,9 +43,10 @@ Your AI-powered marketing assistant for website optimization, social media analy
 
 **Current Features:**
 
-📄 `/review_page <url>`
+📄 `/review_page <url> [--fresh]`
 Analyze a single page for SEO, CRO, and content quality
 _Example: `/review_page https://example.com`_
+_Unchanged pages reuse the last result; add `--fresh` to force a new review_
 
 📋 `/brief <description>`
 Get a general analysis with auto-detection of scope
@@ -36,6 +56,9 @@ _Example: `/brief Analyze homepage for SEO issues`_
 Analyze Meta social media performance (campaigns & organic)
 _Example: `/social_review my-brand`_
 
+🛑 `/cancel [task]`
+Stop a running or queued task
+
 **How It Works:**
 1️⃣ Send a command with your request
 2️⃣ Bot analyzes and shows progress updates
@@ -75,6 +98,85 @@ async def check_access(update: Update) -> bool:
     return True
 
 
+def _queued_text(job_id: int, position: int, eta_seconds: float) -> str:
+    """Status text for a job waiting for a free slot."""
+    minutes = max(1, round(eta_seconds / 60))
+    return (
+        f"🕒 Task #{job_id} queued — position {position}.\n"
+        f"Estimated start in ~{minutes} min. Send /cancel {job_id} to drop it."
+    )
+
+
+async def _schedule_review(update: Update, context: ContextTypes.DEFAULT_TYPE, command: str, arguments: str, status_msg):
+    """
+    Submit a review task to the scheduler, keeping the status message updated while queued.
+    Identical requests already in flight are joined instead of run again.
+    """
+    bot = context.bot
+    chat_id = update.effective_chat.id
+    telegram_id = update.effective_user.id
+    arguments, fresh = split_fresh_flag(arguments)
+
+    if join_inflight(command, arguments, Subscriber(chat_id, telegram_id, status_msg)):
+        broadcaster.publish(
+            chat_id,
+            status_msg.message_id,
+            "🔗 The same request is already running — you'll get its result too.",
+            immediate=True,
+        )
+        return
+
+    async def on_status(job, position: int, eta_seconds: float):
+        if position == 0:
+            text = f"⏳ Task #{job.seq} starting now, please wait..."
+        else:
+            text = _queued_text(job.seq, position, eta_seconds)
+        for sub in inflight_subscribers(command, arguments):
+            broadcaster.publish(sub.chat_id, sub.status_message.message_id, text, immediate=True)
+
+    async def on_cancel(job):
+        _scheduled.pop(job, None)
+        abandon_inflight(command, arguments, "🛑 Cancelled.")
+
+    async def run():
+        try:
+            await run_review_task(
+                bot=bot,
+                chat_id=chat_id,
+                telegram_id=telegram_id,
+                command=command,
+                arguments=arguments,
+                status_message=status_msg,
+                fresh=fresh,
+            )
+        finally:
+            _scheduled.pop(job, None)
+
+    job = scheduler.submit(
+        telegram_id=telegram_id,
+        command=command,
+        run=run,
+        on_status=on_status,
+        on_cancel=on_cancel,
+        description=f"/{command.replace('-', '_')} {arguments}".strip(),
+    )
+    _scheduled[job] = (command, arguments)
+
+
+def _cancellable_jobs(telegram_id: int) -> list[Job]:
+    """
+    Jobs the user is waiting on: requests they subscribe to (their own or one
+    they joined), plus their own jobs that are already delivering.
+    """
+    jobs = []
+    for job, (command, arguments) in _scheduled.items():
+        subscribers = inflight_subscribers(command, arguments)
+        if any(sub.telegram_id == telegram_id for sub in subscribers) or (
+                not subscribers and job.telegram_id == telegram_id):
+            jobs.append(job)
+    return sorted(jobs, key=lambda job: job.seq)
+
+
 async def cmd_review_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /review_page command."""
     if not await check_access(update):
@@ -86,16 +188,7 @@ async def cmd_review_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     status_msg = await update.message.reply_text("⏳ Starting review, please wait...")
-    asyncio.create_task(
-        run_review_task(
-            bot=context.bot,
-            chat_id=update.effective_chat.id,
-            telegram_id=update.effective_user.id,
-            command="review-page",
-            arguments=args,
-            status_message=status_msg,
-        )
-    )
+    await _schedule_review(update, context, "review-page", args, status_msg)
 
 
 async def cmd_brief(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -109,16 +202,7 @@ async def cmd_brief(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     status_msg = await update.message.reply_text("⏳ Processing brief, please wait...")
-    asyncio.create_task(
-        run_review_task(
-            bot=context.bot,
-            chat_id=update.effective_chat.id,
-            telegram_id=update.effective_user.id,
-            command="brief",
-            arguments=args,
-            status_message=status_msg,
-        )
-    )
+    await _schedule_review(update, context, "brief", args, status_msg)
 
 
 async def cmd_social_review(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -128,16 +212,45 @@ async def cmd_social_review(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     args = " ".join(context.args) if context.args else ""
     status_msg = await update.message.reply_text("⏳ Starting social review, please wait...")
-    asyncio.create_task(
-        run_review_task(
-            bot=context.bot,
-            chat_id=update.effective_chat.id,
-            telegram_id=update.effective_user.id,
-            command="social-review",
-            arguments=args,
-            status_message=status_msg,
+    await _schedule_review(update, context, "social-review", args, status_msg)
+
+
+async def cmd_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /cancel [task] - abort one of the user's running or queued tasks."""
+    if not await check_access(update):
+        return
+
+    telegram_id = update.effective_user.id
+    jobs = _cancellable_jobs(telegram_id)
+    if not jobs:
+        await update.message.reply_text("Nothing to cancel — you have no running or queued tasks.")
+        return
+
+    if context.args:
+        wanted = context.args[0].lstrip("#")
+        job = next((j for j in jobs if str(j.seq) == wanted), None)
+        if job is None:
+            await update.message.reply_text(f"No task #{wanted} of yours is running or queued.")
+            return
+    elif len(jobs) == 1:
+        job = jobs[0]
+    else:
+        listing = "\n".join(
+            f"#{j.seq} {'▶️' if j.started_at else '🕒'} {j.description[:60]}" for j in jobs
         )
-    )
+        await update.message.reply_text(f"Which task? Send /cancel <number>:\n\n{listing}")
+        return
+
+    # Others waiting on a coalesced request keep it running; only this user stops waiting
+    command, arguments = _scheduled.get(job, (None, None))
+    if command is not None and not detach_inflight(command, arguments, telegram_id, "🛑 Cancelled."):
+        await update.message.reply_text(
+            f"🛑 Stopped waiting for task #{job.seq}; it keeps running for the others who requested it."
+        )
+    elif scheduler.cancel(job):
+        await update.message.reply_text(f"🛑 Cancelling task #{job.seq}...")
+    else:
+        await update.message.reply_text(f"Task #{job.seq} already finished.")
 
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -149,21 +262,50 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     enqueue_user_reply(update.effective_user.id, update.message.text)
 
 
+async def post_init(app: Application):
+    """Start background jobs once the application is initialised and the schema is ready."""
+    if _db_ready is not None:
+        await asyncio.wrap_future(_db_ready)
+    app.create_task(broadcaster.run(app.bot))
+    app.create_task(maintenance_loop())
+
+
 def main():
     """Start the bot."""
-    app = Application.builder().token(config.TELEGRAM_BOT_TOKEN).build()
+    global _db_ready
+    required = ("TELEGRAM_BOT_TOKEN", "ALLOWED_TELEGRAM_IDS")
+    if config.TASK_EXECUTION != "queue":
+        required += ("ANTHROPIC_API_KEY",)  # Queue mode leaves the API to worker processes
+    config.validate(required)
+
+    # Initialise the schema while the application connects to Telegram
+    _db_ready = ThreadPoolExecutor(max_workers=1, thread_name_prefix="init-db").submit(database.init_db)
+
+    app = (
+        Application.builder()
+        .token(config.TELEGRAM_BOT_TOKEN)
+        .concurrent_updates(config.CONCURRENT_UPDATES)
+        .post_init(post_init)
+        .build()
+    )
 
     # Command handlers
     app.add_handler(CommandHandler("start", cmd_start))
     app.add_handler(CommandHandler("review_page", cmd_review_page))
     app.add_handler(CommandHandler("brief", cmd_brief))
     app.add_handler(CommandHandler("social_review", cmd_social_review))
+    app.add_handler(CommandHandler("cancel", cmd_cancel))
 
     # Message handler for ASK_USER flow
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
 
-    logger.info("🤖 Bot started. Waiting for messages...")
-    app.run_polling(allowed_updates=Update.ALL_TYPES)
+    if config.BOT_MODE == "webhook":
+        import webhook
+        logger.info("🤖 Bot started in webhook mode.")
+        asyncio.run(webhook.serve(app, ALLOWED_UPDATES))
+    else:
+        logger.info("🤖 Bot started. Waiting for messages...")
+        app.run_polling(allowed_updates=ALLOWED_UPDATES)
 
 
 if __name__ == "__main__":
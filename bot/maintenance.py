@@ -0,0 +1,118 @@
+"""Database maintenance - retention archival, incremental vacuum and size reports.
+
+Runs on a schedule inside the bot process, or manually:
+    python bot/maintenance.py report
+    python bot/maintenance.py run
+    python bot/maintenance.py enable-vacuum
+
+enable-vacuum switches a database created before incremental auto-vacuum
+with a one-off full VACUUM. Best run with the bot stopped, since it rewrites
+the whole file.
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import sys
+
+import database
+import result_cache
+from config import DB_PATH, MAINTENANCE_INTERVAL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def run_maintenance() -> dict:
+    """Archive expired messages, cached results, stale file_ids and old queue tasks, then reclaim free pages."""
+    archived = database.archive_old_messages()
+    evicted = result_cache.evict()
+    database.prune_telegram_files()
+    database.prune_tasks()
+    freed_pages = database.incremental_vacuum()
+    return {"archived": archived, "evicted_results": evicted, "freed_pages": freed_pages}
+
+
+async def maintenance_loop():
+    """Run maintenance every MAINTENANCE_INTERVAL_SECONDS without blocking the event loop."""
+    while True:
+        try:
+            result = await asyncio.to_thread(run_maintenance)
+            archived = result["archived"]
+            logger.info(
+                f"Maintenance: archived {archived['messages']} messages "
+                f"({archived['conversations']} empty conversations removed), evicted {result['evicted_results']} cached results, "
+                f"freed {result['freed_pages']} pages"
+            )
+        except Exception as e:
+            logger.error(f"Maintenance failed: {type(e).__name__}: {e}")
+        await asyncio.sleep(MAINTENANCE_INTERVAL_SECONDS)
+
+
+def enable_vacuum() -> int:
+    """Convert the database to incremental auto-vacuum if the disk has room for the VACUUM."""
+    if database.incremental_vacuum_enabled():
+        print("Incremental auto-vacuum is already enabled")
+        return 0
+    db_bytes = sum(os.path.getsize(p) for p in (DB_PATH, DB_PATH + "-wal") if os.path.exists(p))
+    free = shutil.disk_usage(os.path.dirname(os.path.abspath(DB_PATH))).free
+    # VACUUM writes a full copy of the database, and the copy passes through the WAL
+    if free < 2 * db_bytes:
+        print(f"Not enough free space: VACUUM needs up to {_human(2 * db_bytes)}, {_human(free)} free. "
+              f"Archive old messages first (python bot/maintenance.py run).", file=sys.stderr)
+        return 1
+    database.enable_incremental_vacuum()
+    print("Incremental auto-vacuum enabled")
+    return 0
+
+
+def _human(n: int) -> str:
+    """Format a byte count for display."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+def format_size_report(report: dict) -> str:
+    """Render database.size_report() as plain text."""
+    lines = [
+        f"Database: {_human(report['db_bytes'])} ({_human(report['free_bytes'])} free)",
+        f"Archive:  {_human(report['archive_bytes'])}",
+    ]
+    if not report["incremental_vacuum"]:
+        lines.append("Incremental auto-vacuum is off; enable it with: python bot/maintenance.py enable-vacuum")
+    lines += [
+        "",
+        f"{'user':<24} {'convs':>6} {'msgs':>7} {'stored':>10} {'last ' + str(report['recent_days']) + 'd':>10}",
+    ]
+    for user in report["users"]:
+        name = user["username"] or str(user["telegram_id"])
+        lines.append(
+            f"{name[:24]:<24} {user['conversations']:>6} {user['messages']:>7} "
+            f"{_human(user['stored_bytes']):>10} {_human(user['recent_bytes']):>10}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    action = sys.argv[1] if len(sys.argv) > 1 else "report"
+    database.init_db()
+    if action == "run":
+        result = run_maintenance()
+        archived = result["archived"]
+        print(f"Archived {archived['messages']} messages ({archived['conversations']} empty conversations removed)"
+              + (f" to {archived['path']}" if archived["path"] else ""))
+        print(f"Evicted {result['evicted_results']} cached results")
+        print(f"Freed {result['freed_pages']} pages")
+    elif action == "enable-vacuum":
+        return enable_vacuum()
+    elif action != "report":
+        print("Usage: python bot/maintenance.py [report|run|enable-vacuum]", file=sys.stderr)
+        return 1
+    print(format_size_report(database.size_report()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
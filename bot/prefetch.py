@@ -0,0 +1,160 @@
+"""Speculative prefetch - start a review's predictable first steps early.
+
+/review_page almost always opens, after one model turn, with
+`python3 scripts/fetch_page.py <url>`. The fetch starts as soon as the command
+is parsed, runs alongside the first model call, and the agent's bash call is
+answered from it. The result cache's page hash shares the same fetch.
+
+A shared fetch counts the callers waiting on it (the session that started it
+holds one claim until it ends). When the last one is cancelled, e.g. by
+/cancel, the fetch_page.py subprocess is killed.
+
+/social_review's brand file is read up front and sent with the first
+message, so the agent never spends a turn reading it.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import sys
+import time
+from typing import Callable
+
+from config import PROJECT_ROOT, BASH_TIMEOUT_SECONDS, PREFETCH_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# The agent's fetch call, e.g. python3 scripts/fetch_page.py "https://example.com/"
+FETCH_PAGE_COMMAND_RE = re.compile(r"^\s*python3?\s+scripts/fetch_page\.py\s+(['\"]?)(\S+?)\1\s*$")
+
+BRAND_SLUG_RE = re.compile(r"^[a-z0-9][a-z0-9-]*$")
+
+
+class _PageFetch:
+    """A shared fetch_page.py run and the number of callers waiting on it."""
+
+    def __init__(self, url: str):
+        # Resolves to (returncode, stdout, stderr)
+        self.task = asyncio.create_task(_run_fetch_page(url))
+        self.started = time.monotonic()
+        self.waiters = 0
+
+
+# URL -> shared fetch
+_page_fetches: dict[str, _PageFetch] = {}
+
+
+def _canonical_url(url: str) -> str:
+    """The URL fetch_page.py actually requests."""
+    return url if url.startswith("http") else f"https://{url}"
+
+
+async def _run_fetch_page(url: str) -> tuple[int, str, str]:
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, "scripts/fetch_page.py", url,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        cwd=PROJECT_ROOT,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=BASH_TIMEOUT_SECONDS)
+    except BaseException:
+        if proc.returncode is None:
+            proc.kill()
+        raise
+    return (
+        proc.returncode,
+        stdout.decode("utf-8", errors="replace"),
+        stderr.decode("utf-8", errors="replace"),
+    )
+
+
+def _get_fetch(url: str) -> _PageFetch:
+    """The fetch of `url` started within PREFETCH_TTL_SECONDS, or a new one."""
+    now = time.monotonic()
+    for key, fetch in list(_page_fetches.items()):
+        if fetch.task.done() and now - fetch.started > PREFETCH_TTL_SECONDS:
+            del _page_fetches[key]
+    if url not in _page_fetches:
+        _page_fetches[url] = _PageFetch(url)
+    return _page_fetches[url]
+
+
+def _release(url: str, fetch: _PageFetch):
+    """Drop one waiter; kill the subprocess if it was the last and the fetch is unfinished."""
+    fetch.waiters -= 1
+    if fetch.waiters == 0 and not fetch.task.done():
+        fetch.task.cancel()
+        if _page_fetches.get(url) is fetch:
+            del _page_fetches[url]
+
+
+async def _wait(url: str, fetch: _PageFetch) -> tuple[int, str, str]:
+    fetch.waiters += 1
+    try:
+        # Shielded so one waiter's cancellation doesn't cancel the others' fetch
+        return await asyncio.shield(fetch.task)
+    finally:
+        _release(url, fetch)
+
+
+async def fetch_page(url: str) -> tuple[int, str, str]:
+    """
+    Run scripts/fetch_page.py for `url`, or join a run started within
+    PREFETCH_TTL_SECONDS. Cancelling stops the run only if nobody else waits on it.
+    """
+    url = _canonical_url(url)
+    return await _wait(url, _get_fetch(url))
+
+
+def start(command: str, arguments: str) -> Callable[[], None]:
+    """
+    Kick off the prefetches a command will need. Returns a function to call
+    when the session ends, which stops a fetch nobody else is waiting on.
+    """
+    if command == "review-page" and arguments.split():
+        url = _canonical_url(arguments.split()[0])
+        fetch = _get_fetch(url)
+        fetch.waiters += 1
+        return lambda: _release(url, fetch)
+    return lambda: None
+
+
+async def serve_bash(command: str) -> tuple[str, str] | None:
+    """
+    Answer a fetch_page.py bash command from a prefetch of the same URL.
+    Returns (stdout, stderr), or None if there is no recent prefetch to use.
+    """
+    match = FETCH_PAGE_COMMAND_RE.match(command)
+    if not match:
+        return None
+    url = _canonical_url(match.group(2))
+    fetch = _page_fetches.get(url)
+    if fetch is None or time.monotonic() - fetch.started > PREFETCH_TTL_SECONDS:
+        return None
+    try:
+        returncode, stdout, stderr = await _wait(url, fetch)
+    except Exception as e:
+        logger.warning(f"Prefetch of {url} failed: {type(e).__name__}: {e}")
+        _page_fetches.pop(url, None)
+        return None
+    if returncode != 0:
+        _page_fetches.pop(url, None)  # Let a retry fetch again
+    return stdout, stderr
+
+
+def first_message_context(command: str, arguments: str) -> str:
+    """Prefetched material to send with the command, or an empty string."""
+    if command != "social-review" or not arguments.split():
+        return ""
+    slug = arguments.split()[0].lower()
+    if not BRAND_SLUG_RE.match(slug):
+        return ""
+    rel_path = f"brands/{slug}.md"
+    try:
+        with open(os.path.join(PROJECT_ROOT, rel_path), "r", encoding="utf-8") as f:
+            content = f.read()
+    except OSError:
+        return ""
+    return f"\n\nContents of {rel_path} (already loaded, no need to read it):\n\n{content}"
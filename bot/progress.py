@@ -0,0 +1,141 @@
+"""Progress broadcaster - the single owner of Telegram status-message edits.
+
+Tasks publish the latest text for their status message; the broadcaster
+coalesces each message to its newest text, skips edits that would not change
+anything, and paces sends against global and per-chat budgets, backing off
+when Telegram answers with RetryAfter.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from telegram import Bot
+from telegram.error import BadRequest, RetryAfter
+
+from config import (
+    PROGRESS_INTERVAL_SECONDS,
+    TELEGRAM_GLOBAL_EDITS_PER_SECOND,
+    TELEGRAM_CHAT_EDIT_INTERVAL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TaskProgress:
+    """Per-task progress state: recent friendly lines and the analysis stage cursor."""
+
+    def __init__(self, first_line: str):
+        self.lines: list[str] = [first_line]
+        self.stage = 0
+
+
+class _Pending:
+    """Latest unsent text for one status message."""
+
+    def __init__(self, text: str, not_before: float, final: bool, forget: bool):
+        self.text = text
+        self.not_before = not_before
+        self.final = final
+        self.forget = forget
+
+
+class ProgressBroadcaster:
+    """Coalescing, rate-budgeted editor for status messages."""
+
+    def __init__(self, message_interval: float, global_rate: float, chat_interval: float):
+        self.message_interval = message_interval
+        self.global_interval = 1.0 / global_rate if global_rate > 0 else 0.0
+        self.chat_interval = chat_interval
+        self._pending: dict[tuple[int, int], _Pending] = {}
+        # (chat_id, message_id) -> (last text sent, monotonic time sent)
+        self._sent: dict[tuple[int, int], tuple[str, float]] = {}
+        self._chat_next: dict[int, float] = {}
+        self._global_next = 0.0
+        self._wake = asyncio.Event()
+
+    def publish(self, chat_id: int, message_id: int, text: str, immediate: bool = False):
+        """
+        Set the desired text of a status message.
+        Routine progress is sent at most once per message_interval; `immediate`
+        updates (queue position, start) skip that wait and are never
+        superseded by later routine progress.
+        """
+        self._submit((chat_id, message_id), text, immediate, forget=False)
+
+    def finish(self, chat_id: int, message_id: int, text: str):
+        """Publish a terminal status (completion, error) and forget the message once sent."""
+        self._submit((chat_id, message_id), text, immediate=True, forget=True)
+
+    def _submit(self, key: tuple[int, int], text: str, immediate: bool, forget: bool):
+        pending = self._pending.get(key)
+        if pending and pending.final and not immediate:
+            return
+        last = self._sent.get(key)
+        if last and last[0] == text:
+            # Nothing would change; drop anything queued in between
+            self._pending.pop(key, None)
+            if forget:
+                self._sent.pop(key, None)
+            return
+        not_before = 0.0 if immediate or last is None else last[1] + self.message_interval
+        self._pending[key] = _Pending(text, not_before, final=immediate, forget=forget)
+        self._wake.set()
+
+    def _next_ready(self, now: float) -> tuple[Optional[tuple[int, int]], float]:
+        """Return (key ready to send, or None) and the earliest time anything becomes ready."""
+        earliest = float("inf")
+        for key, pending in sorted(self._pending.items(), key=lambda kv: kv[1].not_before):
+            ready_at = max(pending.not_before, self._chat_next.get(key[0], 0.0), self._global_next)
+            if ready_at <= now:
+                return key, now
+            earliest = min(earliest, ready_at)
+        return None, earliest
+
+    async def run(self, bot: Bot):
+        """Worker loop; start once per process."""
+        while True:
+            now = time.monotonic()
+            key, ready_at = self._next_ready(now)
+            if key is None:
+                self._wake.clear()
+                timeout = None if ready_at == float("inf") else ready_at - now
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            pending = self._pending.pop(key)
+            chat_id, message_id = key
+            try:
+                await bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=pending.text)
+            except RetryAfter as e:
+                delay = e.retry_after
+                delay = delay.total_seconds() if hasattr(delay, "total_seconds") else float(delay)
+                logger.warning(f"Telegram flood control: backing off {delay:.0f}s")
+                self._global_next = time.monotonic() + delay
+                # Requeue unless something newer arrived meanwhile
+                self._pending.setdefault(key, pending)
+                continue
+            except BadRequest as e:
+                if "not modified" not in str(e).lower():
+                    logger.debug(f"Status edit dropped for {key}: {e}")
+            except Exception as e:
+                logger.debug(f"Status edit failed for {key}: {type(e).__name__}: {e}")
+
+            sent_at = time.monotonic()
+            self._global_next = sent_at + self.global_interval
+            self._chat_next[chat_id] = sent_at + self.chat_interval
+            if pending.forget and key not in self._pending:
+                self._sent.pop(key, None)
+            else:
+                self._sent[key] = (pending.text, sent_at)
+
+
+broadcaster = ProgressBroadcaster(
+    PROGRESS_INTERVAL_SECONDS,
+    TELEGRAM_GLOBAL_EDITS_PER_SECOND,
+    TELEGRAM_CHAT_EDIT_INTERVAL_SECONDS,
+)
@@ -28,6 +28,7 @@ IMPORTANT: You are running in a Telegram bot environment with the following cons
      - Local file paths where full reviews were written
    - Do NOT output the full review text inline — it will be sent as a file attachment.
    - Full markdown review files will be automatically uploaded as Telegram documents.
+     Only .md files you create with the `write` tool under reviews/ or social-reviews/ are attached.
 
 4. **Clarifying questions**:
    - If you need to ask the user a clarifying question (e.g., "analyze section root or all sub-pages?"),
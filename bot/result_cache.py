@@ -0,0 +1,139 @@
+"""Review result cache - reuse a finished review when none of its inputs changed.
+
+The key covers the command, the normalized URL, a hash of the freshly fetched
+page HTML and hashes of the command file, templates and base system prompt.
+Report files are copied into RESULT_CACHE_DIR, under their path relative to
+PROJECT_ROOT, so later runs can't alter them. store() and evict() copy and
+delete files; async callers run them in a thread.
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import shutil
+from datetime import datetime, timedelta
+
+import database
+import prefetch
+from config import (
+    PROJECT_ROOT,
+    RESULT_CACHE_DIR,
+    RESULT_CACHE_TTL_SECONDS,
+    RESULT_CACHE_MAX_BYTES,
+)
+from prompts import COMMAND_FILES, BASE_SYSTEM_PROMPT
+
+logger = logging.getLogger(__name__)
+
+# Commands whose result depends only on a single fetched page
+CACHEABLE_COMMANDS = {"review-page"}
+
+FRESH_FLAG = "--fresh"
+
+
+def split_fresh_flag(arguments: str) -> tuple[str, bool]:
+    """Strip the --fresh flag from command arguments. Returns (arguments, fresh)."""
+    tokens = arguments.split()
+    if FRESH_FLAG not in tokens:
+        return arguments, False
+    return " ".join(t for t in tokens if t != FRESH_FLAG), True
+
+
+def _hash_file(path: str) -> str:
+    """SHA-256 of a file's bytes, or of the empty string if it is missing."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(65536), b""):
+                digest.update(chunk)
+    except FileNotFoundError:
+        pass
+    return digest.hexdigest()
+
+
+def prompt_fingerprint(command: str) -> str:
+    """Hash of everything that shapes the agent's instructions for a command."""
+    digest = hashlib.sha256(BASE_SYSTEM_PROMPT.encode("utf-8"))
+    paths = [os.path.join(PROJECT_ROOT, COMMAND_FILES[command])]
+    paths += sorted(glob.glob(os.path.join(PROJECT_ROOT, "templates", "*.md")))
+    for path in paths:
+        digest.update(os.path.relpath(path, PROJECT_ROOT).encode("utf-8"))
+        digest.update(_hash_file(path).encode("ascii"))
+    return digest.hexdigest()
+
+
+async def fetch_page_hash(url: str) -> str | None:
+    """
+    Fetch the page with scripts/fetch_page.py (refreshing its .cache/ copy, which
+    the agent reads anyway) and return a hash of the HTML, or None on failure.
+    The fetch is shared with the agent's own fetch_page call (see prefetch.py).
+    """
+    try:
+        returncode, stdout, _ = await prefetch.fetch_page(url)
+        meta = json.loads(stdout)
+    except Exception as e:
+        logger.warning(f"Result cache: could not fetch {url}: {type(e).__name__}: {e}")
+        return None
+    if returncode != 0 or "cache_path" not in meta:
+        return None
+    return _hash_file(os.path.join(PROJECT_ROOT, meta["cache_path"]))
+
+
+async def compute_key(command: str, url: str, normalized_url: str) -> str | None:
+    """Cache key for a review of `url`, or None if the page couldn't be fetched."""
+    page_hash = await fetch_page_hash(url)
+    if page_hash is None:
+        return None
+    parts = [command, normalized_url, page_hash, prompt_fingerprint(command)]
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def lookup(cache_key: str) -> dict | None:
+    """Return a fresh cached result whose files are all still present."""
+    entry = database.get_cached_result(cache_key, RESULT_CACHE_TTL_SECONDS)
+    if entry and all(os.path.isfile(path) for path in entry["files"]):
+        return entry
+    return None
+
+
+def store(cache_key: str, command: str, arguments: str, summary: str, files: list[str]):
+    """Copy report files into the cache and record the entry, then enforce limits."""
+    entry_dir = os.path.join(RESULT_CACHE_DIR, cache_key)
+    shutil.rmtree(entry_dir, ignore_errors=True)
+    os.makedirs(entry_dir, exist_ok=True)
+    cached_files = []
+    size = len(summary.encode("utf-8"))
+    for i, path in enumerate(dict.fromkeys(files)):
+        # Keep the project layout so reports with the same name in different folders don't collide
+        rel_path = os.path.relpath(path, PROJECT_ROOT)
+        if rel_path.startswith(os.pardir):
+            rel_path = os.path.join("external", f"{i}-{os.path.basename(path)}")
+        target = os.path.join(entry_dir, rel_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(path, target)
+        cached_files.append(target)
+        size += os.path.getsize(target)
+    database.put_cached_result(cache_key, command, arguments, summary, cached_files, size)
+    evict()
+
+
+def evict() -> int:
+    """
+    Drop expired entries, then least recently used ones until under the size budget.
+    Returns the number of entries removed.
+    """
+    cutoff = (datetime.utcnow() - timedelta(seconds=RESULT_CACHE_TTL_SECONDS)).isoformat()
+    entries = database.list_cached_results()
+    total = sum(e["size_bytes"] for e in entries)
+    doomed = []
+    for entry in entries:  # least recently used first
+        if entry["created_at"] < cutoff or total > RESULT_CACHE_MAX_BYTES:
+            doomed.append(entry["cache_key"])
+            total -= entry["size_bytes"]
+    if doomed:
+        database.delete_cached_results(doomed)
+        for key in doomed:
+            shutil.rmtree(os.path.join(RESULT_CACHE_DIR, key), ignore_errors=True)
+    return len(doomed)
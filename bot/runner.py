@@ -0,0 +1,128 @@
+"""Agent session runner - ASK_USER loop, output manifest and result cache check.
+
+Independent of Telegram, so the same session runs inside the bot process or
+in a separate worker process (see worker.py).
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+import prefetch
+import result_cache
+from agent import run_agent
+from tools import TOOLS, OutputManifest, discard_outputs, output_manifest
+
+ASK_USER_PREFIX = "ASK_USER:"
+
+
+class ReviewOutcome:
+    """
+    What a review produced: the result text (None if a question went
+    unanswered), or a result cache entry that replaced the agent's run.
+    cache_key is None for commands that aren't cached or pages that couldn't be fetched.
+    """
+
+    def __init__(self, text: Optional[str], cache_key: Optional[str] = None, cached: Optional[dict] = None):
+        self.text = text
+        self.cache_key = cache_key
+        self.cached = cached
+
+
+async def execute_review(
+    command: str,
+    arguments: str,
+    system_prompt: str,
+    history: list[dict],
+    manifest: OutputManifest,
+    progress_callback: Callable[[str], Awaitable[None]],
+    ask_user: Callable[[str], Awaitable[Optional[str]]],
+    cache_scope: Optional[str] = None,
+    fresh: bool = False,
+) -> ReviewOutcome:
+    """
+    Run the agent for one command, relaying ASK_USER questions through `ask_user`.
+
+    `history` is the requester's recent conversation, loaded by the caller so a
+    worker process never reads another process's history cache. Files the
+    agent writes are appended to `manifest`.
+
+    For a cacheable command, `cache_scope` (the normalized arguments) enables
+    the result cache. The agent starts right away and the cache key is computed
+    alongside its first model call from the same page fetch the agent's
+    fetch_page.py call is answered from. On a hit (never with `fresh`) the
+    agent is stopped and its files are undone. Questions wait for the lookup,
+    so a stopped agent never asks anything.
+    """
+    output_manifest.set(manifest)
+
+    # Start the command's predictable first fetch alongside the first model call
+    release_prefetch = prefetch.start(command, arguments)
+    looked_up = asyncio.Event()
+
+    async def ask_after_lookup(question: str) -> Optional[str]:
+        await looked_up.wait()
+        return await ask_user(question)
+
+    session = asyncio.create_task(
+        _run_session(command, arguments, system_prompt, history, progress_callback, ask_after_lookup)
+    )
+    try:
+        cache_key = None
+        cached = None
+        try:
+            if cache_scope is not None and command in result_cache.CACHEABLE_COMMANDS and arguments.split():
+                cache_key = await result_cache.compute_key(command, arguments.split()[0], cache_scope)
+            if cache_key and not fresh:
+                cached = await asyncio.to_thread(result_cache.lookup, cache_key)
+        finally:
+            looked_up.set()
+        if cached:
+            session.cancel()
+            await asyncio.gather(session, return_exceptions=True)
+            discard_outputs(manifest)
+            return ReviewOutcome(None, cache_key, cached)
+        return ReviewOutcome(await session, cache_key)
+    finally:
+        if not session.done():  # Cancelled, or the lookup failed
+            session.cancel()
+            await asyncio.gather(session, return_exceptions=True)
+        # Stops the fetch if the session was cancelled (or never used it) and nobody else waits
+        release_prefetch()
+
+
+async def _run_session(
+    command: str,
+    arguments: str,
+    system_prompt: str,
+    history: list[dict],
+    progress_callback: Callable[[str], Awaitable[None]],
+    ask_user: Callable[[str], Awaitable[Optional[str]]],
+) -> Optional[str]:
+
+    # Add current user command, with any material it will need loaded up front
+    messages = history + [{
+        "role": "user",
+        "content": f"/{command} {arguments}" + prefetch.first_message_context(command, arguments),
+    }]
+
+    # Run agent with ASK_USER loop
+    while True:
+        result_text = await run_agent(
+            system_prompt=system_prompt,
+            messages=messages,
+            tools=TOOLS,
+            progress_callback=progress_callback,
+            source="telegram",  # Use optimized settings for Telegram
+        )
+
+        if not result_text.strip().startswith(ASK_USER_PREFIX):
+            return result_text
+
+        question = result_text.strip()[len(ASK_USER_PREFIX):].strip()
+        user_reply = await ask_user(question)
+        if user_reply is None:
+            return None
+
+        # Append question and answer to messages
+        messages.append({"role": "assistant", "content": result_text})
+        messages.append({"role": "user", "content": user_reply})
@@ -0,0 +1,215 @@
+"""Bounded, fair scheduler for review tasks.
+
+Jobs run under a global concurrency limit and a per-user limit. Waiting jobs
+are served by priority (lower number first) and round-robin between users
+within a priority, so one user's burst of commands can't starve everyone else.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Awaitable, Callable, Optional
+
+from config import MAX_CONCURRENT_TASKS, MAX_TASKS_PER_USER, TASK_DURATION_ESTIMATE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first. Quick briefs jump ahead of page and social reviews.
+COMMAND_PRIORITIES = {
+    "brief": 0,
+    "review-page": 1,
+    "social-review": 1,
+}
+DEFAULT_PRIORITY = 1
+
+# Weight of the latest run when updating the duration estimate
+DURATION_SMOOTHING = 0.3
+
+# Called with (job, position, eta_seconds) while queued; position 0 means the job has started
+StatusCallback = Callable[["Job", int, float], Awaitable[None]]
+
+# Called with the job when it is cancelled before it started
+CancelCallback = Callable[["Job"], Awaitable[None]]
+
+
+class Job:
+    """A unit of work waiting for or holding a scheduler slot."""
+
+    def __init__(self, seq: int, telegram_id: int, priority: int, description: str,
+                 run: Callable[[], Awaitable], on_status: Optional[StatusCallback],
+                 on_cancel: Optional[CancelCallback]):
+        self.seq = seq
+        self.telegram_id = telegram_id
+        self.priority = priority
+        self.description = description
+        self.run = run
+        self.on_status = on_status
+        self.on_cancel = on_cancel
+        self.started_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.last_reported: Optional[tuple[int, int]] = None
+
+
+class ReviewScheduler:
+    """Global and per-user bounded scheduler with priority round-robin dispatch."""
+
+    def __init__(self, max_concurrent: int, per_user_limit: int, duration_estimate: float):
+        self.max_concurrent = max(1, max_concurrent)
+        self.per_user_limit = max(1, per_user_limit)
+        self.duration_estimate = duration_estimate
+        # priority -> OrderedDict(telegram_id -> deque of jobs); dict order is the round-robin order
+        self._queues: dict[int, OrderedDict[int, deque[Job]]] = {}
+        self._running: set[Job] = set()
+        self._running_per_user: Counter = Counter()
+        self._seq = itertools.count(1)
+
+    def submit(self, telegram_id: int, command: str, run: Callable[[], Awaitable],
+               on_status: Optional[StatusCallback] = None, on_cancel: Optional[CancelCallback] = None,
+               description: str = "") -> Job:
+        """Queue a job. `run` is a zero-argument coroutine factory."""
+        priority = COMMAND_PRIORITIES.get(command, DEFAULT_PRIORITY)
+        job = Job(next(self._seq), telegram_id, priority, description or command, run, on_status, on_cancel)
+        users = self._queues.setdefault(priority, OrderedDict())
+        users.setdefault(telegram_id, deque()).append(job)
+        self._dispatch()
+        return job
+
+    def queued_count(self) -> int:
+        """Number of jobs waiting for a slot."""
+        return sum(len(q) for users in self._queues.values() for q in users.values())
+
+    def running_count(self) -> int:
+        """Number of jobs currently holding a slot."""
+        return len(self._running)
+
+    def user_jobs(self, telegram_id: int) -> list[Job]:
+        """A user's running and queued jobs, oldest first."""
+        jobs = [job for job in self._running if job.telegram_id == telegram_id]
+        for users in self._queues.values():
+            jobs.extend(users.get(telegram_id, ()))
+        return sorted(jobs, key=lambda job: job.seq)
+
+    def cancel(self, job: Job) -> bool:
+        """
+        Cancel a job. A running job's task is cancelled (the task cleans up after
+        itself); a queued job is removed and its on_cancel callback runs.
+        Returns False if the job is no longer known.
+        """
+        if job in self._running:
+            job.task.cancel()
+            return True
+        users = self._queues.get(job.priority, {})
+        queue = users.get(job.telegram_id)
+        if not queue or job not in queue:
+            return False
+        queue.remove(job)
+        if not queue:
+            del users[job.telegram_id]
+        if not users:
+            self._queues.pop(job.priority, None)
+        if job.on_cancel:
+            asyncio.create_task(job.on_cancel(job))
+        self._dispatch()
+        return True
+
+    def _pick(self, queues: dict[int, OrderedDict[int, deque[Job]]], running: Counter) -> Optional[Job]:
+        """Take the next eligible job from `queues`, rotating the served user to the back."""
+        for priority in sorted(queues):
+            users = queues[priority]
+            for uid in list(users):
+                if running[uid] >= self.per_user_limit:
+                    continue
+                job = users[uid].popleft()
+                if users[uid]:
+                    users.move_to_end(uid)
+                else:
+                    del users[uid]
+                if not users:
+                    del queues[priority]
+                return job
+        return None
+
+    def _dispatch(self):
+        """Start jobs while there are free slots, then refresh queued users' status."""
+        while len(self._running) < self.max_concurrent:
+            job = self._pick(self._queues, self._running_per_user)
+            if job is None:
+                break
+            job.started_at = time.monotonic()
+            self._running.add(job)
+            self._running_per_user[job.telegram_id] += 1
+            job.task = asyncio.create_task(self._run(job))
+            if job.last_reported is not None:
+                self._report(job, 0, 0)
+        for job, position, eta in self._forecast():
+            self._report(job, position, eta)
+
+    async def _run(self, job: Job):
+        cancelled = False
+        try:
+            await job.run()
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        except Exception as e:
+            logger.error(f"Scheduled job {job.seq} failed: {type(e).__name__}: {e}")
+        finally:
+            if not cancelled:  # Aborted runs would skew the ETA basis
+                elapsed = time.monotonic() - job.started_at
+                self.duration_estimate += DURATION_SMOOTHING * (elapsed - self.duration_estimate)
+            self._running.discard(job)
+            self._running_per_user[job.telegram_id] -= 1
+            self._dispatch()
+
+    def _forecast(self) -> list[tuple[Job, int, float]]:
+        """
+        Simulate dispatch of the current queue, assuming every job takes the
+        running duration estimate. Returns (job, position, eta_seconds) in start order.
+        """
+        now = time.monotonic()
+        queues = {p: OrderedDict((uid, deque(q)) for uid, q in users.items())
+                  for p, users in self._queues.items()}
+        running = Counter(self._running_per_user)
+        finishes = [(max(job.started_at + self.duration_estimate, now), job.seq, job.telegram_id)
+                    for job in self._running]
+        heapq.heapify(finishes)
+        free_slots = self.max_concurrent - len(self._running)
+        clock = now
+        forecast = []
+        while queues:
+            job = self._pick(queues, running) if free_slots > 0 else None
+            if job is None:
+                if not finishes:
+                    break
+                clock, _, uid = heapq.heappop(finishes)
+                running[uid] -= 1
+                free_slots += 1
+                continue
+            free_slots -= 1
+            running[job.telegram_id] += 1
+            heapq.heappush(finishes, (clock + self.duration_estimate, job.seq, job.telegram_id))
+            forecast.append((job, len(forecast) + 1, clock - now))
+        return forecast
+
+    def _report(self, job: Job, position: int, eta: float):
+        """Send a status update if the position or minute-rounded ETA changed."""
+        if job.on_status is None:
+            return
+        key = (position, round(eta / 60))
+        if key == job.last_reported:
+            return
+        job.last_reported = key
+        asyncio.create_task(self._safe_status(job, position, eta))
+
+    @staticmethod
+    async def _safe_status(job: Job, position: int, eta: float):
+        try:
+            await job.on_status(job, position, eta)
+        except Exception:
+            pass  # Status updates are best-effort
+
+
+scheduler = ReviewScheduler(MAX_CONCURRENT_TASKS, MAX_TASKS_PER_USER, TASK_DURATION_ESTIMATE_SECONDS)
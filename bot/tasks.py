@@ -1,21 +1,32 @@
 """Async task runner with progress updates and ASK_USER flow."""
 
 import asyncio
-import time
+import re
 from typing import Optional
+from urllib.parse import urlparse
 from telegram import Bot, Message
-from agent import run_agent
 from prompts import build_system_prompt
 from database import get_recent_messages, save_message, create_or_get_session
 from delivery import deliver_result
-from tools import TOOLS
-from config import PROGRESS_INTERVAL_SECONDS
+import jobqueue
+import result_cache
+from runner import ReviewOutcome, execute_review
+from tools import OutputManifest, discard_outputs
+from progress import broadcaster, TaskProgress
+from config import TASK_EXECUTION
 
 # Global queue for user replies to ASK_USER questions
 # Key: telegram_id, Value: asyncio.Queue of user responses
 _user_reply_queues: dict[int, asyncio.Queue] = {}
 
-ASK_USER_PREFIX = "ASK_USER:"
+# In-flight requests, for coalescing identical commands
+# Key: coalesce_key(command, arguments), Value: subscribers (leader first)
+_inflight: dict[tuple[str, str], list["Subscriber"]] = {}
+
+ASK_USER_TIMEOUT_SECONDS = 300
+
+# Bare domains or http(s) URLs, e.g. example.com/blinds or https://example.com/
+URL_TOKEN_RE = re.compile(r"^(https?://)?[a-z0-9-]+(\.[a-z0-9-]+)+(:\d+)?([/?#]\S*)?$", re.IGNORECASE)
 
 # Friendly progress messages for different tool operations
 PROGRESS_MESSAGES = {
@@ -37,13 +48,9 @@ ANALYSIS_STAGES = [
     "📋 Compiling report",
 ]
 
-_stage_counter = 0
 
-
-def _get_friendly_progress(tool_name: str, tool_input: str) -> str:
+def _get_friendly_progress(tool_name: str, tool_input: str, progress: TaskProgress) -> str:
     """Convert technical tool call into friendly user message."""
-    global _stage_counter
-
     # Extract operation type from tool input
     if "fetch_page" in tool_input.lower():
         return "📄 Fetching page content..."
@@ -56,10 +63,10 @@ def _get_friendly_progress(tool_name: str, tool_input: str) -> str:
             return "🕷️ Crawling site structure..."
 
     # Show analysis stages
-    if _stage_counter < len(ANALYSIS_STAGES):
-        msg = ANALYSIS_STAGES[_stage_counter]
-        if _stage_counter < len(ANALYSIS_STAGES) - 1:
-            _stage_counter += 1
+    if progress.stage < len(ANALYSIS_STAGES):
+        msg = ANALYSIS_STAGES[progress.stage]
+        if progress.stage < len(ANALYSIS_STAGES) - 1:
+            progress.stage += 1
         return msg
 
     # Fallback to tool-specific message
@@ -67,6 +74,75 @@ def _get_friendly_progress(tool_name: str, tool_input: str) -> str:
     return PROGRESS_MESSAGES.get(tool_short, "⚙️ Processing...")
 
 
+class Subscriber:
+    """A chat waiting on the outcome of a review request."""
+
+    def __init__(self, chat_id: int, telegram_id: int, status_message: Message):
+        self.chat_id = chat_id
+        self.telegram_id = telegram_id
+        self.status_message = status_message
+
+
+def _normalize_token(token: str) -> str:
+    """Normalize URL-like tokens so trivially different spellings coalesce."""
+    if not URL_TOKEN_RE.match(token):
+        return token.lower()
+    parsed = urlparse(token if "://" in token else f"https://{token}")
+    path = parsed.path.rstrip("/") or "/"
+    query = f"?{parsed.query}" if parsed.query else ""
+    return f"{parsed.netloc.lower()}{path}{query}"
+
+
+def coalesce_key(command: str, arguments: str) -> tuple[str, str]:
+    """Key identifying requests that would produce the same result."""
+    return command, " ".join(_normalize_token(t) for t in arguments.split())
+
+
+def join_inflight(command: str, arguments: str, subscriber: Subscriber) -> bool:
+    """
+    Register interest in a request.
+    Returns True if an identical request is already in flight and the subscriber
+    was attached to it, False if the caller should start the job itself.
+    """
+    key = coalesce_key(command, arguments)
+    if key in _inflight:
+        _inflight[key].append(subscriber)
+        return True
+    _inflight[key] = [subscriber]
+    return False
+
+
+def inflight_subscribers(command: str, arguments: str) -> list[Subscriber]:
+    """Current subscribers of an in-flight request (empty if none)."""
+    return list(_inflight.get(coalesce_key(command, arguments), []))
+
+
+def abandon_inflight(command: str, arguments: str, text: str):
+    """Drop an in-flight request that will never run and tell its subscribers why."""
+    for sub in _inflight.pop(coalesce_key(command, arguments), []):
+        broadcaster.finish(sub.chat_id, sub.status_message.message_id, text)
+
+
+def detach_inflight(command: str, arguments: str, telegram_id: int, text: str) -> bool:
+    """
+    Detach a user from an in-flight request and tell their chats `text`.
+    Returns True if nobody else is waiting on it, so the job itself should stop.
+    """
+    key = coalesce_key(command, arguments)
+    subscribers = _inflight.get(key)
+    if subscribers is None:
+        return True
+    leaving = [sub for sub in subscribers if sub.telegram_id == telegram_id]
+    # In place: the running task holds the same list
+    subscribers[:] = [sub for sub in subscribers if sub.telegram_id != telegram_id]
+    for sub in leaving:
+        broadcaster.finish(sub.chat_id, sub.status_message.message_id, text)
+    if subscribers:
+        return False
+    del _inflight[key]
+    return True
+
+
 def enqueue_user_reply(telegram_id: int, text: str):
     """Enqueue a user reply for a pending task."""
     if telegram_id not in _user_reply_queues:
@@ -85,6 +161,33 @@ async def wait_for_user_reply(telegram_id: int, timeout: int = 300) -> Optional[
         return None
 
 
+def _save_exchange(subscribers: list[Subscriber], command: str, arguments: str, result_text: str):
+    """Save the command and result to each requester's conversation history."""
+    for uid in {sub.telegram_id for sub in subscribers}:
+        conversation_id = create_or_get_session(uid)
+        save_message(conversation_id, "user", f"/{command} {arguments}")
+        save_message(conversation_id, "assistant", result_text)
+
+
+async def _deliver_to_chats(
+    bot: Bot,
+    subscribers: list[Subscriber],
+    result_text: str,
+    command: str,
+    arguments: str,
+    files: list[str],
+) -> list[str]:
+    """Deliver a result once per distinct chat. Returns the files sent."""
+    sent = []
+    delivered_chats = set()
+    for sub in subscribers:
+        if sub.chat_id in delivered_chats:
+            continue
+        delivered_chats.add(sub.chat_id)
+        sent = await deliver_result(bot, sub.chat_id, result_text, command, arguments, files)
+    return sent
+
+
 async def run_review_task(
     bot: Bot,
     chat_id: int,
@@ -92,101 +195,114 @@ async def run_review_task(
     command: str,
     arguments: str,
     status_message: Message,
+    fresh: bool = False,
 ):
     """
     Long-running task: run the agentic loop and deliver results.
+    Cacheable commands reuse a stored result when their inputs are unchanged,
+    unless `fresh` is set.
     """
-    last_progress_at = time.monotonic()
-    progress_lines: list[str] = [f"Starting {command}..."]
+    progress = TaskProgress(f"Starting {command}...")
+
+    # Files this task's write calls produce; delivery sends exactly these
+    manifest = OutputManifest()
+
+    # Identical requests that arrive while this one runs attach to this list
+    key = coalesce_key(command, arguments)
+    requester = Subscriber(chat_id, telegram_id, status_message)
+    subscribers = _inflight.setdefault(key, [requester])
+
+    def current_requester() -> Subscriber:
+        """The earliest subscriber still waiting (the original requester may have cancelled)."""
+        return subscribers[0] if subscribers else requester
+
+    def release() -> list[Subscriber]:
+        """Stop accepting new subscribers and return the final list."""
+        if _inflight.get(key) is subscribers:
+            del _inflight[key]
+        return list(subscribers)
+
+    def finish_status(text: str, targets: list[Subscriber]):
+        for sub in targets:
+            broadcaster.finish(sub.chat_id, sub.status_message.message_id, text)
 
     async def progress_callback(line: str):
-        nonlocal last_progress_at
         # Convert technical tool call to friendly message
-        friendly_msg = _get_friendly_progress("", line)
-        progress_lines.append(friendly_msg)
-        # Keep only last 3 progress lines
-        display = progress_lines[-3:]
-        now = time.monotonic()
-        if now - last_progress_at >= PROGRESS_INTERVAL_SECONDS:
-            last_progress_at = now
-            try:
-                status_text = "⏳ Working on your review...\n\n" + "\n".join(display)
-                await bot.edit_message_text(
-                    chat_id=chat_id,
-                    message_id=status_message.message_id,
-                    text=status_text,
-                )
-            except Exception:
-                pass  # Ignore edit failures (message too old, etc.)
+        progress.lines.append(_get_friendly_progress("", line, progress))
+        # Keep only last 3 progress lines; the broadcaster paces and coalesces edits
+        status_text = "⏳ Working on your review...\n\n" + "\n".join(progress.lines[-3:])
+        for sub in list(subscribers):
+            broadcaster.publish(sub.chat_id, sub.status_message.message_id, status_text)
 
     # Build system prompt
     try:
         system_prompt = build_system_prompt(command, arguments)
     except Exception as e:
-        await bot.edit_message_text(
-            chat_id=chat_id,
-            message_id=status_message.message_id,
-            text=f"Error: {e}",
-        )
+        finish_status(f"Error: {e}", release())
         return
 
-    # Load conversation history
-    history = get_recent_messages(telegram_id, limit=20)
+    async def ask_user(question: str) -> Optional[str]:
+        sub = current_requester()
+        await bot.send_message(chat_id=sub.chat_id, text=f"🤔 {question}")
+        return await wait_for_user_reply(sub.telegram_id, timeout=ASK_USER_TIMEOUT_SECONDS)
 
-    # Add current user command
-    messages = history + [{
-        "role": "user",
-        "content": f"/{command} {arguments}",
-    }]
+    async def run_session() -> tuple[ReviewOutcome, list[str]]:
+        # Load conversation history
+        sub = current_requester()
+        history = get_recent_messages(sub.telegram_id, limit=20)
 
-    conversation_id = create_or_get_session(telegram_id)
+        # The result cache is checked where the agent runs, from the same page
+        # fetch the agent uses
+        if TASK_EXECUTION == "queue":
+            return await jobqueue.run_remote(
+                sub.chat_id, sub.telegram_id, command, arguments, system_prompt, history, progress_callback,
+                ask_user, key[1], fresh,
+            )
+        outcome = await execute_review(
+            command, arguments, system_prompt, history, manifest, progress_callback, ask_user, key[1], fresh,
+        )
+        return outcome, manifest
 
     try:
-        # Run agent with ASK_USER loop
-        while True:
-            result_text = await run_agent(
-                system_prompt=system_prompt,
-                messages=messages,
-                tools=TOOLS,
-                progress_callback=progress_callback,
-                source="telegram",  # Use optimized settings for Telegram
-            )
+        outcome, files = await run_session()
 
-            if result_text.strip().startswith(ASK_USER_PREFIX):
-                # Extract and send question
-                question = result_text.strip()[len(ASK_USER_PREFIX):].strip()
-                await bot.send_message(chat_id=chat_id, text=f"🤔 {question}")
-
-                # Wait for user reply
-                user_reply = await wait_for_user_reply(telegram_id, timeout=300)
-                if user_reply is None:
-                    await bot.send_message(chat_id=chat_id, text="No reply received. Task cancelled.")
-                    return
-
-                # Append question and answer to messages
-                messages.append({"role": "assistant", "content": result_text})
-                messages.append({"role": "user", "content": user_reply})
-            else:
-                # Final result
-                break
-
-        # Save to conversation history
-        save_message(conversation_id, "user", f"/{command} {arguments}")
-        save_message(conversation_id, "assistant", result_text)
+        cached = outcome.cached
+        if cached:
+            final_subscribers = release()
+            _save_exchange(final_subscribers, command, arguments, cached["summary"])
+            await _deliver_to_chats(bot, final_subscribers, cached["summary"], command, arguments, cached["files"])
+            finish_status(f"✅ Review complete (cached result from {cached['created_at'][:16]} UTC).",
+                          final_subscribers)
+            return
+
+        result_text = outcome.text
+        if result_text is None:
+            for sub in release():
+                await bot.send_message(chat_id=sub.chat_id, text="No reply received. Task cancelled.")
+            return
+
+        final_subscribers = release()
 
-        # Deliver result
-        await deliver_result(bot, chat_id, result_text, command, arguments)
+        # Save to each requester's conversation history
+        _save_exchange(final_subscribers, command, arguments, result_text)
+
+        # Deliver result once per chat
+        files = await _deliver_to_chats(bot, final_subscribers, result_text, command, arguments, files)
+
+        if outcome.cache_key and not result_text.startswith(("[ERROR]", "[Agent")):
+            try:
+                await asyncio.to_thread(result_cache.store, outcome.cache_key, command, arguments, result_text, files)
+            except OSError:
+                pass  # Caching is best-effort
 
         # Update status
-        await bot.edit_message_text(
-            chat_id=chat_id,
-            message_id=status_message.message_id,
-            text="✅ Review complete.",
-        )
+        finish_status("✅ Review complete.", final_subscribers)
+
+    except asyncio.CancelledError:
+        # /cancel: the agent's model request and tool subprocesses were aborted
+        discard_outputs(manifest)
+        finish_status("🛑 Cancelled.", release())
+        raise
 
     except Exception as e:
-        await bot.edit_message_text(
-            chat_id=chat_id,
-            message_id=status_message.message_id,
-            text=f"❌ Error: {str(e)[:100]}",
-        )
+        finish_status(f"❌ Error: {str(e)[:100]}", release())
@@ -4,14 +4,36 @@ import asyncio
 import glob as glob_module
 import os
 import re
+import signal
 import subprocess
+from contextvars import ContextVar
 from config import PROJECT_ROOT, BASH_TIMEOUT_SECONDS
+import prefetch
 
 # Hard limits to prevent runaway usage
 BASH_OUTPUT_MAX_CHARS = 50_000
 READ_MAX_LINES = 2000
 GREP_MAX_RESULTS = 500
 
+# Deliverable files are markdown written under these directories
+OUTPUT_DIRS = ("reviews", "social-reviews")
+
+
+class OutputManifest(list):
+    """
+    Absolute paths of the deliverables a task's write calls produced, in write
+    order. `originals` keeps what each path held before the task first wrote
+    it (None if the task created it), so a cancelled task can be undone.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.originals: dict[str, bytes | None] = {}
+
+
+# Output manifest of the running task. Set per task by execute_review.
+output_manifest: ContextVar[OutputManifest | None] = ContextVar("output_manifest", default=None)
+
 # Blocked bash patterns
 BASH_BLOCKED_PATTERNS = [
     r"\brm\s+-rf\b",
@@ -117,28 +139,56 @@ async def tool_bash(command: str) -> str:
         if re.search(pattern, command):
             return f"[BLOCKED] Command matches blocked pattern"
 
+    # A fetch the task already started speculatively (see prefetch.py)
+    prefetched = await prefetch.serve_bash(command)
+    if prefetched is not None:
+        return _format_bash_output(*prefetched)
+
+    proc = None
     try:
+        # Own process group, so the whole pipeline can be killed on timeout or cancel
         proc = await asyncio.create_subprocess_shell(
             command,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
             cwd=PROJECT_ROOT,
+            start_new_session=True,
         )
         stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=BASH_TIMEOUT_SECONDS)
-        output = stdout.decode("utf-8", errors="replace")
-        err = stderr.decode("utf-8", errors="replace")
-        combined = output
-        if err:
-            combined += f"\n[STDERR]\n{err}"
-        if len(combined) > BASH_OUTPUT_MAX_CHARS:
-            combined = combined[:BASH_OUTPUT_MAX_CHARS] + "\n[TRUNCATED]"
-        return combined if combined else "[No output]"
+        return _format_bash_output(
+            stdout.decode("utf-8", errors="replace"),
+            stderr.decode("utf-8", errors="replace"),
+        )
     except asyncio.TimeoutError:
+        _kill_process_group(proc)
         return f"[TIMEOUT] Command exceeded {BASH_TIMEOUT_SECONDS}s limit"
+    except asyncio.CancelledError:
+        _kill_process_group(proc)
+        raise
     except Exception as e:
         return f"[ERROR] {e}"
 
 
+def _format_bash_output(output: str, err: str) -> str:
+    """Combine stdout and stderr the way the agent sees them."""
+    combined = output
+    if err:
+        combined += f"\n[STDERR]\n{err}"
+    if len(combined) > BASH_OUTPUT_MAX_CHARS:
+        combined = combined[:BASH_OUTPUT_MAX_CHARS] + "\n[TRUNCATED]"
+    return combined if combined else "[No output]"
+
+
+def _kill_process_group(proc: asyncio.subprocess.Process | None):
+    """SIGKILL a subprocess started with start_new_session and all its children."""
+    if proc is None or proc.returncode is not None:
+        return
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
 def tool_read(file_path: str, offset: int | None, limit: int | None) -> str:
     """Read a file safely."""
     abs_path = os.path.normpath(os.path.join(PROJECT_ROOT, file_path))
@@ -165,13 +215,55 @@ def tool_write(file_path: str, content: str) -> str:
         return "[ERROR] Path traversal not allowed"
     try:
         os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+        original = _original_content(abs_path)
         with open(abs_path, "w", encoding="utf-8") as f:
             f.write(content)
+        _record_output(abs_path, original)
         return f"[OK] Written {len(content)} chars to {file_path}"
     except Exception as e:
         return f"[ERROR] {e}"
 
 
+def discard_outputs(manifest: OutputManifest):
+    """Undo a cancelled task's outputs: delete files it created, restore files it overwrote."""
+    for path in manifest:
+        original = manifest.originals.get(path)
+        try:
+            if original is None:
+                os.remove(path)
+            else:
+                with open(path, "wb") as f:
+                    f.write(original)
+        except OSError:
+            pass
+
+
+def _is_deliverable(abs_path: str) -> bool:
+    top = os.path.relpath(abs_path, PROJECT_ROOT).split(os.sep, 1)[0]
+    return abs_path.endswith(".md") and top in OUTPUT_DIRS
+
+
+def _original_content(abs_path: str) -> bytes | None:
+    """A deliverable's bytes before the current task first writes it (None if it doesn't exist yet)."""
+    manifest = output_manifest.get()
+    if manifest is None or abs_path in manifest or not _is_deliverable(abs_path):
+        return None
+    try:
+        with open(abs_path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _record_output(abs_path: str, original: bytes | None):
+    """Add a written deliverable, and what it held before, to the current task's output manifest."""
+    manifest = output_manifest.get()
+    if manifest is None or abs_path in manifest or not _is_deliverable(abs_path):
+        return
+    manifest.append(abs_path)
+    manifest.originals[abs_path] = original
+
+
 def tool_glob(pattern: str, path: str | None) -> str:
     """Find files matching a glob pattern."""
     search_root = os.path.normpath(os.path.join(PROJECT_ROOT, path or "."))
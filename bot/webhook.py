@@ -0,0 +1,191 @@
+"""Webhook ingestion - a small embedded HTTP server feeding the Application.
+
+Telegram POSTs each update as JSON to WEBHOOK_PATH with the secret token in
+the X-Telegram-Bot-Api-Secret-Token header. Verified updates are put on the
+Application's update queue; handlers then run with the builder's
+concurrent_updates bound.
+
+If WEBHOOK_URL is unset the server only listens locally and the webhook is
+not registered with Telegram, so recorded updates can be replayed with:
+    python bot/webhook.py post update.json [more.json ...]
+"""
+
+import asyncio
+import hmac
+import json
+import logging
+import signal
+import sys
+from urllib.request import Request, urlopen
+
+from telegram import Update
+from telegram.ext import Application
+
+from config import (
+    WEBHOOK_URL,
+    WEBHOOK_LISTEN,
+    WEBHOOK_PORT,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET_TOKEN,
+    CONCURRENT_UPDATES,
+)
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+MAX_BODY_BYTES = 1024 * 1024
+REQUEST_TIMEOUT_SECONDS = 10
+
+STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+class WebhookServer:
+    """Minimal HTTP/1.1 server that accepts Telegram update POSTs."""
+
+    def __init__(self, app: Application, path: str, secret_token: str):
+        self.app = app
+        self.path = "/" + path.strip("/")
+        self.secret_token = secret_token
+        self.received = 0
+        self.rejected = 0
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                status = await asyncio.wait_for(self._process(reader), REQUEST_TIMEOUT_SECONDS)
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                status = 400
+            except Exception as e:
+                logger.error(f"Webhook request failed: {type(e).__name__}: {e}")
+                status = 500
+            if status != 200:
+                self.rejected += 1
+            body = STATUS_TEXT[status].encode("ascii")
+            writer.write(
+                f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                f"Content-Type: text/plain\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("ascii")
+                + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _process(self, reader: asyncio.StreamReader) -> int:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) != 3:
+            return 400
+        method, target, _ = request_line
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if target.split("?", 1)[0].rstrip("/") != self.path.rstrip("/"):
+            return 404
+        if method != "POST":
+            return 405
+        if not hmac.compare_digest(headers.get(SECRET_HEADER, ""), self.secret_token):
+            return 403
+        length = int(headers.get("content-length", "0"))
+        if length > MAX_BODY_BYTES:
+            return 413
+
+        try:
+            data = json.loads(await reader.readexactly(length))
+        except json.JSONDecodeError:
+            return 400
+        if not isinstance(data, dict):  # Valid JSON, but not an update object
+            return 400
+        try:
+            update = Update.de_json(data, self.app.bot)
+        except (TypeError, KeyError, AttributeError, ValueError):
+            return 400
+        if update is None:
+            return 400
+        await self.app.update_queue.put(update)
+        self.received += 1
+        return 200
+
+    async def start(self, host: str, port: int) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self._handle, host, port)
+
+
+async def serve(app: Application, allowed_updates: list[str]):
+    """Run the application fed by the webhook server until SIGINT/SIGTERM."""
+    if not WEBHOOK_SECRET_TOKEN:
+        raise RuntimeError("WEBHOOK_SECRET_TOKEN must be set in webhook mode")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    async with app:
+        if app.post_init:
+            await app.post_init(app)
+        await app.start()
+
+        server = WebhookServer(app, WEBHOOK_PATH, WEBHOOK_SECRET_TOKEN)
+        http = await server.start(WEBHOOK_LISTEN, WEBHOOK_PORT)
+        logger.info(f"Webhook server listening on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH.strip('/')}")
+
+        if WEBHOOK_URL:
+            await app.bot.set_webhook(
+                url=WEBHOOK_URL.rstrip("/") + "/" + WEBHOOK_PATH.strip("/"),
+                secret_token=WEBHOOK_SECRET_TOKEN,
+                allowed_updates=allowed_updates,
+                max_connections=CONCURRENT_UPDATES,
+            )
+            logger.info("Webhook registered with Telegram")
+        else:
+            logger.info("WEBHOOK_URL not set - serving locally without registering the webhook")
+
+        try:
+            await stop.wait()
+        finally:
+            http.close()
+            await http.wait_closed()
+            logger.info(f"Webhook server stopped ({server.received} updates, {server.rejected} rejected)")
+            await app.stop()
+
+
+def post_updates(paths: list[str]) -> int:
+    """POST recorded update JSON files to the local webhook server."""
+    url = f"http://127.0.0.1:{WEBHOOK_PORT}/{WEBHOOK_PATH.strip('/')}"
+    failures = 0
+    for path in paths:
+        with open(path, "rb") as f:
+            body = f.read()
+        req = Request(url, data=body, method="POST", headers={
+            "Content-Type": "application/json",
+            "X-Telegram-Bot-Api-Secret-Token": WEBHOOK_SECRET_TOKEN,
+        })
+        try:
+            with urlopen(req, timeout=REQUEST_TIMEOUT_SECONDS) as resp:
+                print(f"{path}: {resp.status}")
+        except Exception as e:
+            failures += 1
+            print(f"{path}: {e}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "post":
+        print("Usage: python bot/webhook.py post <update.json> [...]", file=sys.stderr)
+        sys.exit(1)
+    sys.exit(post_updates(sys.argv[2:]))
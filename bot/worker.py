@@ -0,0 +1,161 @@
+"""Agent worker - runs queued reviews outside the Telegram process.
+
+Start alongside the bot when TASK_EXECUTION=queue (queue mode is opt-in;
+the default Procfile runs only the bot):
+    python bot/worker.py [--processes N]
+
+Workers never create or migrate the schema. They wait for the bot's init_db
+so they don't contend with its migrations for the database lock.
+
+Each process claims pending tasks from the shared database and runs up to
+WORKER_CONCURRENCY agent loops at once, streaming progress, questions and
+results back as task events (see jobqueue.py).
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import time
+from typing import Optional
+
+import config
+import database
+from config import WORKER_CONCURRENCY, QUEUE_POLL_SECONDS
+from runner import execute_review
+from tools import OutputManifest, discard_outputs
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_WAIT_SECONDS = 2
+
+
+class Worker:
+    """Claims tasks and runs them, relaying replies and cancels from the bot."""
+
+    def __init__(self, name: str, concurrency: int):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self._running: dict[int, asyncio.Task] = {}
+        self._replies: dict[int, asyncio.Queue] = {}
+        self._cursor = 0  # Last 'down' event seen
+
+    async def run(self):
+        while True:
+            try:
+                await self._claim()
+                await self._poll_down()
+                if self._running:
+                    await asyncio.to_thread(database.heartbeat_tasks, list(self._running))
+            except Exception as e:
+                logger.error(f"Worker {self.name} poll failed: {type(e).__name__}: {e}")
+            await asyncio.sleep(QUEUE_POLL_SECONDS)
+
+    async def _claim(self):
+        while len(self._running) < self.concurrency:
+            task = await asyncio.to_thread(database.claim_task, self.name)
+            if task is None:
+                return
+            logger.info(f"Worker {self.name} claimed task {task['id']}: /{task['command']} {task['arguments']}")
+            self._replies[task["id"]] = asyncio.Queue()
+            self._running[task["id"]] = asyncio.create_task(self._execute(task))
+
+    async def _poll_down(self):
+        """Route reply and cancel events to the tasks they belong to."""
+        events = await asyncio.to_thread(database.read_task_events, list(self._running), "down", self._cursor)
+        for event in events:
+            self._cursor = max(self._cursor, event["id"])
+            task_id = event["task_id"]
+            if event["kind"] == "reply" and task_id in self._replies:
+                self._replies[task_id].put_nowait(event["payload"]["text"])
+            elif event["kind"] == "cancel" and task_id in self._running:
+                logger.info(f"Worker {self.name} cancelling task {task_id}")
+                self._running[task_id].cancel()
+
+    async def _execute(self, task: dict):
+        task_id = task["id"]
+        manifest = OutputManifest()
+
+        def post(kind: str, payload: dict):
+            return asyncio.to_thread(database.post_task_event, task_id, "up", kind, payload)
+
+        async def progress_callback(line: str):
+            await post("progress", {"line": line})
+
+        async def ask_user(question: str) -> Optional[str]:
+            await post("ask", {"question": question})
+            return await self._replies[task_id].get()
+
+        status, error = "done", None
+        try:
+            outcome = await execute_review(
+                task["command"],
+                task["arguments"],
+                task["payload"]["system_prompt"],
+                task["payload"]["history"],
+                manifest,
+                progress_callback,
+                ask_user,
+                task["payload"].get("cache_scope"),
+                task["payload"].get("fresh", False),
+            )
+            if outcome.text is not None or outcome.cached:
+                await post("result", {
+                    "text": outcome.text,
+                    "files": manifest,
+                    "cache_key": outcome.cache_key,
+                    "cached": outcome.cached,
+                })
+        except asyncio.CancelledError:
+            discard_outputs(manifest)
+            status = "cancelled"
+        except Exception as e:
+            status, error = "failed", f"{type(e).__name__}: {e}"
+            logger.error(f"Task {task_id} failed: {error}")
+            await post("error", {"message": str(e)[:500]})
+        finally:
+            if status == "cancelled":
+                await asyncio.to_thread(database.delete_task_events, task_id)
+            await asyncio.to_thread(database.finish_task, task_id, status, error)
+            self._running.pop(task_id, None)
+            self._replies.pop(task_id, None)
+
+
+def run_worker(index: int):
+    """Entry point of one worker process."""
+    logging.basicConfig(level=logging.INFO)
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    while not database.schema_ready():
+        logger.info(f"Worker {name} waiting for the bot to initialise the database")
+        time.sleep(SCHEMA_WAIT_SECONDS)
+    logger.info(f"Worker {name} (#{index}) started with {WORKER_CONCURRENCY} slots")
+    try:
+        asyncio.run(Worker(name, WORKER_CONCURRENCY).run())
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run queued review tasks.")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes to start")
+    args = parser.parse_args()
+    config.validate(("ANTHROPIC_API_KEY",))
+
+    if args.processes <= 1:
+        run_worker(0)
+        return
+    procs = [multiprocessing.Process(target=run_worker, args=(i,)) for i in range(args.processes)]
+    for proc in procs:
+        proc.start()
+    try:
+        for proc in procs:
+            proc.join()
+    except KeyboardInterrupt:
+        for proc in procs:
+            proc.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Crawl frontier for the site crawler.
+
+URLs are deduplicated when they are queued, not when they are popped, and
+come out ordered by (depth, -score, insertion order) - breadth first, with
+higher-scored URLs first within a depth. The seen-set can be an exact set
+or, for very large sites, a fixed-size Bloom filter. The whole frontier
+serializes to JSON so an interrupted crawl can resume from a checkpoint.
+
+Usage (as a module):
+    from crawl_frontier import Frontier
+    frontier = Frontier()
+    frontier.push("https://example.com/", 0)
+    url, depth = frontier.pop()
+"""
+
+import base64
+import hashlib
+import heapq
+import json
+import math
+import os
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter for URL strings (no false negatives, ~error_rate false positives)."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def __len__(self):
+        return self.count
+
+    def to_dict(self):
+        return {
+            "capacity": self.capacity,
+            "error_rate": self.error_rate,
+            "count": self.count,
+            "bits": base64.b64encode(bytes(self.bits)).decode("ascii"),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        bloom = cls(data["capacity"], data["error_rate"])
+        bloom.bits = bytearray(base64.b64decode(data["bits"]))
+        bloom.count = data["count"]
+        return bloom
+
+
+class Frontier:
+    """Priority frontier with seen-set dedupe at enqueue time."""
+
+    def __init__(self, bloom_capacity=0):
+        self._heap = []  # (depth, -score, seq, url)
+        self._seq = 0
+        self.seen = BloomFilter(bloom_capacity) if bloom_capacity else set()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, url, depth, score=0):
+        """Queue url unless it was ever queued before. Returns True if it was added."""
+        if url in self.seen:
+            return False
+        self.seen.add(url)
+        self._enqueue(url, depth, score)
+        return True
+
+    def _enqueue(self, url, depth, score):
+        heapq.heappush(self._heap, (depth, -score, self._seq, url))
+        self._seq += 1
+
+    def pop(self):
+        """Return (url, depth) of the next URL to fetch."""
+        depth, _, _, url = heapq.heappop(self._heap)
+        return url, depth
+
+    def to_dict(self, in_flight=()):
+        """
+        Serializable state. in_flight is [(url, depth)] popped but not finished;
+        they are queued again on resume.
+        """
+        entries = [[url, depth, -neg_score] for depth, neg_score, _, url in sorted(self._heap)]
+        entries += [[url, depth, 0] for url, depth in in_flight]
+        seen = self.seen.to_dict() if isinstance(self.seen, BloomFilter) else sorted(self.seen)
+        return {"entries": entries, "seen": seen}
+
+    @classmethod
+    def from_dict(cls, data):
+        frontier = cls()
+        seen = data["seen"]
+        frontier.seen = BloomFilter.from_dict(seen) if isinstance(seen, dict) else set(seen)
+        for url, depth, score in data["entries"]:
+            frontier._enqueue(url, depth, score)
+        return frontier
+
+
+def save_checkpoint(path, state):
+    """Atomically write a crawl checkpoint."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path):
+    """Return a saved checkpoint, or None if there is none."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -7,29 +7,79 @@ Discovers all pages on a site via:
 2. robots.txt Sitemap directives
 3. Link following from the homepage (BFS, configurable depth)
 
+robots.txt is fetched once per run and, with the sitemap URL list, cached in
+site-cache.json for --site-cache-hours. Sitemaps are stream-parsed as they
+download and the children of a sitemap index are fetched concurrently. Each
+URL's <lastmod> is kept: recently modified URLs are crawled first and the
+date is recorded in the manifest.
+
+Pages are fetched concurrently (--concurrency) while a per-host scheduler
+keeps a minimum gap between request starts (--delay, or robots.txt
+Crawl-delay if larger) and caps requests in flight per host (--per-host).
+Concurrency overlaps slow responses and fetches across hosts; the default
+1s gap keeps the load on any one host at the sequential crawler's rate.
+--deadline stops starting new fetches after that many seconds.
+
+Recrawls are incremental: each page's ETag, Last-Modified and content hash
+are kept in page-validators.json, and pages the server answers with 304 Not
+Modified (or whose body hash is unchanged) reuse their cached HTML and are
+marked "unchanged" in the manifest.
+
+Each page's HTML is written to the cache as soon as it is fetched; only page
+metadata stays in memory. The manifest is rewritten every
+MANIFEST_FLUSH_PAGES pages with "complete": false, so an interrupted crawl
+still leaves a usable manifest and cache.
+
+The link-following frontier is deduplicated at enqueue time (--bloom-capacity
+swaps the exact seen-set for a Bloom filter on very large sites) and is
+checkpointed to crawl-checkpoint.json every CHECKPOINT_PAGES pages and on
+interruption; --resume continues an interrupted crawl from there.
+
+Near-duplicate pages (product variants, paginated lists, filter pages built
+from one template) are clustered by a SimHash of their main text as they are
+fetched (page_fingerprint.py). Every manifest page gets "cluster_size", and
+one page per cluster - the shallowest, then the shortest URL - is marked
+"representative"; the others name it in "duplicate_of". Reviewing only the
+representative pages covers each template once. --near-dup-distance sets how
+many of the 64 fingerprint bits may differ (-1 turns clustering off).
+
 Usage:
     python3 scripts/crawl_site.py <url> [--max-pages 100] [--max-depth 3] [--delay 1.0]
+        [--concurrency 8] [--per-host 4] [--deadline 0] [--max-body-mb 10]
+        [--bloom-capacity 0] [--resume] [--site-cache-hours 24] [--link-parser auto]
+        [--near-dup-distance 3]
 
 Output:
     reviews/[domain]/discovered-pages.json  — page manifest
     reviews/[domain]/.cache/[slug].html     — cached HTML per page
+    reviews/[domain]/page-validators.json   — ETag/Last-Modified/hash per URL
+    reviews/[domain]/crawl-checkpoint.json  — frontier state (removed when a crawl completes)
+    reviews/[domain]/site-cache.json        — cached robots.txt and sitemap URLs
 """
 
 import argparse
+import asyncio
+import contextlib
+import functools
 import gzip
 import json
 import os
 import re
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
-from html.parser import HTMLParser
-from io import BytesIO
 from urllib.parse import urljoin, urlparse
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError, URLError
 from urllib.robotparser import RobotFileParser
+import http.client
 import ssl
+import zlib
+
+from crawl_frontier import Frontier, load_checkpoint, save_checkpoint
+from http_pool import HTTPPool, decode_text
+from link_extract import get_engine
+from page_fingerprint import NearDuplicateIndex, fingerprint
+from page_validators import ValidatorStore
 
 # Create an SSL context that doesn't verify certificates (macOS compatibility)
 SSL_CONTEXT = ssl.create_default_context()
@@ -40,6 +90,35 @@ import xml.etree.ElementTree as ET
 
 USER_AGENT = "WebsiteAnalysisBot/1.0 (SEO/CRO/Content Review Tool)"
 
+# Pages between incremental manifest writes
+MANIFEST_FLUSH_PAGES = 25
+
+# Pages between frontier checkpoints
+CHECKPOINT_PAGES = 100
+CHECKPOINT_FILE = "crawl-checkpoint.json"
+
+SITE_CACHE_FILE = "site-cache.json"
+
+# Sitemap protocol limits: 50 MB uncompressed per file; index nesting we follow
+SITEMAP_MAX_BYTES = 50 * 1024 * 1024
+SITEMAP_MAX_DEPTH = 3
+
+# Linked resources that are never pages
+SKIPPED_EXTENSIONS = frozenset((
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".css", ".js",
+    ".zip", ".xml", ".json", ".ico", ".woff", ".woff2", ".ttf", ".eot",
+    ".mp4", ".mp3", ".avi", ".mov", ".webp", ".webm",
+))
+
+# Root-relative hrefs: no "//" host and none of the characters urlsplit() deletes
+ROOT_RELATIVE_RE = re.compile(r"/(?!/)[^\t\r\n]*\Z")
+
+# Link extraction engine (see link_extract.py); --link-parser overrides
+LINK_SCANNER = get_engine("auto")
+
+# Keep-alive connections shared by every fetch in the run
+HTTP_POOL = HTTPPool(timeout=15, ssl_context=SSL_CONTEXT)
+
 
 def normalize_url(url):
     """Normalize a URL for deduplication."""
@@ -65,207 +144,546 @@ def url_to_slug(url, base_domain):
     return slug or "homepage"
 
 
-def fetch_url(url, timeout=15):
+def fetch_url(url):
     """Fetch a URL and return (content_bytes, content_type, status_code, final_url)."""
-    req = Request(url, headers={"User-Agent": USER_AGENT})
-    try:
-        resp = urlopen(req, timeout=timeout, context=SSL_CONTEXT)
-        content = resp.read()
-        content_type = resp.headers.get("Content-Type", "")
-        # Handle gzip
-        if resp.headers.get("Content-Encoding") == "gzip" or url.endswith(".gz"):
-            try:
-                content = gzip.decompress(content)
-            except Exception:
-                pass
-        return content, content_type, resp.status, resp.url
-    except HTTPError as e:
-        return None, "", e.code, url
-    except (URLError, OSError) as e:
-        print(f"  [ERROR] Failed to fetch {url}: {e}", file=sys.stderr)
-        return None, "", 0, url
-
-
-class LinkExtractor(HTMLParser):
-    """Extract <a href> links from HTML."""
+    return fetch_response(url)[:4]
 
-    def __init__(self):
-        super().__init__()
-        self.links = []
 
-    def handle_starttag(self, tag, attrs):
-        if tag == "a":
-            for name, value in attrs:
-                if name == "href" and value:
-                    self.links.append(value)
+def fetch_response(url, headers=None):
+    """
+    Fetch a URL with extra request headers. Returns (content_bytes, content_type,
+    status_code, final_url, response_headers); content is None for non-2xx.
+    """
+    try:
+        resp = HTTP_POOL.get(url, {"User-Agent": USER_AGENT, **(headers or {})})
+    except (http.client.HTTPException, ValueError, OSError) as e:
+        print(f"  [ERROR] Failed to fetch {url}: {e}", file=sys.stderr)
+        return None, "", 0, url, {}
+    if not 200 <= resp.status < 300:
+        return None, "", resp.status, url, resp.headers
+    if resp.truncated:
+        print(f"  [TRUNCATED] Body over {HTTP_POOL.max_body // 1024} KB: {url}", file=sys.stderr)
+    return resp.body, resp.headers.get("Content-Type", ""), resp.status, resp.url, resp.headers
+
+
+class PolitenessScheduler:
+    """Per-host pacing: a minimum gap between request starts and a cap on requests in flight."""
+
+    def __init__(self, min_gap, max_in_flight):
+        self.min_gap = min_gap
+        self.max_in_flight = max(1, max_in_flight)
+        self._hosts = {}  # host -> {"semaphore", "gap", "next_start"}
+
+    def _host(self, host):
+        if host not in self._hosts:
+            self._hosts[host] = {
+                "semaphore": asyncio.Semaphore(self.max_in_flight),
+                "gap": self.min_gap,
+                "next_start": 0.0,
+            }
+        return self._hosts[host]
+
+    def set_crawl_delay(self, host, seconds):
+        """Honor a robots.txt Crawl-delay when it is longer than the configured gap."""
+        state = self._host(host)
+        state["gap"] = max(self.min_gap, seconds)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, url):
+        state = self._host(urlparse(url).netloc)
+        async with state["semaphore"]:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            # Reserve a start time before sleeping so concurrent waiters queue up behind it
+            start = max(now, state["next_start"])
+            state["next_start"] = start + state["gap"]
+            if start > now:
+                await asyncio.sleep(start - now)
+            yield
+
+
+class CrawlEngine:
+    """Concurrent fetcher: blocking fetch_url calls run on a thread pool under politeness limits."""
+
+    def __init__(self, concurrency, politeness, deadline=0, cache_dir=None, validators=None):
+        self.politeness = politeness
+        self.concurrency = max(1, concurrency)
+        self.deadline = time.monotonic() + deadline if deadline else None
+        self.cache_dir = cache_dir
+        self.validators = validators
+        self.requests = 0
+        self.not_modified = 0
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        self._slots = None
+
+    def expired(self):
+        """True once the global deadline has passed; no new fetches should start."""
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    async def run(self, url, func, *args):
+        """Run the blocking request func(*args) for url under the global and per-host limits."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        async with self._slots:
+            async with self.politeness.slot(url):
+                self.requests += 1
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, func, *args)
+
+    async def fetch(self, url, headers=None):
+        """fetch_response(url, headers) under the global and per-host limits."""
+        return await self.run(url, fetch_response, url, headers)
+
+    async def fetch_page(self, url):
+        """
+        Fetch an HTML page, revalidating its cached copy when validators are known.
+        Returns (html, status, unchanged), or None if the URL is not a fetchable HTML page.
+        """
+        cache_path = os.path.join(self.cache_dir, f"{url_to_slug(url, None)}.html")
+        headers = self.validators.conditional_headers(url, cache_path)
+        content, content_type, status, final_url, resp_headers = await self.fetch(url, headers)
+        if status == 304 and headers:
+            self.not_modified += 1
+            self.validators.touch(url)
+            with open(cache_path, "r", encoding="utf-8") as f:
+                return f.read(), status, True
+        # Only process HTML pages
+        if not content or status != 200 or "text/html" not in content_type.lower():
+            return None
+        unchanged = self.validators.is_unchanged(url, content)
+        self.validators.record(url, url_to_slug(url, None), resp_headers, content)
+        return decode_text(content, content_type), status, unchanged
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class ManifestWriter:
+    """Writes fetched pages through to the cache and keeps the manifest on disk up to date."""
+
+    def __init__(self, reviews_dir, cache_dir, header, sitemap_urls, validators, path_prefix=None,
+                 near_dup_distance=3):
+        self.path = os.path.join(reviews_dir, "discovered-pages.json")
+        self.cache_dir = cache_dir
+        self.header = header
+        self.sitemap_urls = sitemap_urls
+        self.validators = validators
+        self.path_prefix = path_prefix.rstrip("/") if path_prefix else None
+        self.pages = {}  # url -> manifest entry
+        self.near_duplicates = NearDuplicateIndex(near_dup_distance) if near_dup_distance >= 0 else None
+        self._unflushed = 0
+
+    def restore(self):
+        """Reload the pages of a previous, interrupted run's manifest."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.pages = {page["url"]: page for page in json.load(f).get("pages", [])}
+        except (OSError, ValueError):
+            self.pages = {}
+        if self.near_duplicates:
+            for page_url, page in self.pages.items():
+                value = page.get("fingerprint")
+                self.near_duplicates.add(page_url, int(value, 16) if value else None)
+
+    def add(self, page_url, info, html):
+        """Save a fetched page's HTML (unless a 304 kept the cached copy) and record it."""
+        # Filter by path prefix if specified
+        if self.path_prefix and not urlparse(page_url).path.rstrip("/").startswith(self.path_prefix):
+            return
+        slug = url_to_slug(page_url, self.header["domain"])
+        if info["status"] != 304:
+            with open(os.path.join(self.cache_dir, f"{slug}.html"), "w", encoding="utf-8") as f:
+                f.write(html)
+        self.pages[page_url] = {
+            "url": page_url,
+            "slug": slug,
+            "source": "sitemap+crawl" if page_url in self.sitemap_urls else "link-follow",
+            "lastmod": self.sitemap_urls.get(page_url),
+            "depth": info["depth"],
+            "status": info["status"],
+            "unchanged": info["unchanged"],
+        }
+        if self.near_duplicates:
+            value = fingerprint(html)
+            self.pages[page_url]["fingerprint"] = f"{value:016x}" if value is not None else None
+            self.near_duplicates.add(page_url, value)
+        self._unflushed += 1
+        if self._unflushed >= MANIFEST_FLUSH_PAGES:
+            self.flush()
+
+    def flush(self, complete=False):
+        """Atomically rewrite the manifest (and the validators that match the cache)."""
+        pages = [self.pages[url] for url in sorted(self.pages)]
+        self._mark_representatives()
+        manifest = dict(self.header)
+        manifest.update({
+            "total_pages": len(pages),
+            "unchanged_pages": sum(page["unchanged"] for page in pages),
+            "representative_pages": sum(page.get("representative", True) for page in pages),
+            "complete": complete,
+            "pages": pages,
+        })
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self.validators.save()
+        self._unflushed = 0
+        return manifest
+
+    def _mark_representatives(self):
+        """Pick one page per near-duplicate cluster: the shallowest (sitemap-only pages last), then shortest URL."""
+        if not self.near_duplicates:
+            return
+        clusters = {}
+        for page_url in self.pages:
+            clusters.setdefault(self.near_duplicates.cluster_of[page_url], []).append(self.pages[page_url])
+        for members in clusters.values():
+            representative = min(members, key=lambda page: (page["depth"] < 0, page["depth"],
+                                                            len(page["url"]), page["url"]))
+            for page in members:
+                page["representative"] = page is representative
+                page["duplicate_of"] = None if page is representative else representative["url"]
+                page["cluster_size"] = len(members)
+
+
+class SiteCache:
+    """Per-domain robots.txt and sitemap results, reused while younger than ttl seconds."""
+
+    def __init__(self, reviews_dir, ttl):
+        self.path = os.path.join(reviews_dir, SITE_CACHE_FILE)
+        self.ttl = ttl
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry and time.time() - entry["fetched_at"] < self.ttl:
+            return entry["value"]
+        return None
+
+    def put(self, key, value):
+        self.entries[key] = {"fetched_at": time.time(), "value": value}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+
+@functools.lru_cache(maxsize=65536)
+def resolve_link(base_url, base_domain, href):
+    """Normalized URL of a same-domain page link, or None if href should not be crawled."""
+    # Skip non-http links
+    if href.startswith(("#", "mailto:", "tel:", "javascript:")):
+        return None
+    # Resolve relative URLs
+    parsed = urlparse(urljoin(base_url, href))
+    # Same domain only
+    if parsed.netloc != base_domain:
+        return None
+    # Skip non-page resources
+    if os.path.splitext(parsed.path)[1].lower() in SKIPPED_EXTENSIONS:
+        return None
+    # normalize_url() without parsing the URL again
+    return f"{parsed.scheme}://{parsed.netloc}{parsed.path.rstrip('/') or '/'}"
 
 
 def extract_links(html, base_url):
-    """Extract same-domain links from HTML content."""
-    base_parsed = urlparse(base_url)
-    base_domain = base_parsed.netloc
+    """Extract same-domain links (<a href> and the canonical link) from HTML content."""
+    base_domain = urlparse(base_url).netloc
 
-    parser = LinkExtractor()
     try:
-        parser.feed(html)
+        hrefs, base_href, canonical = LINK_SCANNER(html)
     except Exception:
         return []
-
+    if base_href:
+        base_url = urljoin(base_url, base_href)
+    if canonical:
+        hrefs.append(canonical)
+
+    # Root-relative hrefs resolve the same from every page of the site, so they are
+    # cached per origin and the menus and footers repeated on every page resolve once
+    parsed_base = urlparse(base_url)
+    origin = f"{parsed_base.scheme}://{parsed_base.netloc}"
+    same_origin = parsed_base.netloc == base_domain
     links = set()
-    for href in parser.links:
-        # Skip non-http links
-        if href.startswith(("#", "mailto:", "tel:", "javascript:")):
-            continue
-        # Resolve relative URLs
-        full_url = urljoin(base_url, href)
-        parsed = urlparse(full_url)
-        # Same domain only
-        if parsed.netloc != base_domain:
+    for href in set(hrefs):
+        root_relative = ROOT_RELATIVE_RE.match(href) is not None
+        if root_relative and same_origin and ";" not in href and "/." not in href:
+            # No ;params or dot segments: what urljoin() + urlparse() would give, without calling them
+            path = href.partition("?")[0].partition("#")[0]
+            if os.path.splitext(path)[1].lower() not in SKIPPED_EXTENSIONS:
+                links.add(f"{origin}{path.rstrip('/') or '/'}")
             continue
-        # Skip non-page resources
-        ext = os.path.splitext(parsed.path)[1].lower()
-        if ext in (".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".css", ".js",
-                    ".zip", ".xml", ".json", ".ico", ".woff", ".woff2", ".ttf", ".eot",
-                    ".mp4", ".mp3", ".avi", ".mov", ".webp", ".webm"):
-            continue
-        links.add(normalize_url(full_url))
+        link = resolve_link(origin if root_relative else base_url, base_domain, href)
+        if link:
+            links.add(link)
 
     return links
 
 
-def discover_from_sitemap(base_url):
-    """Discover pages from sitemap.xml and robots.txt."""
+async def discover_from_sitemap(base_url, sitemap_directives, engine, site_cache):
+    """Discover pages from sitemap.xml and robots.txt. Returns {url: lastmod or None}."""
+    cached = site_cache.get("sitemap")
+    if cached is not None:
+        print("  Using cached sitemap results")
+        return cached
+
     parsed = urlparse(base_url)
     base = f"{parsed.scheme}://{parsed.netloc}"
-    urls = set()
+    urls = {}
+    parsed_sitemaps = set()
+    failed = False
 
-    # Collect sitemap URLs to try
+    # Collect sitemap URLs to try, then those listed in robots.txt
     sitemap_urls = [
         f"{base}/sitemap.xml",
         f"{base}/sitemap_index.xml",
     ]
-
-    # Check robots.txt for Sitemap directives
-    robots_url = f"{base}/robots.txt"
-    content, _, status, _ = fetch_url(robots_url)
-    if content and status == 200:
-        text = content.decode("utf-8", errors="replace")
-        for line in text.splitlines():
-            line = line.strip()
-            if line.lower().startswith("sitemap:"):
-                sitemap_url = line.split(":", 1)[1].strip()
-                if sitemap_url not in sitemap_urls:
-                    sitemap_urls.append(sitemap_url)
-
-    # Parse all sitemaps
-    for sitemap_url in sitemap_urls:
-        urls.update(parse_sitemap(sitemap_url))
-
+    for sitemap_url in sitemap_directives:
+        if sitemap_url not in sitemap_urls:
+            sitemap_urls.append(sitemap_url)
+
+    async def parse(sitemap_url, depth):
+        nonlocal failed
+        if depth > SITEMAP_MAX_DEPTH or sitemap_url in parsed_sitemaps:
+            return
+        parsed_sitemaps.add(sitemap_url)
+        pages, children, status = await engine.run(sitemap_url, parse_sitemap, sitemap_url)
+        failed = failed or status == 0 or status >= 500
+        for url, lastmod in pages.items():
+            # A URL listed in several sitemaps keeps its most recent lastmod
+            urls[url] = max(lastmod or "", urls.get(url) or "") or None
+        # Child sitemaps of an index are fetched concurrently
+        await asyncio.gather(*(parse(child, depth + 1) for child in children))
+
+    await asyncio.gather(*(parse(sitemap_url, 0) for sitemap_url in sitemap_urls))
+    # Don't remember a result that a network error or server error may have cut short
+    if not failed:
+        site_cache.put("sitemap", urls)
     return urls
 
 
-def parse_sitemap(sitemap_url, depth=0):
-    """Parse a sitemap XML and return discovered URLs. Handles sitemap indexes recursively."""
-    if depth > 3:  # Prevent infinite recursion
-        return set()
+def parse_sitemap(sitemap_url):
+    """
+    Stream-parse one sitemap or sitemap index without holding it in memory.
+    Returns ({page_url: lastmod or None}, [child sitemap URLs], status); status is 0
+    if the fetch or the read failed.
+    """
+    pages = {}
+    children = []
+    try:
+        stream = HTTP_POOL.open(sitemap_url, {"User-Agent": USER_AGENT}, max_body=SITEMAP_MAX_BYTES)
+    except (http.client.HTTPException, ValueError, OSError) as e:
+        print(f"  [ERROR] Failed to fetch {sitemap_url}: {e}", file=sys.stderr)
+        return pages, children, 0
+
+    with stream:
+        if stream.status != 200:
+            return pages, children, stream.status
+        status = stream.status
+        level = 0
+        loc = lastmod = None
+        # Reading can fail anywhere from the first peek (a corrupt Content-Encoding or a
+        # reset connection); either way only this sitemap is skipped
+        try:
+            # A gzipped sitemap file (transfer encoding is already decoded by the pool)
+            source = gzip.GzipFile(fileobj=stream) if stream.peek(2) == b"\x1f\x8b" else stream
+            events = ET.iterparse(source, events=("start", "end"))
+            for event, elem in events:
+                if event == "start":
+                    if level == 0:
+                        root = elem
+                    level += 1
+                    continue
+                level -= 1
+                # Namespaces vary (and image/video extensions nest their own <loc>), so
+                # match local names at entry level: <urlset><url><loc>
+                tag = elem.tag.rsplit("}", 1)[-1]
+                if level == 2 and tag == "loc":
+                    loc = (elem.text or "").strip() or None
+                elif level == 2 and tag == "lastmod":
+                    lastmod = (elem.text or "").strip() or None
+                elif level == 1:
+                    if loc and tag == "url":
+                        pages[normalize_url(loc)] = lastmod
+                    elif loc and tag == "sitemap":
+                        children.append(loc)
+                    loc = lastmod = None
+                    root.clear()
+        except ET.ParseError as e:
+            print(f"  [ERROR] Could not parse {sitemap_url}: {e}", file=sys.stderr)
+        except (EOFError, zlib.error, http.client.HTTPException, OSError) as e:
+            print(f"  [ERROR] Failed to read {sitemap_url}: {e}", file=sys.stderr)
+            status = 0  # Cut short by the transfer, so the result must not be cached
+    if stream.truncated:
+        print(f"  [TRUNCATED] Sitemap over {SITEMAP_MAX_BYTES // (1024 * 1024)} MB: {sitemap_url}", file=sys.stderr)
+    return pages, children, status
+
+
+def sitemap_score(sitemap_urls, url):
+    """Crawl priority: sitemap URLs by most recent lastmod, then other sitemap URLs, then the rest."""
+    if url not in sitemap_urls:
+        return 0
+    try:
+        return date.fromisoformat(sitemap_urls[url][:10]).toordinal()
+    except (TypeError, ValueError):
+        return 1
+
+
+async def discover_from_links(start_url, frontier, discovered, max_depth, max_pages, engine, robot_parser, output,
+                              path_prefix=None, score_url=None, checkpoint_path=None):
+    """
+    Discover pages by following links (breadth first, fetched concurrently).
+    `frontier` and `discovered` (url -> {"depth", "status", "unchanged"}) are
+    fresh or restored from a checkpoint; both are updated in place.
+    """
+    in_progress = {}  # url -> depth, popped but not finished
+    interrupted = {}  # url -> depth, fetch cancelled by an interruption
+    changed = asyncio.Condition()
+
+    def finished():
+        return len(discovered) + len(in_progress) >= max_pages or engine.expired()
+
+    def checkpoint():
+        if checkpoint_path:
+            output.flush()
+            save_checkpoint(checkpoint_path, {
+                "start_url": start_url,
+                "frontier": frontier.to_dict({**in_progress, **interrupted}.items()),
+                "discovered": discovered,
+            })
+
+    async def worker():
+        while True:
+            async with changed:
+                # Wait for queued work; stop when the crawl is full or nothing is left anywhere
+                await changed.wait_for(lambda: frontier or not in_progress or finished())
+                if finished() or not frontier:
+                    changed.notify_all()
+                    return
+                url, depth = frontier.pop()
+
+                if depth > max_depth:
+                    continue
 
-    urls = set()
-    content, _, status, _ = fetch_url(sitemap_url)
-    if not content or status != 200:
-        return urls
+                # Check robots.txt
+                if robot_parser:
+                    try:
+                        if not robot_parser.can_fetch(USER_AGENT, url):
+                            print(f"  [SKIP] Blocked by robots.txt: {url}")
+                            continue
+                    except Exception:
+                        pass
 
-    try:
-        text = content.decode("utf-8", errors="replace")
-        # Remove namespace prefixes for simpler parsing
-        text = re.sub(r'xmlns\s*=\s*"[^"]*"', "", text)
-        root = ET.fromstring(text)
-    except ET.ParseError:
-        return urls
-
-    # Check if this is a sitemap index
-    for sitemap_elem in root.iter("sitemap"):
-        loc = sitemap_elem.find("loc")
-        if loc is not None and loc.text:
-            child_urls = parse_sitemap(loc.text.strip(), depth + 1)
-            urls.update(child_urls)
-
-    # Extract page URLs
-    for url_elem in root.iter("url"):
-        loc = url_elem.find("loc")
-        if loc is not None and loc.text:
-            urls.add(normalize_url(loc.text.strip()))
+                in_progress[url] = depth
 
-    return urls
+            try:
+                print(f"  [CRAWL] Depth {depth}: {url}")
+                page = await engine.fetch_page(url)
+                if page is None:
+                    continue
 
+                html, status, unchanged = page
+                links = extract_links(html, url) if depth < max_depth else ()
+                async with changed:
+                    discovered[url] = {"depth": depth, "status": status, "unchanged": unchanged}
+                    output.add(url, discovered[url], html)
 
-def discover_from_links(start_url, max_depth, max_pages, delay, robot_parser, path_prefix=None):
-    """Discover pages by following links from the start URL (BFS)."""
-    discovered = {}  # url -> depth
-    queue = [(normalize_url(start_url), 0)]
-    visited = set()
+                    # Queue links
+                    for link in links:
+                        if link in frontier.seen or len(discovered) + len(frontier) >= max_pages * 2:
+                            continue
+                        # Check path prefix if specified
+                        if path_prefix:
+                            parsed_link = urlparse(link)
+                            normalized_prefix = path_prefix.rstrip("/")
+                            if not parsed_link.path.rstrip("/").startswith(normalized_prefix):
+                                continue
+                        frontier.push(link, depth + 1, score_url(link) if score_url else 0)
+                    if len(discovered) % CHECKPOINT_PAGES == 0:
+                        checkpoint()
+            except BaseException:
+                interrupted[url] = depth
+                raise
+            finally:
+                async with changed:
+                    in_progress.pop(url, None)
+                    changed.notify_all()
 
-    while queue and len(discovered) < max_pages:
-        url, depth = queue.pop(0)
+    try:
+        await asyncio.gather(*(worker() for _ in range(engine.concurrency)))
+    except BaseException:
+        # Interrupted fetches are queued again on resume
+        checkpoint()
+        raise
+    checkpoint()
+    if engine.expired():
+        print("  [DEADLINE] Stopped starting new fetches")
+    return discovered
 
-        if url in visited:
-            continue
-        if depth > max_depth:
-            continue
 
+async def fetch_sitemap_pages(urls, limit, engine, robot_parser, output, score_url=None):
+    """Fetch sitemap-only URLs, highest score first, until `limit` HTML pages were fetched."""
+    pages = {}
+    candidates = []
+    for surl in sorted(urls, key=lambda u: (-score_url(u), u) if score_url else u):
         # Check robots.txt
         if robot_parser:
             try:
-                if not robot_parser.can_fetch(USER_AGENT, url):
-                    print(f"  [SKIP] Blocked by robots.txt: {url}")
-                    visited.add(url)
+                if not robot_parser.can_fetch(USER_AGENT, surl):
                     continue
             except Exception:
                 pass
+        candidates.append(surl)
 
-        visited.add(url)
-        print(f"  [CRAWL] Depth {depth}: {url}")
-
-        content, content_type, status, final_url = fetch_url(url)
-        if not content or status != 200:
-            continue
-
-        # Only process HTML pages
-        if "text/html" not in content_type.lower():
-            continue
-
-        html = content.decode("utf-8", errors="replace")
-        discovered[url] = {"depth": depth, "html": html, "status": status}
-
-        # Extract and queue links
-        if depth < max_depth:
-            links = extract_links(html, url)
-            for link in links:
-                if link not in visited and len(discovered) + len(queue) < max_pages * 2:
-                    # Check path prefix if specified
-                    if path_prefix:
-                        parsed_link = urlparse(link)
-                        normalized_prefix = path_prefix.rstrip("/")
-                        if not parsed_link.path.rstrip("/").startswith(normalized_prefix):
-                            continue
-                    queue.append((link, depth + 1))
-
-        time.sleep(delay)
-
-    return discovered
-
-
-def setup_robots_parser(base_url):
-    """Set up robots.txt parser."""
+    async def fetch(surl):
+        print(f"  [FETCH] Sitemap URL: {surl}")
+        return surl, await engine.fetch_page(surl)
+
+    # Fetch only as many as could still fit, topping up when some fail
+    while candidates and len(pages) < limit and not engine.expired():
+        batch, candidates = candidates[:limit - len(pages)], candidates[limit - len(pages):]
+        for surl, page in await asyncio.gather(*map(fetch, batch)):
+            if page is not None:
+                html, status, unchanged = page
+                pages[surl] = {"depth": -1, "status": status, "unchanged": unchanged}
+                output.add(surl, pages[surl], html)
+    return pages
+
+
+def setup_robots_parser(base_url, site_cache):
+    """
+    Fetch robots.txt once (or reuse the cached copy) and return
+    (parser or None, Sitemap directive URLs).
+    """
     parsed = urlparse(base_url)
     robots_url = f"{parsed.scheme}://{parsed.netloc}/robots.txt"
-    # Fetch robots.txt manually with SSL context
-    content, _, status, _ = fetch_url(robots_url)
-    if content and status == 200:
-        rp = RobotFileParser()
-        rp.set_url(robots_url)
-        rp.parse(content.decode("utf-8", errors="replace").splitlines())
-        return rp
-    return None
+    robots = site_cache.get("robots")
+    if robots is None:
+        # Fetch robots.txt manually with SSL context
+        content, _, status, _ = fetch_url(robots_url)
+        robots = {"status": status, "text": content.decode("utf-8", errors="replace") if content else ""}
+        if status and status < 500:
+            site_cache.put("robots", robots)
+    else:
+        print("  Using cached robots.txt")
+
+    if not robots["text"] or robots["status"] != 200:
+        return None, []
+    lines = robots["text"].splitlines()
+    sitemap_directives = []
+    for line in lines:
+        line = line.strip()
+        if line.lower().startswith("sitemap:"):
+            sitemap_directives.append(line.split(":", 1)[1].strip())
+    rp = RobotFileParser()
+    rp.set_url(robots_url)
+    rp.parse(lines)
+    return rp, sitemap_directives
 
 
 def main():
@@ -273,10 +691,25 @@ def main():
     parser.add_argument("url", help="The starting URL to crawl")
     parser.add_argument("--max-pages", type=int, default=100, help="Maximum pages to discover (default: 100)")
     parser.add_argument("--max-depth", type=int, default=3, help="Maximum link-follow depth (default: 3)")
-    parser.add_argument("--delay", type=float, default=1.0, help="Delay between requests in seconds (default: 1.0)")
+    parser.add_argument("--delay", type=float, default=1.0, help="Minimum seconds between requests to a host (default: 1.0)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Fetches in flight at once (default: 8)")
+    parser.add_argument("--per-host", type=int, default=4, help="Fetches in flight per host (default: 4)")
+    parser.add_argument("--deadline", type=float, default=0, help="Stop starting fetches after this many seconds (default: no limit)")
+    parser.add_argument("--max-body-mb", type=float, default=10, help="Stop reading a response after this many decoded MB (default: 10)")
+    parser.add_argument("--bloom-capacity", type=int, default=0, help="Track seen URLs in a Bloom filter sized for this many URLs instead of an exact set (default: exact)")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted crawl from its checkpoint")
+    parser.add_argument("--site-cache-hours", type=float, default=24, help="Reuse robots.txt and sitemap results this recent (default: 24, 0 to refetch)")
+    parser.add_argument("--link-parser", choices=("auto", "lexbor", "regex", "htmlparser"), default="auto",
+                        help="Link extraction engine (default: lexbor if selectolax is installed, else regex)")
+    parser.add_argument("--near-dup-distance", type=int, default=3,
+                        help="Cluster pages whose main-text fingerprints differ in at most this many of 64 bits (default: 3, -1 to disable)")
     parser.add_argument("--path-prefix", type=str, default=None, help="Only include pages whose path starts with this prefix (e.g. /blinds)")
     args = parser.parse_args()
+    return asyncio.run(crawl(args))
+
 
+async def crawl(args):
+    """Run all crawl phases and write the manifest and cache."""
     # Normalize starting URL
     url = args.url
     if not url.startswith("http"):
@@ -286,8 +719,17 @@ def main():
     domain = parsed.netloc
     base_url = f"{parsed.scheme}://{parsed.netloc}"
 
+    global LINK_SCANNER
+    HTTP_POOL.max_body = int(args.max_body_mb * 1024 * 1024)
+    try:
+        LINK_SCANNER = get_engine(args.link_parser)
+    except ValueError as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        return 1
+
     print(f"[START] Crawling {domain}")
-    print(f"  Max pages: {args.max_pages}, Max depth: {args.max_depth}, Delay: {args.delay}s")
+    print(f"  Max pages: {args.max_pages}, Max depth: {args.max_depth}, Delay: {args.delay}s, "
+          f"Concurrency: {args.concurrency} ({args.per_host} per host)")
     if args.path_prefix:
         print(f"  Path prefix filter: {args.path_prefix}")
 
@@ -298,93 +740,88 @@ def main():
 
     # Set up robots.txt parser
     print(f"\n[PHASE 0] Checking robots.txt...")
-    robot_parser = setup_robots_parser(base_url)
+    site_cache = SiteCache(reviews_dir, args.site_cache_hours * 3600)
+    robot_parser, sitemap_directives = setup_robots_parser(base_url, site_cache)
+    politeness = PolitenessScheduler(args.delay, args.per_host)
+    crawl_delay = robot_parser.crawl_delay(USER_AGENT) if robot_parser else None
+    if crawl_delay:
+        print(f"  Honoring Crawl-delay: {crawl_delay}s")
+        politeness.set_crawl_delay(domain, float(crawl_delay))
+    validators = ValidatorStore(reviews_dir)
+    engine = CrawlEngine(args.concurrency, politeness, args.deadline, cache_dir, validators)
 
     # Phase 1: Sitemap discovery
     print(f"\n[PHASE 1] Discovering pages from sitemap...")
-    sitemap_urls = discover_from_sitemap(url)
+    sitemap_urls = await discover_from_sitemap(url, sitemap_directives, engine, site_cache)
     print(f"  Found {len(sitemap_urls)} URLs from sitemap")
 
-    # Phase 2: Link following
-    print(f"\n[PHASE 2] Discovering pages by following links...")
-    crawled = discover_from_links(url, args.max_depth, args.max_pages, args.delay, robot_parser, path_prefix=args.path_prefix)
-    print(f"  Crawled {len(crawled)} pages via link following")
-
-    # Merge results
-    all_urls = set(sitemap_urls) | set(crawled.keys())
-
-    # Fetch any sitemap-only URLs that weren't crawled (up to max_pages limit)
-    sitemap_only = sitemap_urls - set(crawled.keys())
-    fetched_count = len(crawled)
-
-    for surl in sorted(sitemap_only):
-        if fetched_count >= args.max_pages:
-            break
-
-        # Check robots.txt
-        if robot_parser:
-            try:
-                if not robot_parser.can_fetch(USER_AGENT, surl):
-                    continue
-            except Exception:
-                pass
-
-        print(f"  [FETCH] Sitemap URL: {surl}")
-        content, content_type, status, final_url = fetch_url(surl)
-        if content and status == 200 and "text/html" in content_type.lower():
-            html = content.decode("utf-8", errors="replace")
-            crawled[surl] = {"depth": -1, "html": html, "status": status}
-            fetched_count += 1
-            time.sleep(args.delay)
-
-    # Build page manifest and save cached HTML
-    pages = []
-    for page_url in sorted(crawled.keys()):
-        # Filter by path prefix if specified
-        if args.path_prefix:
-            parsed_page = urlparse(page_url)
-            normalized_prefix = args.path_prefix.rstrip("/")
-            if not parsed_page.path.rstrip("/").startswith(normalized_prefix):
-                continue
-
-        info = crawled[page_url]
-        slug = url_to_slug(page_url, domain)
-
-        # Save cached HTML
-        cache_path = os.path.join(cache_dir, f"{slug}.html")
-        with open(cache_path, "w", encoding="utf-8") as f:
-            f.write(info["html"])
-
-        source = "sitemap" if page_url in sitemap_urls else "link-follow"
-        if page_url in sitemap_urls and page_url in crawled:
-            source = "sitemap+crawl"
-
-        pages.append({
-            "url": page_url,
-            "slug": slug,
-            "source": source,
-            "depth": info["depth"],
-            "status": info["status"],
-        })
-
-    # Write manifest
-    manifest = {
+    header = {
         "domain": domain,
         "base_url": base_url,
         "crawl_date": date.today().isoformat(),
-        "total_pages": len(pages),
         "max_pages_limit": args.max_pages,
         "max_depth_limit": args.max_depth,
-        "pages": pages,
     }
+    output = ManifestWriter(reviews_dir, cache_dir, header, sitemap_urls, validators, args.path_prefix,
+                            args.near_dup_distance)
+
+    def score_url(link):
+        return sitemap_score(sitemap_urls, link)
+
+    # Restore the link-following frontier of an interrupted crawl, or start fresh
+    start_url = normalize_url(url)
+    checkpoint_path = os.path.join(reviews_dir, CHECKPOINT_FILE)
+    state = load_checkpoint(checkpoint_path) if args.resume else None
+    if state and state["start_url"] == start_url:
+        frontier = Frontier.from_dict(state["frontier"])
+        crawled = state["discovered"]
+        output.restore()
+        print(f"\n[RESUME] {len(crawled)} pages already crawled, {len(frontier)} queued")
+    else:
+        if args.resume:
+            print(f"\n[RESUME] No checkpoint for {start_url}; starting a new crawl")
+        frontier = Frontier(args.bloom_capacity)
+        frontier.push(start_url, 0)
+        crawled = {}
 
-    manifest_path = os.path.join(reviews_dir, "discovered-pages.json")
-    with open(manifest_path, "w", encoding="utf-8") as f:
-        json.dump(manifest, f, indent=2)
+    try:
+        # Phase 2: Link following
+        print(f"\n[PHASE 2] Discovering pages by following links...")
+        await discover_from_links(start_url, frontier, crawled, args.max_depth, args.max_pages, engine,
+                                  robot_parser, output, path_prefix=args.path_prefix,
+                                  score_url=score_url, checkpoint_path=checkpoint_path)
+        print(f"  Crawled {len(crawled)} pages via link following")
+
+        # Fetch any sitemap-only URLs that weren't crawled (up to max_pages limit)
+        sitemap_only = sitemap_urls.keys() - crawled.keys()
+        crawled.update(await fetch_sitemap_pages(sitemap_only, args.max_pages - len(crawled), engine, robot_parser,
+                                                 output, score_url))
+    except BaseException:
+        # Interrupted: keep what was fetched so far usable
+        output.flush()
+        print(f"\n[INTERRUPTED] Partial manifest with {len(output.pages)} pages: {output.path}", file=sys.stderr)
+        print("  Continue with --resume", file=sys.stderr)
+        raise
+    finally:
+        engine.close()
+        HTTP_POOL.close()
+
+    # Write the final manifest
+    manifest = output.flush(complete=True)
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    pages = manifest["pages"]
+    manifest_path = output.path
 
     print(f"\n[DONE] Discovered {len(pages)} pages")
     print(f"  Manifest: {manifest_path}")
     print(f"  Cache: {cache_dir}/")
+    print(f"  Unchanged since last crawl: {manifest['unchanged_pages']} "
+          f"({engine.not_modified} answered 304 Not Modified)")
+    if output.near_duplicates:
+        print(f"  Review set: {manifest['representative_pages']} representative pages "
+              f"({len(pages) - manifest['representative_pages']} near-duplicates marked duplicate_of)")
+    print(f"  HTTP: {HTTP_POOL.stats_line()}")
 
     if len(pages) >= 50:
         print(f"\n[WARNING] Found {len(pages)} pages. This is a large site.")
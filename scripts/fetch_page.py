@@ -2,14 +2,17 @@
 """
 Single page fetcher for the website analysis system.
 
-Fetches one URL, saves the HTML to the cache, and prints metadata.
+Fetches one URL, saves the HTML to the cache, and prints metadata. If the
+page was fetched before, the request is conditional (ETag/Last-Modified from
+page-validators.json) and a 304 reuses the cached HTML.
 
 Usage:
     python3 scripts/fetch_page.py <url>
 
 Output:
     reviews/[domain]/.cache/[slug].html — cached HTML
-    Prints: slug, status code, title, content length
+    reviews/[domain]/page-validators.json — ETag/Last-Modified/hash per URL
+    Prints: slug, status code, title, content length, unchanged
 """
 
 import json
@@ -18,10 +21,12 @@ import re
 import sys
 from html.parser import HTMLParser
 from urllib.parse import urlparse
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError, URLError
+import http.client
 import ssl
 
+from http_pool import HTTPPool, decode_text
+from page_validators import ValidatorStore
+
 SSL_CONTEXT = ssl.create_default_context()
 SSL_CONTEXT.check_hostname = False
 SSL_CONTEXT.verify_mode = ssl.CERT_NONE
@@ -81,22 +86,38 @@ def main():
     cache_dir = os.path.join(reviews_dir, ".cache")
     os.makedirs(cache_dir, exist_ok=True)
 
-    # Fetch the page
-    req = Request(url, headers={"User-Agent": USER_AGENT})
+    # Fetch the page, revalidating the cached copy if there is one
+    cache_path = os.path.join(cache_dir, f"{slug}.html")
+    validators = ValidatorStore(reviews_dir)
+    conditional = validators.conditional_headers(url, cache_path)
+    pool = HTTPPool(timeout=15, ssl_context=SSL_CONTEXT)
     try:
-        resp = urlopen(req, timeout=15, context=SSL_CONTEXT)
-        content = resp.read()
-        status = resp.status
-        content_type = resp.headers.get("Content-Type", "")
-        final_url = resp.url
-    except HTTPError as e:
-        print(json.dumps({"error": f"HTTP {e.code}", "url": url}))
-        sys.exit(1)
-    except (URLError, OSError) as e:
+        resp = pool.get(url, {"User-Agent": USER_AGENT, **conditional})
+    except (http.client.HTTPException, ValueError, OSError) as e:
         print(json.dumps({"error": str(e), "url": url}))
         sys.exit(1)
-
-    html = content.decode("utf-8", errors="replace")
+    finally:
+        pool.close()
+    status = resp.status
+    content_type = resp.headers.get("Content-Type", "")
+    final_url = resp.url
+
+    if status == 304 and conditional:
+        # The cache holds HTML we already decoded and saved as UTF-8
+        with open(cache_path, "rb") as f:
+            content = f.read()
+        html = content.decode("utf-8", errors="replace")
+        unchanged = True
+        validators.touch(url)
+    elif 200 <= status < 300:
+        content = resp.body
+        html = decode_text(content, content_type)
+        unchanged = validators.is_unchanged(url, content)
+        validators.record(url, slug, resp.headers, content)
+    else:
+        print(json.dumps({"error": f"HTTP {status}", "url": url}))
+        sys.exit(1)
+    validators.save()
 
     # Extract title
     title_parser = TitleExtractor()
@@ -106,10 +127,10 @@ def main():
         pass
     title = title_parser.title.strip() or "(no title)"
 
-    # Save cached HTML
-    cache_path = os.path.join(cache_dir, f"{slug}.html")
-    with open(cache_path, "w", encoding="utf-8") as f:
-        f.write(html)
+    # Save cached HTML (a 304 means the cached copy is already current)
+    if status != 304:
+        with open(cache_path, "w", encoding="utf-8") as f:
+            f.write(html)
 
     # Print metadata as JSON
     result = {
@@ -120,8 +141,10 @@ def main():
         "status": status,
         "content_type": content_type,
         "content_length": len(content),
+        "truncated": resp.truncated,
         "title": title,
         "cache_path": cache_path,
+        "unchanged": unchanged,
     }
     print(json.dumps(result, indent=2))
 
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Keep-alive HTTP/1.1 connection pool shared by the crawler and page fetcher.
+
+Connections are pooled per (scheme, host, port) and reused across requests
+and threads, so a crawl pays the TCP and TLS handshake once per connection
+instead of once per page. Redirects are followed like urlopen does.
+
+Requests advertise gzip and deflate (and br when brotli 1.2+, the first
+release that can limit a call's output, is installed). Bodies are decoded as
+they stream in and reading stops once max_body decoded bytes have arrived, so
+a huge or maliciously compressed page costs bounded memory. decode_text()
+picks the charset from the Content-Type header or a <meta> tag. open() returns
+a file-like StreamingResponse instead, for large bodies that are parsed as they
+arrive (such as sitemaps).
+
+Usage (as a module):
+    from http_pool import HTTPPool
+    pool = HTTPPool(ssl_context=SSL_CONTEXT)
+    resp = pool.get("https://example.com/", {"User-Agent": "..."})
+    print(resp.status, resp.url, len(resp.body), pool.stats_line())
+    html = decode_text(resp.body, resp.headers.get("Content-Type", ""))
+    with pool.open("https://example.com/sitemap.xml") as stream:
+        for event, elem in xml.etree.ElementTree.iterparse(stream): ...
+"""
+
+import codecs
+import http.client
+import re
+import threading
+import zlib
+from urllib.parse import urljoin, urlparse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+if brotli and not hasattr(brotli.Decompressor, "can_accept_more_data"):
+    brotli = None  # Can't bound output: a few bytes of input may expand to gigabytes
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 10
+MAX_BODY_BYTES = 10 * 1024 * 1024
+READ_CHUNK_BYTES = 64 * 1024
+ACCEPT_ENCODING = "gzip, deflate, br" if brotli else "gzip, deflate"
+DECODE_ERRORS = (zlib.error, brotli.error) if brotli else (zlib.error,)
+
+HEADER_CHARSET_RE = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.IGNORECASE)
+META_CHARSET_RE = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?\s*([\w.:-]+)", re.IGNORECASE)
+# Labels browsers decode as windows-1252 (a superset that keeps curly quotes etc.)
+WINDOWS_1252_LABELS = ("iso-8859-1", "iso8859-1", "latin1", "latin-1", "us-ascii", "ascii")
+
+# Raised when a kept-alive connection was closed by the server between requests
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+
+class PoolResponse:
+    """
+    A read response: status, headers (http.client.HTTPMessage), decoded body
+    bytes and final URL. truncated is True if the body was cut at max_body.
+    """
+
+    def __init__(self, status, headers, body, url, truncated=False):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.url = url
+        self.truncated = truncated
+
+
+class BodyDecoder:
+    """Incremental Content-Encoding decoder with bounded output per call."""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self._brotli = None
+        self._zlib = None
+        self._started = False
+        self._full = False  # the last brotli feed() filled its limit
+        if encoding in ("gzip", "x-gzip"):
+            self._zlib = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == "deflate":
+            self._zlib = zlib.decompressobj(zlib.MAX_WBITS)
+        elif encoding == "br" and brotli:
+            self._brotli = brotli.Decompressor()
+
+    def feed(self, chunk, limit):
+        """
+        Decode chunk, returning about `limit` bytes at most. While `pending`,
+        input is held back: call feed(b"", limit) for the rest of the output.
+        """
+        if self._zlib is not None:
+            chunk = self._zlib.unconsumed_tail + chunk
+            if self.encoding == "deflate" and not self._started:
+                self._started = True
+                try:
+                    return self._zlib.decompress(chunk, limit)
+                except zlib.error:
+                    # Some servers send raw deflate without the zlib header
+                    self._zlib = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self._zlib.decompress(chunk, limit)
+        if self._brotli is not None:
+            data = self._brotli.process(chunk, output_buffer_limit=limit)
+            # A full buffer can leave output behind even once it accepts more input
+            self._full = len(data) >= limit and not self._brotli.is_finished()
+            return data
+        return chunk  # identity, or an encoding we can't decode: pass it through
+
+    def flush(self):
+        return self._zlib.flush() if self._zlib is not None else b""
+
+    @property
+    def pending(self):
+        """True if the last feed() stopped at its output limit with input left to decode."""
+        if self._zlib is not None:
+            return bool(self._zlib.unconsumed_tail)
+        if self._brotli is not None:
+            return self._full or not self._brotli.can_accept_more_data()
+        return False
+
+
+class StreamingResponse:
+    """
+    File-like response whose body is decoded as it is read. Closing it returns
+    the connection to the pool if the body was read to the end.
+    """
+
+    def __init__(self, pool, key, conn, resp, url, max_body):
+        self.status = resp.status
+        self.headers = resp.headers
+        self.url = url
+        self.truncated = False
+        self.max_body = max_body
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._resp = resp
+        self._decoder = BodyDecoder((resp.getheader("Content-Encoding") or "").strip().lower())
+        self._buffer = b""
+        self._decoded = 0
+        self._eof = False
+
+    def _fill(self):
+        """Decode the next piece of the body into the buffer."""
+        try:
+            if self._decoder.pending:
+                data = self._decoder.feed(b"", READ_CHUNK_BYTES)
+            else:
+                chunk = self._resp.read(READ_CHUNK_BYTES)
+                if chunk:
+                    data = self._decoder.feed(chunk, READ_CHUNK_BYTES)
+                else:
+                    data = self._decoder.flush()
+                    self._eof = True
+        except DECODE_ERRORS as e:
+            raise http.client.HTTPException(f"Could not decode {self._decoder.encoding} body: {e}") from e
+        self._decoded += len(data)
+        if self._decoded > self.max_body:
+            data = data[:len(data) - (self._decoded - self.max_body)]
+            self.truncated = True
+            self._eof = True
+        self._buffer += data
+
+    def peek(self, size):
+        """Return up to `size` bytes without consuming them."""
+        while len(self._buffer) < size and not self._eof:
+            self._fill()
+        return self._buffer[:size]
+
+    def read(self, size=-1):
+        while (size < 0 or len(self._buffer) < size) and not self._eof:
+            self._fill()
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def close(self):
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        reusable = self._eof and not self.truncated and not self._resp.will_close
+        self._pool._release(self._key, conn, reusable)
+        if self.truncated:
+            with self._pool._lock:
+                self._pool.truncated += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_body(resp, max_body):
+    """
+    Stream and decode an http.client response body, stopping after max_body
+    decoded bytes. Returns (body, truncated); a truncated response is not fully
+    read, so its connection can't be reused.
+    """
+    encoding = (resp.getheader("Content-Encoding") or "").strip().lower()
+    decoder = BodyDecoder(encoding)
+    parts = []
+    size = 0
+    try:
+        while size <= max_body:
+            chunk = resp.read(READ_CHUNK_BYTES)
+            if not chunk:
+                data = decoder.flush()
+            else:
+                data = decoder.feed(chunk, max_body - size + 1)
+            parts.append(data)
+            size += len(data)
+            if not chunk:
+                break
+    except DECODE_ERRORS as e:
+        raise http.client.HTTPException(f"Could not decode {encoding} body: {e}") from e
+    body = b"".join(parts)
+    if size > max_body:
+        return body[:max_body], True
+    return body, False
+
+
+def decode_text(body, content_type=""):
+    """Decode an HTML/text body using the header charset, then a <meta> charset, then UTF-8."""
+    if body.startswith(codecs.BOM_UTF8):
+        return body.decode("utf-8-sig", errors="replace")
+    match = HEADER_CHARSET_RE.search(content_type or "") or META_CHARSET_RE.search(body[:4096])
+    charset = "utf-8"
+    if match:
+        label = match.group(1)
+        if isinstance(label, bytes):
+            label = label.decode("ascii", errors="ignore")
+        label = label.lower()
+        charset = "cp1252" if label in WINDOWS_1252_LABELS else label
+        try:
+            codecs.lookup(charset)
+        except LookupError:
+            charset = "utf-8"
+    return body.decode(charset, errors="replace")
+
+
+class HTTPPool:
+    """Thread-safe pool of keep-alive connections with reuse statistics."""
+
+    def __init__(self, max_idle_per_host=8, timeout=15, ssl_context=None, max_body=MAX_BODY_BYTES):
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self.ssl_context = ssl_context
+        self.max_body = max_body
+        self._idle = {}  # (scheme, host, port) -> [HTTPConnection]
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+        self.reused = 0
+        self.truncated = 0
+
+    def _key(self, parsed):
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        return parsed.scheme, parsed.hostname, port
+
+    def _checkout(self, key):
+        """Return (connection, reused) for key, opening a new connection if none is idle."""
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+            self.connections_opened += 1
+        scheme, host, port = key
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(host, port, timeout=self.timeout, context=self.ssl_context)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=self.timeout)
+        return conn, False
+
+    def _checkin(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _release(self, key, conn, reusable):
+        if reusable:
+            self._checkin(key, conn)
+        else:
+            conn.close()
+
+    def _send(self, url, headers):
+        """Send one request. Returns (key, connection, response) with the body unread."""
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            raise ValueError(f"Unsupported URL: {url}")
+        key = self._key(parsed)
+        target = parsed.path or "/"
+        if parsed.query:
+            target += f"?{parsed.query}"
+
+        while True:
+            conn, reused = self._checkout(key)
+            try:
+                conn.request("GET", target, headers=headers)
+                resp = conn.getresponse()
+            except STALE_CONNECTION_ERRORS:
+                conn.close()
+                if reused:
+                    continue  # The server dropped an idle connection; retry on a fresh one
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            with self._lock:
+                self.requests += 1
+                self.reused += reused
+            return key, conn, resp
+
+    def _request_once(self, url, headers):
+        """One request without following redirects. Returns a PoolResponse."""
+        key, conn, resp = self._send(url, headers)
+        try:
+            body, truncated = read_body(resp, self.max_body)
+        except BaseException:
+            conn.close()
+            raise
+        with self._lock:
+            self.truncated += truncated
+        self._release(key, conn, not (resp.will_close or truncated))
+        return PoolResponse(resp.status, resp.headers, body, url, truncated)
+
+    def get(self, url, headers=None):
+        """GET url, following redirects. Non-2xx responses are returned, not raised."""
+        headers = {"Accept-Encoding": ACCEPT_ENCODING, **(headers or {})}
+        for _ in range(MAX_REDIRECTS + 1):
+            resp = self._request_once(url, headers)
+            location = resp.headers.get("Location")
+            if resp.status not in REDIRECT_CODES or not location:
+                return resp
+            url = urljoin(url, location)
+        raise http.client.HTTPException(f"Too many redirects for {url}")
+
+    def open(self, url, headers=None, max_body=None):
+        """
+        Like get(), but return a StreamingResponse whose body is read and decoded
+        on demand, up to max_body bytes (default: the pool's). Close it when done.
+        """
+        headers = {"Accept-Encoding": ACCEPT_ENCODING, **(headers or {})}
+        for _ in range(MAX_REDIRECTS + 1):
+            key, conn, resp = self._send(url, headers)
+            stream = StreamingResponse(self, key, conn, resp, url, max_body or self.max_body)
+            location = resp.headers.get("Location")
+            if resp.status not in REDIRECT_CODES or not location:
+                return stream
+            with stream:
+                stream.read()
+            url = urljoin(url, location)
+        raise http.client.HTTPException(f"Too many redirects for {url}")
+
+    def close(self):
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+    def stats_line(self):
+        """Summary of connection reuse, e.g. '3 connections for 120 requests (97% reused)'."""
+        rate = 100 * self.reused / self.requests if self.requests else 0
+        line = f"{self.connections_opened} connections for {self.requests} requests ({rate:.0f}% reused)"
+        if self.truncated:
+            line += f", {self.truncated} bodies cut at {self.max_body // 1024} KB"
+        return line
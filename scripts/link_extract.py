@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Link extraction engines for the crawler.
+
+Every engine returns (hrefs, base_href, canonical_href) for an HTML page:
+the href of each <a> in document order, the first <base href>, and the first
+<link rel="canonical" href>.
+
+- "regex": a tokenizer built from a single compiled pattern. It skips
+  comments, CDATA and <script>/<style> bodies like html.parser does, and only
+  parses attributes of <a>, <link> and <base> tags.
+- "lexbor": the C HTML5 parser from the optional selectolax package.
+- "htmlparser": the original html.parser-based extractor, kept as the
+  reference for parity checks (see benchmarks/bench_link_extract.py).
+
+Usage (as a module):
+    from link_extract import get_engine
+    hrefs, base_href, canonical = get_engine("auto")(html)
+"""
+
+import re
+from html import unescape
+from html.parser import HTMLParser
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+# Attribute list of a start tag, honoring quoted values that contain ">"
+_TAG_BODY = r"""(?:[^>"']|"[^"]*"|'[^']*')*"""
+
+# Everything html.parser would not report as a start tag is consumed whole, so
+# markup inside comments, CDATA, raw-text elements and attribute values of
+# other tags is never mistaken for a link. Unterminated constructs run to the
+# end of the page, as html.parser leaves them unparsed when fed without close().
+TOKEN_RE = re.compile(
+    r"<(?:"
+    r"!--.*?(?:--\s*>|\Z)"
+    r"|!\[CDATA\[.*?(?:\]\s*\]\s*>|\Z)"
+    r"|(script|style)(?=[\t\n\r\f />])" + _TAG_BODY + r">.*?(?:</\s*\1\s*>|\Z)"
+    r"|(a|link|base)(?=[\t\n\r\f />\x00])(" + _TAG_BODY + r")>"
+    r"|[a-zA-Z][^\t\n\r\f />\x00]*" + _TAG_BODY + r">"
+    r")",
+    re.IGNORECASE | re.DOTALL,
+)
+
+# html.parser's tolerant attribute pattern
+ATTR_RE = re.compile(
+    r"""((?<=['"\s/])[^\s/>][^\s/=>]*)(\s*=+\s*('[^']*'|"[^"]*"|(?!['"])[^>\s]*))?(?:\s|/(?!>))*"""
+)
+
+def _attrs(body):
+    """Parse a start tag's attribute text into [(lowercase name, value or None)] like html.parser."""
+    attrs = []
+    for match in ATTR_RE.finditer(" " + body):
+        name, rest, value = match.groups()
+        if not rest:
+            value = None
+        elif value[:1] == "'" == value[-1:] or value[:1] == '"' == value[-1:]:
+            value = value[1:-1]
+        if value and "&" in value:
+            value = unescape(value)
+        attrs.append((name.lower(), value))
+    return attrs
+
+
+def _is_canonical(attrs):
+    return any(name == "rel" and value and "canonical" in value.lower().split() for name, value in attrs)
+
+
+def scan_regex(html):
+    """Regex tokenizer engine."""
+    hrefs = []
+    base_href = canonical = None
+    # findall() builds the (raw-text tag, link tag, attributes) tuples in C; only link tags
+    # have a non-empty second field
+    for _, tag, body in TOKEN_RE.findall(html):
+        if not tag:
+            continue
+        tag = tag.lower()
+        attrs = _attrs(body)
+        if tag == "a":
+            hrefs.extend(value for name, value in attrs if name == "href" and value)
+        elif tag == "base":
+            if base_href is None:
+                base_href = next((value for name, value in attrs if name == "href" and value), None)
+        elif canonical is None and _is_canonical(attrs):
+            canonical = next((value for name, value in attrs if name == "href" and value), None)
+    return hrefs, base_href, canonical
+
+
+def scan_lexbor(html):
+    """selectolax/lexbor engine (HTML5 parsing rules, so rare malformed markup may differ)."""
+    tree = LexborHTMLParser(html)
+    hrefs = [node.attributes.get("href") for node in tree.css("a[href]")]
+    base = tree.css_first("base[href]")
+    canonical = None
+    for node in tree.css("link[rel][href]"):
+        if "canonical" in (node.attributes.get("rel") or "").lower().split():
+            canonical = node.attributes.get("href") or None
+            break
+    return [href for href in hrefs if href], (base.attributes.get("href") or None) if base else None, canonical
+
+
+class LinkExtractor(HTMLParser):
+    """Extract <a href> links (plus <base> and canonical) from HTML."""
+
+    def __init__(self):
+        super().__init__()
+        self.links = []
+        self.base_href = None
+        self.canonical = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            for name, value in attrs:
+                if name == "href" and value:
+                    self.links.append(value)
+        elif tag == "base" and self.base_href is None:
+            self.base_href = next((value for name, value in attrs if name == "href" and value), None)
+        elif tag == "link" and self.canonical is None and _is_canonical(attrs):
+            self.canonical = next((value for name, value in attrs if name == "href" and value), None)
+
+
+def scan_htmlparser(html):
+    """Reference engine: the original html.parser extractor."""
+    parser = LinkExtractor()
+    parser.feed(html)
+    return parser.links, parser.base_href, parser.canonical
+
+
+ENGINES = {"regex": scan_regex, "htmlparser": scan_htmlparser}
+if LexborHTMLParser is not None:
+    ENGINES["lexbor"] = scan_lexbor
+
+
+def get_engine(name="auto"):
+    """Return the named engine; "auto" prefers lexbor when selectolax is installed."""
+    if name == "auto":
+        name = "lexbor" if "lexbor" in ENGINES else "regex"
+    if name not in ENGINES:
+        raise ValueError(f"Link parser {name!r} is not available (have: {', '.join(sorted(ENGINES))})")
+    return ENGINES[name]
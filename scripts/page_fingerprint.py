@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate page detection for the crawler.
+
+A page's fingerprint is a 64-bit SimHash of the word 3-grams of its main
+text: the <main> element if there is one, otherwise the <body>, without
+scripts, styles, navigation, headers, footers and asides. Pages built from
+the same template (product variants, paginated lists, filter pages) have
+fingerprints only a few bits apart.
+
+NearDuplicateIndex clusters fingerprints within max_distance bits of each
+other. Fingerprints are split into max_distance + 1 bands, and two
+fingerprints within the distance must share at least one band exactly, so
+only pages with a matching band are compared.
+
+Usage (as a module):
+    from page_fingerprint import NearDuplicateIndex, fingerprint
+    index = NearDuplicateIndex(3)
+    cluster = index.add(url, fingerprint(html))
+"""
+
+import hashlib
+import re
+from html import unescape
+
+FINGERPRINT_BITS = 64
+SHINGLE_WORDS = 3
+# Below this many shingles (near-empty, error or redirect pages) a few changed words
+# move the SimHash too far for a stable comparison, so such pages are not clustered
+MIN_SHINGLES = 24
+
+BOILERPLATE_RE = re.compile(
+    r"<!--.*?-->"
+    r"|<(script|style|noscript|template|svg|nav|header|footer|aside)\b.*?</\1\s*>",
+    re.IGNORECASE | re.DOTALL,
+)
+MAIN_RE = re.compile(r"<main\b[^>]*>(.*)</main\s*>", re.IGNORECASE | re.DOTALL)
+BODY_RE = re.compile(r"<body\b[^>]*>(.*)", re.IGNORECASE | re.DOTALL)
+TAG_RE = re.compile(r"<[^>]*>")
+WORD_RE = re.compile(r"\w+")
+
+
+def main_text(html):
+    """Lowercase words of the page's main content."""
+    match = MAIN_RE.search(html) or BODY_RE.search(html)
+    content = BOILERPLATE_RE.sub(" ", match.group(1) if match else html)
+    return WORD_RE.findall(unescape(TAG_RE.sub(" ", content)).lower())
+
+
+def simhash(features):
+    """64-bit SimHash of a set of string features."""
+    digests = b"".join(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest() for feature in features)
+    # Count each bit position's set bits across all digests at once: the digests form one
+    # big integer, and a mask with one bit per 64-bit slot picks out a position
+    packed = int.from_bytes(digests, "little")
+    slots = int.from_bytes(b"\x01\x00\x00\x00\x00\x00\x00\x00" * len(features), "little")
+    value = 0
+    for bit in range(FINGERPRINT_BITS):
+        if ((packed >> bit) & slots).bit_count() * 2 > len(features):
+            value |= 1 << bit
+    return value
+
+
+def fingerprint(html):
+    """SimHash of the page's main text, or None if there is too little text to compare."""
+    words = main_text(html)
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    return simhash(shingles)
+
+
+class NearDuplicateIndex:
+    """Clusters of fingerprints at most max_distance bits apart."""
+
+    def __init__(self, max_distance=3):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        edges = [FINGERPRINT_BITS * i // bands for i in range(bands + 1)]
+        self._bands = [(start, (1 << (end - start)) - 1) for start, end in zip(edges, edges[1:])]
+        self._tables = [{} for _ in self._bands]  # band value -> [(fingerprint, key)]
+        self.cluster_of = {}  # key -> key of the cluster's first member
+
+    def add(self, key, value):
+        """Index a page's fingerprint (None: never a duplicate). Returns its cluster key."""
+        if key in self.cluster_of:
+            return self.cluster_of[key]
+        cluster = key
+        if value is not None:
+            band_values = [(value >> start) & mask for start, mask in self._bands]
+            for table, band_value in zip(self._tables, band_values):
+                for other, other_key in table.get(band_value, ()):
+                    if (value ^ other).bit_count() <= self.max_distance:
+                        cluster = self.cluster_of[other_key]
+                        break
+                if cluster != key:
+                    break
+            for table, band_value in zip(self._tables, band_values):
+                table.setdefault(band_value, []).append((value, key))
+        self.cluster_of[key] = cluster
+        return cluster
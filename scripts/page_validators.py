@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Per-URL HTTP validators for incremental recrawls.
+
+Stores each fetched page's ETag, Last-Modified and content hash in
+reviews/[domain]/page-validators.json, next to discovered-pages.json. Later
+fetches send If-None-Match / If-Modified-Since; a 304, or a 200 with the same
+content hash, means the cached .cache/[slug].html is still current.
+
+Several crawls or fetch_page.py runs may share a domain, so save() merges this
+run's entries into whatever is on disk under an exclusive lock.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+from datetime import date
+
+VALIDATORS_FILE = "page-validators.json"
+
+
+def content_hash(content):
+    """SHA-256 of a page body."""
+    return hashlib.sha256(content).hexdigest()
+
+
+class ValidatorStore:
+    """Validators for one domain's pages, keyed by URL."""
+
+    def __init__(self, reviews_dir):
+        self.path = os.path.join(reviews_dir, VALIDATORS_FILE)
+        self.pages = self._read()
+        self._updated = set()  # URLs recorded or touched by this run
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f).get("pages", {})
+        except (OSError, ValueError):
+            return {}
+
+    def conditional_headers(self, url, cache_path):
+        """Request headers that let the server answer 304, if the cached copy still exists."""
+        entry = self.pages.get(url)
+        if not entry or not os.path.isfile(cache_path):
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def is_unchanged(self, url, content):
+        """True if a freshly downloaded body matches the stored hash."""
+        entry = self.pages.get(url)
+        return bool(entry) and entry.get("content_hash") == content_hash(content)
+
+    def record(self, url, slug, headers, content):
+        """Remember the validators of a 200 response."""
+        self.pages[url] = {
+            "slug": slug,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "content_hash": content_hash(content),
+            "fetched": date.today().isoformat(),
+        }
+        self._updated.add(url)
+
+    def touch(self, url):
+        """Mark a page as confirmed current today (after a 304)."""
+        if url in self.pages:
+            self.pages[url]["fetched"] = date.today().isoformat()
+            self._updated.add(url)
+
+    def save(self):
+        """Merge this run's entries into the store on disk and write it atomically."""
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # Keep entries other runs saved since this one loaded the file
+            pages = self._read()
+            pages.update((url, self.pages[url]) for url in self._updated)
+            self.pages = pages
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f"{VALIDATORS_FILE}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump({"pages": pages}, f, indent=2, sort_keys=True)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
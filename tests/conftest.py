@@ -0,0 +1,32 @@
+"""
+Shared test setup: import paths, a throwaway PROJECT_ROOT, and a fresh
+database per test through the `db` fixture.
+
+Run with: python -m pytest tests
+"""
+
+import os
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(REPO_ROOT, "bot"), os.path.join(REPO_ROOT, "scripts")]
+
+# config reads the environment once, at import; never let a test touch a real database
+_scratch = tempfile.mkdtemp(prefix="bot-tests-")
+os.environ["PROJECT_ROOT"] = _scratch
+os.environ["DB_PATH"] = os.path.join(_scratch, "bot.db")
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """The database module, pointed at an empty database in tmp_path."""
+    import database
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "bot.db"))
+    monkeypatch.setattr(database, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    database._history_cache.clear()
+    database.init_db()
+    yield database
+    database._history_cache.clear()
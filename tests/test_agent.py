@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("anthropic")
+
+from anthropic.types import TextBlock, ToolUseBlock  # noqa: E402
+
+import agent  # noqa: E402
+
+
+def text(value):
+    return TextBlock(type="text", text=value)
+
+
+def tool(name="bash", input=None, id="t1"):
+    return ToolUseBlock(type="tool_use", id=id, name=name, input=input or {"command": "ls"})
+
+
+def test_merge_joins_continued_text_onto_the_last_block():
+    merged = agent._merge_continuation([text("intro"), text("The report so")], [text(" far ends here."), tool()])
+    assert [b.type for b in merged] == ["text", "text", "tool_use"]
+    assert merged[1].text == "The report so far ends here."
+    assert merged[0].text == "intro"
+
+
+def test_merge_appends_when_the_continuation_starts_with_a_tool_call():
+    merged = agent._merge_continuation([text("Let me check")], [tool()])
+    assert [b.type for b in merged] == ["text", "tool_use"]
+
+
+def test_merge_with_nothing_to_continue():
+    assert agent._merge_continuation([], [text("fresh")])[0].text == "fresh"
+    assert agent._merge_continuation([text("kept")], [])[0].text == "kept"
+
+
+def test_resumable_text_trims_trailing_whitespace_and_drops_empty_blocks():
+    blocks = agent._resumable_text([text("para one\n\n"), tool(), text("  \n")])
+    assert [b.text for b in blocks] == ["para one"]
+
+
+class Response:
+    def __init__(self, content, stop_reason):
+        self.content = content
+        self.stop_reason = stop_reason
+
+
+class StubClient:
+    """Replays canned responses and records each request's max_tokens and messages."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.messages = self
+
+    async def create(self, **kwargs):
+        self.requests.append({**kwargs, "messages": list(kwargs["messages"])})
+        return self.responses.pop(0)
+
+
+def _run_agent(monkeypatch, responses):
+    client = StubClient(responses)
+    monkeypatch.setattr(agent, "_client", client)
+    monkeypatch.setattr(agent, "TELEGRAM_REQUEST_DELAY", 0)
+
+    async def progress(line):
+        pass
+
+    result = asyncio.run(agent.run_agent("system", [{"role": "user", "content": "go"}], [], progress))
+    return result, client
+
+
+def test_turn_cut_off_at_max_tokens_is_resumed_and_joined(monkeypatch):
+    result, client = _run_agent(monkeypatch, [
+        Response([text("First half, ")], "max_tokens"),
+        Response([text(" second half.")], "end_turn"),  # Resumes after the trimmed prefill
+    ])
+    assert result == "First half, second half."
+    first, resumed = client.requests
+    assert resumed["max_tokens"] > first["max_tokens"]  # Escalated to the write budget
+    assert resumed["messages"][-1] == {"role": "assistant", "content": [{"type": "text", "text": "First half,"}]}
+
+
+def test_cut_off_tool_call_is_dropped_and_complete_ones_run(monkeypatch):
+    calls = []
+
+    async def dispatch(name, tool_input):
+        calls.append((name, tool_input))
+        return "ok"
+
+    monkeypatch.setattr(agent, "dispatch_tool", dispatch)
+    result, client = _run_agent(monkeypatch, [
+        Response([tool(id="a", input={"command": "one"}), tool(id="b", input={"command": "cut"})], "max_tokens"),
+        Response([text("done")], "end_turn"),
+    ])
+    assert result == "done"
+    assert calls == [("bash", {"command": "one"})]
+    tool_results = client.requests[1]["messages"][-1]["content"]
+    assert [r["tool_use_id"] for r in tool_results] == ["a"]
@@ -0,0 +1,83 @@
+import gzip
+import json
+from datetime import datetime, timedelta
+
+
+def _conversation(db, telegram_id=1):
+    db.register_user(telegram_id, "user")
+    return db.create_or_get_session(telegram_id)
+
+
+def _backdate(db, days, where, params=()):
+    stamp = (datetime.utcnow() - timedelta(days=days)).isoformat()
+    with db.get_connection() as conn:
+        conn.execute(f"UPDATE messages SET timestamp = ? WHERE {where}", (stamp, *params))
+
+
+def test_large_message_is_stored_compressed_and_round_trips(db):
+    conversation_id = _conversation(db)
+    big = [{"type": "text", "text": "report " * 1000}]
+    db.save_message(conversation_id, "assistant", big)
+    db.save_message(conversation_id, "user", "short")
+
+    with db.get_connection() as conn:
+        stored = [row["content"] for row in conn.execute("SELECT content FROM messages ORDER BY id")]
+    assert isinstance(stored[0], bytes) and len(stored[0]) < len(json.dumps(big))
+    assert stored[1] == json.dumps("short")
+
+    db._history_cache.clear()  # Read back from the database, not the write-through cache
+    assert db.get_recent_messages(1) == [
+        {"role": "assistant", "content": big},
+        {"role": "user", "content": "short"},
+    ]
+
+
+def test_legacy_plain_text_rows_still_decode(db):
+    conversation_id = _conversation(db)
+    with db.get_connection() as conn:
+        conn.execute("""
+            INSERT INTO messages (conversation_id, telegram_id, role, content, timestamp)
+            VALUES (?, 1, 'user', 'not json', ?)
+        """, (conversation_id, datetime.utcnow().isoformat()))
+    assert db.get_recent_messages(1) == [{"role": "user", "content": "not json"}]
+
+
+def test_archive_moves_only_expired_messages(db):
+    conversation_id = _conversation(db)
+    for text in ("old question", "old answer", "new question"):
+        db.save_message(conversation_id, "user", text)
+    _backdate(db, 40, "content != ?", (json.dumps("new question"),))
+
+    result = db.archive_old_messages(30)
+
+    assert result["messages"] == 2
+    assert result["conversations"] == 0  # The user's current conversation is kept
+    assert db.get_recent_messages(1) == [{"role": "user", "content": "new question"}]
+    with gzip.open(result["path"], "rt", encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f]
+    assert [m["content"] for m in lines[0]["messages"]] == ["old question", "old answer"]
+    assert lines[0]["telegram_id"] == 1
+
+
+def test_archive_removes_old_empty_conversations_but_not_the_current_one(db):
+    old_id = _conversation(db)
+    db.save_message(old_id, "user", "old")
+    with db.get_connection() as conn:
+        conn.execute("UPDATE conversations SET created_at = ?", ((datetime.utcnow() - timedelta(days=60)).isoformat(),))
+        current_id = conn.execute("""
+            INSERT INTO conversations (telegram_id, session_id, created_at) VALUES (1, 'current', ?)
+        """, ((datetime.utcnow() - timedelta(days=60)).isoformat(),)).lastrowid
+    _backdate(db, 40, "1")
+
+    result = db.archive_old_messages(30)
+
+    assert result == {**result, "messages": 1, "conversations": 1}
+    with db.get_connection() as conn:
+        remaining = [row["id"] for row in conn.execute("SELECT id FROM conversations")]
+    assert remaining == [current_id] and old_id != current_id
+
+
+def test_archive_with_nothing_expired_writes_no_file(db):
+    conversation_id = _conversation(db)
+    db.save_message(conversation_id, "user", "recent")
+    assert db.archive_old_messages(30) == {"conversations": 0, "messages": 0, "path": None}
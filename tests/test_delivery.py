@@ -0,0 +1,52 @@
+import pytest
+
+pytest.importorskip("telegram")
+
+from delivery import split_markdown  # noqa: E402
+
+
+def _fence_balanced(chunk):
+    return sum(1 for line in chunk.splitlines() if line.lstrip().startswith("```")) % 2 == 0
+
+
+def test_short_text_is_one_chunk():
+    assert split_markdown("hello", 100) == ["hello"]
+
+
+def test_splits_on_paragraph_boundaries_within_limit():
+    paragraphs = [f"Paragraph {i} " + "x" * 40 for i in range(10)]
+    text = "\n\n".join(paragraphs)
+    chunks = split_markdown(text, 120)
+    assert all(len(chunk) <= 120 for chunk in chunks)
+    assert all(chunk.startswith("Paragraph") for chunk in chunks)
+    assert "\n\n".join(chunks) == text
+
+
+def test_long_line_is_sliced():
+    chunks = split_markdown("y" * 1000, 100)
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert "".join(chunks) == "y" * 1000
+
+
+def test_fence_is_closed_and_reopened_across_chunks():
+    code = "\n".join(f"line = {i}" for i in range(60))
+    text = "Intro\n\n```python\n" + code + "\n```\n\nOutro"
+    chunks = split_markdown(text, 200)
+
+    assert len(chunks) > 2
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert all(_fence_balanced(chunk) for chunk in chunks)
+    # Continuation chunks reopen the fence before any code
+    for chunk in chunks[1:]:
+        if "line = " in chunk.split("\n", 1)[0]:
+            pytest.fail(f"chunk starts inside code without reopening the fence: {chunk[:40]!r}")
+    joined = "".join(chunks)
+    assert all(f"line = {i}" in joined for i in range(60))
+    assert chunks[-1].endswith("Outro")
+
+
+def test_text_after_a_closed_fence_is_not_wrapped_in_a_new_fence():
+    text = "```\ncode\n```\n\n" + "\n\n".join("plain paragraph " + str(i) for i in range(20))
+    chunks = split_markdown(text, 80)
+    assert all(_fence_balanced(chunk) for chunk in chunks)
+    assert not any(chunk.startswith("```") for chunk in chunks[1:])
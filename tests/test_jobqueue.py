@@ -0,0 +1,79 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _enqueue(db, n):
+    return [db.enqueue_task(1, 10, "review-page", f"example.com/{i}", {"i": i}) for i in range(n)]
+
+
+def test_each_task_is_claimed_by_exactly_one_worker(db):
+    task_ids = _enqueue(db, 40)
+    start = threading.Barrier(8)
+
+    def worker(name):
+        start.wait()
+        claimed = []
+        while (task := db.claim_task(name)) is not None:
+            claimed.append(task["id"])
+        return claimed
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(worker, [f"w{i}" for i in range(8)]))
+
+    claimed = [task_id for result in results for task_id in result]
+    assert sorted(claimed) == task_ids  # None lost, none claimed twice
+    with db.get_connection() as conn:
+        rows = conn.execute("SELECT status, worker FROM tasks").fetchall()
+    assert {row["status"] for row in rows} == {"running"}
+    assert all(row["worker"] for row in rows)
+
+
+def test_claim_returns_oldest_pending_with_its_payload(db):
+    first, second = _enqueue(db, 2)
+    task = db.claim_task("w")
+    assert task["id"] == first and task["payload"] == {"i": 0}
+    assert db.claim_task("w")["id"] == second
+    assert db.claim_task("w") is None
+
+
+def test_cancel_pending_task_is_never_claimed(db):
+    (task_id,) = _enqueue(db, 1)
+    db.cancel_task(task_id)
+    assert db.claim_task("w") is None
+    assert db.get_task_state(task_id)["status"] == "cancelled"
+
+
+def test_cancel_running_task_sends_its_worker_a_cancel_event(db):
+    (task_id,) = _enqueue(db, 1)
+    db.claim_task("w")
+    db.cancel_task(task_id)
+    events = db.read_task_events([task_id], "down")
+    assert [event["kind"] for event in events] == ["cancel"]
+    assert db.get_task_state(task_id)["status"] == "running"  # The worker finishes it
+
+
+def test_pending_timeout_loses_to_a_claim(db):
+    claimed_id, unclaimed_id = _enqueue(db, 2)
+    db.claim_task("w")
+    assert db.fail_pending_task(claimed_id, "timeout") is False
+    assert db.fail_pending_task(unclaimed_id, "timeout") is True
+    assert db.get_task_state(unclaimed_id)["status"] == "failed"
+
+
+def test_events_flow_in_order_per_direction(db):
+    (task_id,) = _enqueue(db, 1)
+    db.post_task_event(task_id, "up", "progress", {"line": "one"})
+    db.post_task_event(task_id, "down", "reply", {"text": "yes"})
+    db.post_task_event(task_id, "up", "result", {"text": "done", "files": []})
+
+    up = db.read_task_events([task_id], "up")
+    assert [event["kind"] for event in up] == ["progress", "result"]
+    assert db.read_task_events([task_id], "up", up[0]["id"])[0]["payload"]["text"] == "done"
+    db.delete_task_events(task_id)
+    assert db.read_task_events([task_id], "up") == []
+
+
+def test_schema_ready_only_after_init_db(db, tmp_path, monkeypatch):
+    assert db.schema_ready()
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "other.db"))
+    assert not db.schema_ready()
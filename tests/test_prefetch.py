@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+import prefetch
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    """Replace the fetch_page.py subprocess with a fake that finishes when released."""
+    state = {"started": [], "cancelled": [], "release": None}
+
+    async def fake_fetch(url):
+        state["started"].append(url)
+        try:
+            await state["release"].wait()
+        except asyncio.CancelledError:
+            state["cancelled"].append(url)
+            raise
+        return 0, f'{{"url": "{url}"}}', ""
+
+    monkeypatch.setattr(prefetch, "_run_fetch_page", fake_fetch)
+    prefetch._page_fetches.clear()
+    yield state
+    prefetch._page_fetches.clear()
+
+
+@pytest.mark.parametrize("command, url", [
+    ("python3 scripts/fetch_page.py https://example.com/", "https://example.com/"),
+    ("python scripts/fetch_page.py 'example.com/a'", "https://example.com/a"),
+    ('  python3 scripts/fetch_page.py "https://example.com/?q=1"  ', "https://example.com/?q=1"),
+])
+def test_fetch_command_pattern_matches_agent_calls(command, url):
+    match = prefetch.FETCH_PAGE_COMMAND_RE.match(command)
+    assert match and prefetch._canonical_url(match.group(2)) == url
+
+
+@pytest.mark.parametrize("command", [
+    "python3 scripts/fetch_page.py https://example.com/ --raw",
+    "python3 scripts/crawl_site.py https://example.com/",
+    "python3 scripts/fetch_page.py https://a.com/ && rm -rf /",
+])
+def test_other_commands_are_not_served(command, fetches):
+    async def scenario():
+        release = prefetch.start("review-page", "https://example.com/")
+        assert await prefetch.serve_bash(command) is None
+        release()
+    fetches["release"] = asyncio.Event()
+    asyncio.run(scenario())
+
+
+def test_agent_call_is_answered_from_the_prefetch(fetches):
+    async def scenario():
+        fetches["release"] = asyncio.Event()
+        release = prefetch.start("review-page", "example.com")
+        served = asyncio.create_task(prefetch.serve_bash("python3 scripts/fetch_page.py example.com"))
+        await asyncio.sleep(0)
+        fetches["release"].set()
+        assert await served == ('{"url": "https://example.com"}', "")
+        release()
+        assert fetches["started"] == ["https://example.com"]
+    asyncio.run(scenario())
+
+
+def test_fetch_survives_while_anyone_still_waits(fetches):
+    async def scenario():
+        fetches["release"] = asyncio.Event()
+        release = prefetch.start("review-page", "example.com")
+        waiter = asyncio.create_task(prefetch.fetch_page("example.com"))
+        await asyncio.sleep(0)
+
+        release()  # The session ends, but the cache key computation still waits
+        await asyncio.sleep(0)
+        assert fetches["cancelled"] == []
+
+        fetches["release"].set()
+        assert (await waiter)[0] == 0
+    asyncio.run(scenario())
+
+
+def test_last_waiter_cancelling_kills_the_fetch(fetches):
+    async def scenario():
+        fetches["release"] = asyncio.Event()
+        release = prefetch.start("review-page", "example.com")
+        waiter = asyncio.create_task(prefetch.fetch_page("example.com"))
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert fetches["cancelled"] == []  # The session's claim keeps it alive
+
+        release()
+        await asyncio.sleep(0)
+        assert fetches["cancelled"] == ["https://example.com"]
+        assert "https://example.com" not in prefetch._page_fetches
+    asyncio.run(scenario())
+
+
+def test_commands_without_a_page_start_nothing(fetches):
+    prefetch.start("brief", "acme")()
+    prefetch.start("review-page", "")()
+    assert fetches["started"] == [] and prefetch._page_fetches == {}
@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+import result_cache
+from config import PROJECT_ROOT
+
+
+@pytest.fixture
+def cache_dir(db, tmp_path, monkeypatch):
+    path = tmp_path / "result-cache"
+    monkeypatch.setattr(result_cache, "RESULT_CACHE_DIR", str(path))
+    return path
+
+
+def _report(rel_path, text):
+    path = os.path.join(PROJECT_ROOT, rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return path
+
+
+def test_same_named_reports_in_different_folders_are_kept_apart(cache_dir):
+    first = _report("reviews/a.com/REVIEW.md", "review of a")
+    second = _report("reviews/b.com/REVIEW.md", "review of b")
+
+    result_cache.store("key", "review-page", "https://a.com", "summary", [first, second, first])
+
+    entry = result_cache.lookup("key")
+    assert entry is not None
+    assert len(entry["files"]) == 2
+    contents = []
+    for path in entry["files"]:
+        assert path.startswith(str(cache_dir))
+        with open(path, encoding="utf-8") as f:
+            contents.append(f.read())
+    assert sorted(contents) == ["review of a", "review of b"]
+
+
+def test_cached_copy_survives_later_edits(cache_dir):
+    report = _report("reviews/c.com/REVIEW.md", "original")
+    result_cache.store("key", "review-page", "https://c.com", "summary", [report])
+    _report("reviews/c.com/REVIEW.md", "rewritten")
+
+    (cached,) = result_cache.lookup("key")["files"]
+    with open(cached, encoding="utf-8") as f:
+        assert f.read() == "original"
+
+
+def test_lookup_misses_when_a_cached_file_is_gone(cache_dir):
+    report = _report("reviews/d.com/REVIEW.md", "text")
+    result_cache.store("key", "review-page", "https://d.com", "summary", [report])
+    os.remove(result_cache.lookup("key")["files"][0])
+
+    assert result_cache.lookup("key") is None
+
+
+def test_evict_drops_least_recently_used_over_budget(cache_dir, monkeypatch):
+    report = _report("reviews/e.com/REVIEW.md", "x" * 100)
+    monkeypatch.setattr(result_cache, "RESULT_CACHE_MAX_BYTES", 10 ** 6)
+    result_cache.store("old", "review-page", "https://e.com", "summary", [report])
+    result_cache.store("new", "review-page", "https://e.com", "summary", [report])
+    result_cache.lookup("new")  # marks "new" as the most recently used
+
+    monkeypatch.setattr(result_cache, "RESULT_CACHE_MAX_BYTES", 150)
+    assert result_cache.evict() == 1
+    assert result_cache.lookup("old") is None
+    assert result_cache.lookup("new") is not None
+    assert not (cache_dir / "old").exists()
+
+
+def test_split_fresh_flag():
+    assert result_cache.split_fresh_flag("https://x.com --fresh") == ("https://x.com", True)
+    assert result_cache.split_fresh_flag("https://x.com") == ("https://x.com", False)
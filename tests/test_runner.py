@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+import prefetch
+import result_cache
+import runner
+from tools import OutputManifest
+
+ENTRY = {"summary": "cached summary", "files": [], "created_at": "2026-01-01T00:00:00"}
+
+
+@pytest.fixture
+def review(monkeypatch):
+    """A fake agent and page hash; `hit` decides the cache lookup's answer."""
+    state = {"model_calls": 0, "events": [], "asked": [], "hit": False, "key_delay": 0.05, "reply": "ASK_USER: which page?"}
+
+    async def run_agent(messages, **kwargs):
+        state["model_calls"] += 1
+        state["events"].append("model call")
+        await asyncio.sleep(0.01)
+        if state["reply"] and len(messages) == 1:
+            return state["reply"]
+        return "final report"
+
+    async def compute_key(command, url, scope):
+        await asyncio.sleep(state["key_delay"])
+        state["events"].append("key ready")
+        return f"key:{scope}"
+
+    monkeypatch.setattr(runner, "run_agent", run_agent)
+    monkeypatch.setattr(result_cache, "compute_key", compute_key)
+    monkeypatch.setattr(result_cache, "lookup", lambda key: ENTRY if state["hit"] else None)
+    monkeypatch.setattr(prefetch, "start", lambda command, arguments: lambda: None)
+    return state
+
+
+def _run(state, command="review-page", fresh=False, cache_scope="example.com/"):
+    async def progress(line):
+        pass
+
+    async def ask_user(question):
+        state["asked"].append(question)
+        return "the home page"
+
+    return asyncio.run(runner.execute_review(
+        command, "example.com", "system", [], OutputManifest(), progress, ask_user, cache_scope, fresh,
+    ))
+
+
+def test_agent_starts_before_the_cache_key_is_ready(review):
+    review["reply"] = None
+    outcome = _run(review)
+    assert outcome.text == "final report" and outcome.cache_key == "key:example.com/"
+    assert outcome.cached is None
+    assert review["events"] == ["model call", "key ready"]
+
+
+def test_hit_stops_the_agent_before_it_asks_anything(review):
+    review["hit"] = True
+    outcome = _run(review)
+    assert outcome.cached is ENTRY and outcome.text is None
+    assert review["model_calls"] == 1  # Started speculatively, then stopped
+    assert review["asked"] == []
+
+
+def test_questions_are_asked_after_a_miss(review):
+    outcome = _run(review)
+    assert review["asked"] == ["which page?"]
+    assert outcome.text == "final report"
+
+
+def test_fresh_skips_the_lookup_but_keeps_the_key(review):
+    review["hit"] = True
+    review["reply"] = None
+    outcome = _run(review, fresh=True)
+    assert outcome.cached is None and outcome.text == "final report"
+    assert outcome.cache_key == "key:example.com/"
+
+
+def test_uncached_commands_never_compute_a_key(review):
+    review["reply"] = None
+    review["hit"] = True
+    outcome = _run(review, command="brief", cache_scope="acme")
+    assert outcome.cache_key is None and outcome.text == "final report"
@@ -0,0 +1,158 @@
+import asyncio
+
+from scheduler import ReviewScheduler
+
+
+class Recorder:
+    """Jobs that record their start order and finish when released."""
+
+    def __init__(self):
+        self.started = []
+        self.gates = {}
+
+    def job(self, name):
+        gate = self.gates[name] = asyncio.Event()
+
+        async def run():
+            self.started.append(name)
+            await gate.wait()
+        return run
+
+    async def finish(self, name):
+        self.gates[name].set()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+
+def test_global_and_per_user_limits():
+    async def scenario():
+        rec = Recorder()
+        sched = ReviewScheduler(max_concurrent=2, per_user_limit=1, duration_estimate=60)
+        sched.submit(1, "review-page", rec.job("a1"))
+        sched.submit(1, "review-page", rec.job("a2"))
+        sched.submit(2, "review-page", rec.job("b1"))
+        sched.submit(3, "review-page", rec.job("c1"))
+        await asyncio.sleep(0)
+        assert rec.started == ["a1", "b1"]
+        assert sched.running_count() == 2 and sched.queued_count() == 2
+
+        # User 1's second job waited for their first, not for a global slot
+        await rec.finish("b1")
+        assert rec.started == ["a1", "b1", "c1"]
+        await rec.finish("a1")
+        assert rec.started[-1] == "a2"
+        for name in ("c1", "a2"):
+            await rec.finish(name)
+        assert sched.running_count() == 0
+    asyncio.run(scenario())
+
+
+def test_round_robin_between_users_in_a_burst():
+    async def scenario():
+        rec = Recorder()
+        sched = ReviewScheduler(max_concurrent=1, per_user_limit=1, duration_estimate=60)
+        sched.submit(9, "review-page", rec.job("blocker"))
+        for i in range(3):
+            sched.submit(1, "review-page", rec.job(f"a{i}"))
+        sched.submit(2, "review-page", rec.job("b0"))
+        sched.submit(3, "review-page", rec.job("c0"))
+        await asyncio.sleep(0)
+        for name in ["blocker", "a0", "b0", "c0", "a1", "a2"]:
+            await rec.finish(name)
+        assert rec.started == ["blocker", "a0", "b0", "c0", "a1", "a2"]
+    asyncio.run(scenario())
+
+
+def test_brief_jumps_ahead_of_reviews():
+    async def scenario():
+        rec = Recorder()
+        sched = ReviewScheduler(max_concurrent=1, per_user_limit=5, duration_estimate=60)
+        sched.submit(1, "review-page", rec.job("review1"))
+        sched.submit(1, "review-page", rec.job("review2"))
+        sched.submit(2, "brief", rec.job("brief"))
+        await asyncio.sleep(0)
+        await rec.finish("review1")
+        assert rec.started == ["review1", "brief"]
+        await rec.finish("brief")
+        await rec.finish("review2")
+    asyncio.run(scenario())
+
+
+def test_queued_jobs_get_position_updates():
+    async def scenario():
+        rec = Recorder()
+        updates = []
+
+        async def on_status(job, position, eta):
+            updates.append((job.description, position))
+
+        sched = ReviewScheduler(max_concurrent=1, per_user_limit=1, duration_estimate=60)
+        sched.submit(1, "review-page", rec.job("a"))
+        sched.submit(2, "review-page", rec.job("b"), on_status=on_status, description="b")
+        await asyncio.sleep(0)
+        assert updates == [("b", 1)]
+        await rec.finish("a")
+        await asyncio.sleep(0)
+        assert updates[-1] == ("b", 0)  # Started
+        await rec.finish("b")
+    asyncio.run(scenario())
+
+
+def test_failing_job_frees_its_slot():
+    async def scenario():
+        rec = Recorder()
+        sched = ReviewScheduler(max_concurrent=1, per_user_limit=1, duration_estimate=60)
+
+        async def boom():
+            raise RuntimeError("boom")
+
+        sched.submit(1, "review-page", boom)
+        sched.submit(1, "review-page", rec.job("next"))
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert rec.started == ["next"]
+        await rec.finish("next")
+    asyncio.run(scenario())
+
+
+def test_cancel_queued_job_runs_on_cancel_and_never_starts():
+    async def scenario():
+        rec = Recorder()
+        cancelled = []
+
+        async def on_cancel(job):
+            cancelled.append(job.description)
+
+        sched = ReviewScheduler(max_concurrent=1, per_user_limit=1, duration_estimate=60)
+        sched.submit(1, "review-page", rec.job("running"))
+        queued = sched.submit(2, "review-page", rec.job("queued"), on_cancel=on_cancel, description="queued")
+        await asyncio.sleep(0)
+
+        assert sched.cancel(queued) is True
+        await asyncio.sleep(0)
+        assert cancelled == ["queued"]
+        assert sched.queued_count() == 0 and sched.user_jobs(2) == []
+        assert sched.cancel(queued) is False  # No longer known
+
+        await rec.finish("running")
+        assert rec.started == ["running"]
+    asyncio.run(scenario())
+
+
+def test_cancel_running_job_cancels_its_task_and_frees_the_slot():
+    async def scenario():
+        rec = Recorder()
+        sched = ReviewScheduler(max_concurrent=1, per_user_limit=1, duration_estimate=60)
+        running = sched.submit(1, "review-page", rec.job("running"))
+        sched.submit(2, "review-page", rec.job("next"))
+        await asyncio.sleep(0)
+        estimate = sched.duration_estimate
+
+        assert sched.cancel(running) is True
+        await asyncio.gather(running.task, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert running.task.cancelled()
+        assert rec.started == ["running", "next"]
+        assert sched.duration_estimate == estimate  # Aborted runs don't skew the ETA
+        await rec.finish("next")
+    asyncio.run(scenario())
@@ -0,0 +1,49 @@
+import pytest
+
+pytest.importorskip("telegram")
+
+import tasks  # noqa: E402
+
+
+class Status:
+    def __init__(self, message_id):
+        self.message_id = message_id
+
+
+@pytest.fixture
+def finished(monkeypatch):
+    """Status texts the broadcaster would show, by message id."""
+    texts = {}
+    monkeypatch.setattr(tasks.broadcaster, "finish", lambda chat_id, message_id, text: texts.__setitem__(message_id, text))
+    yield texts
+    tasks._inflight.clear()
+
+
+def _subscribe(telegram_id, message_id, arguments="example.com"):
+    sub = tasks.Subscriber(telegram_id * 10, telegram_id, Status(message_id))
+    return tasks.join_inflight("review-page", arguments, sub)
+
+
+def test_identical_requests_coalesce_on_normalized_arguments(finished):
+    assert _subscribe(1, 100, "https://Example.com/") is False
+    assert _subscribe(2, 200, "example.com") is True
+    assert [s.telegram_id for s in tasks.inflight_subscribers("review-page", "EXAMPLE.com")] == [1, 2]
+
+
+def test_detach_leaves_other_subscribers_waiting(finished):
+    _subscribe(1, 100)
+    _subscribe(2, 200)
+    subscribers = tasks._inflight[tasks.coalesce_key("review-page", "example.com")]
+
+    assert tasks.detach_inflight("review-page", "example.com", 1, "Stopped waiting") is False
+    assert finished == {100: "Stopped waiting"}
+    # The running task holds the same list, so it sees the change
+    assert [s.telegram_id for s in subscribers] == [2]
+
+    assert tasks.detach_inflight("review-page", "example.com", 2, "Cancelled") is True
+    assert tasks.inflight_subscribers("review-page", "example.com") == []
+
+
+def test_detach_unknown_request_means_nothing_else_waits(finished):
+    assert tasks.detach_inflight("review-page", "nothing.example", 1, "x") is True
+    assert finished == {}
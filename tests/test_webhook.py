@@ -0,0 +1,90 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("telegram")
+
+import webhook  # noqa: E402
+
+SECRET = "s3cret"
+UPDATE = {"update_id": 7, "message": {
+    "message_id": 1, "date": 0, "chat": {"id": 5, "type": "private"}, "text": "/start",
+}}
+
+
+class StubApp:
+    """Just the parts of an Application the server touches."""
+
+    def __init__(self):
+        self.bot = None
+        self.update_queue = asyncio.Queue()
+
+
+async def _request(port, body=b"", method="POST", path="/telegram", secret=SECRET, length=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    headers = f"{method} {path} HTTP/1.1\r\nHost: x\r\n"
+    if secret is not None:
+        headers += f"X-Telegram-Bot-Api-Secret-Token: {secret}\r\n"
+    headers += f"Content-Length: {len(body) if length is None else length}\r\n\r\n"
+    writer.write(headers.encode("ascii") + body)
+    await writer.drain()
+    status_line = await reader.readline()
+    rest = await reader.read()  # The server closes the connection after each response
+    writer.close()
+    return int(status_line.split()[1]), rest
+
+
+def _serve(check):
+    async def scenario():
+        app = StubApp()
+        server = webhook.WebhookServer(app, "telegram", SECRET)
+        http = await server.start("127.0.0.1", 0)
+        try:
+            await check(app, server, http.sockets[0].getsockname()[1])
+        finally:
+            http.close()
+            await http.wait_closed()
+    asyncio.run(scenario())
+
+
+def test_valid_update_is_queued():
+    async def check(app, server, port):
+        status, _ = await _request(port, json.dumps(UPDATE).encode())
+        assert status == 200
+        update = app.update_queue.get_nowait()
+        assert update.update_id == 7 and update.message.text == "/start"
+        assert server.received == 1 and server.rejected == 0
+    _serve(check)
+
+
+@pytest.mark.parametrize("secret", ["wrong", None])
+def test_missing_or_wrong_secret_is_forbidden(secret):
+    async def check(app, server, port):
+        status, _ = await _request(port, json.dumps(UPDATE).encode(), secret=secret)
+        assert status == 403
+        assert app.update_queue.empty() and server.rejected == 1
+    _serve(check)
+
+
+def test_oversized_body_is_rejected_before_reading_it():
+    async def check(app, server, port):
+        status, _ = await _request(port, b"{}", length=webhook.MAX_BODY_BYTES + 1)
+        assert status == 413
+    _serve(check)
+
+
+@pytest.mark.parametrize("body", [b"{not json", b'"x"', b"1", b"[]", b"{}"])
+def test_bad_bodies_are_rejected(body):
+    async def check(app, server, port):
+        status, rest = await _request(port, body)
+        assert status == 400 and rest.endswith(b"Bad Request")
+        assert app.update_queue.empty()
+    _serve(check)
+
+
+def test_wrong_path_and_method():
+    async def check(app, server, port):
+        assert (await _request(port, path="/other"))[0] == 404
+        assert (await _request(port, method="GET"))[0] == 405
+    _serve(check)